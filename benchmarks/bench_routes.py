@@ -0,0 +1,340 @@
+"""
+Benchmark every route of the files API against a local S3 stand-in (`moto.server`).
+
+Starts `moto.server` and the app (with uvicorn) as subprocesses on free local ports, then
+drives each route with a fixed number of requests at a given concurrency and payload size:
+
+    upload    PUT    /files/bench/<n>
+    list      GET    /files?directory=bench/
+    head      HEAD   /files/bench/<n>
+    download  GET    /files/bench/<n>
+    delete    DELETE /files/bench/<n>
+
+For each route it reports throughput, latency percentiles, errors, and the app's peak RSS
+while the route ran (summed over the uvicorn process and its workers; reset before each
+route where Linux allows it, see `peak_rss_reset`), as JSON (to stdout, or `--output`), so
+runs can be compared between commits:
+
+    python benchmarks/bench_routes.py --requests 500 --concurrency 16 --payload-bytes 1048576
+
+Extra app settings can be passed as environment variables, e.g. `METADATA_CACHE_MAX_ENTRIES=0`.
+`--s3-faults` simulates a slow or throttling S3 (see `files_api.s3.fault_injection`), e.g.
+
+    python benchmarks/bench_routes.py --s3-faults '{"*": {"latency": {"median_seconds": 0.02, "p99_seconds": 0.3}}}'
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import (
+    asdict,
+    dataclass,
+)
+from pathlib import Path
+from typing import (
+    Awaitable,
+    Callable,
+    Iterator,
+    Optional,
+)
+
+import boto3
+import httpx
+
+THIS_DIR = Path(__file__).parent
+PROJECT_DIR = THIS_DIR.parent
+BENCH_BUCKET_NAME = "files-api-bench"
+BENCH_DIRECTORY = "bench/"
+ROUTES = ("upload", "list", "head", "download", "delete")
+SERVER_START_TIMEOUT_SECONDS = 30
+
+
+@dataclass
+class RouteResult:
+    """Measurements of one route."""
+
+    route: str
+    requests: int
+    errors: int
+    duration_seconds: float
+    requests_per_second: float
+    megabytes_per_second: float
+    latency_p50_ms: float
+    latency_p90_ms: float
+    latency_p99_ms: float
+    latency_max_ms: float
+    # sum of the peak RSS of each app process, since the route started if `peak_rss_reset`
+    peak_rss_bytes: Optional[int]
+    # false if the peaks could not be reset, so they are cumulative since the app started
+    peak_rss_reset: bool
+
+
+def summarize_latencies(latencies_seconds: list[float]) -> dict[str, float]:
+    """Return the p50, p90, p99 and maximum of the latencies, in milliseconds."""
+    if not latencies_seconds:
+        return {"latency_p50_ms": 0.0, "latency_p90_ms": 0.0, "latency_p99_ms": 0.0, "latency_max_ms": 0.0}
+    if len(latencies_seconds) == 1:
+        percentiles = latencies_seconds * 99
+    else:
+        percentiles = statistics.quantiles(latencies_seconds, n=100, method="inclusive")
+    return {
+        "latency_p50_ms": round(percentiles[49] * 1000, 3),
+        "latency_p90_ms": round(percentiles[89] * 1000, 3),
+        "latency_p99_ms": round(percentiles[98] * 1000, 3),
+        "latency_max_ms": round(max(latencies_seconds) * 1000, 3),
+    }
+
+
+def process_tree(pid: int) -> list[int]:
+    """Return a process and its descendants (e.g. uvicorn's worker processes), where the OS exposes them (Linux)."""
+    pids = [pid]
+    for parent in pids:
+        for children in Path(f"/proc/{parent}/task").glob("*/children"):
+            try:
+                pids.extend(int(child) for child in children.read_text().split())
+            except OSError:
+                continue
+    return pids
+
+
+def reset_peak_rss(pid: int) -> bool:
+    """Reset the peak resident set size of a process and its descendants; return whether all were reset."""
+    reset = True
+    for process_id in process_tree(pid):
+        try:
+            # "5" resets VmHWM to the current RSS (Linux 4.0+)
+            Path(f"/proc/{process_id}/clear_refs").write_text("5")
+        except OSError:
+            reset = False
+    return reset
+
+
+def peak_rss_bytes(pid: int) -> Optional[int]:
+    """Return the sum of the peak resident set sizes of a process and its descendants, where the OS exposes them."""
+    total = None
+    for process_id in process_tree(pid):
+        try:
+            status = Path(f"/proc/{process_id}/status").read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith("VmHWM:"):
+                total = (total or 0) + int(line.split()[1]) * 1024
+    return total
+
+
+def find_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_listening(port: int, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"nothing listening on port {port} after {SERVER_START_TIMEOUT_SECONDS}s")
+
+
+@contextmanager
+def run_servers(app_workers: int, s3_faults: Optional[str] = None) -> Iterator[tuple[str, subprocess.Popen]]:
+    """Start moto.server and the app; yield the app's base URL and process."""
+    moto_port, app_port = find_free_port(), find_free_port()
+    env = {
+        **os.environ,
+        "AWS_ENDPOINT_URL": f"http://127.0.0.1:{moto_port}",
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "S3_BUCKET_NAME": BENCH_BUCKET_NAME,
+        **({"S3_SIMULATED_FAULTS": s3_faults} if s3_faults else {}),
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(PROJECT_DIR / "src"), os.environ.get("PYTHONPATH")])),
+    }
+    processes: list[subprocess.Popen] = []
+    try:
+        moto = subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, "-m", "moto.server", "-p", str(moto_port)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        processes.append(moto)
+        wait_until_listening(moto_port, moto)
+        s3_client = boto3.client(
+            "s3",
+            endpoint_url=env["AWS_ENDPOINT_URL"],
+            region_name=env["AWS_DEFAULT_REGION"],
+            aws_access_key_id=env["AWS_ACCESS_KEY_ID"],
+            aws_secret_access_key=env["AWS_SECRET_ACCESS_KEY"],
+        )
+        s3_client.create_bucket(Bucket=BENCH_BUCKET_NAME)
+
+        app = subprocess.Popen(  # pylint: disable=consider-using-with
+            [
+                *(sys.executable, "-m", "uvicorn", "files_api.main:create_app", "--factory"),
+                *("--port", str(app_port), "--workers", str(app_workers), "--log-level", "warning"),
+            ],
+            env=env,
+        )
+        processes.append(app)
+        wait_until_listening(app_port, app)
+        yield f"http://127.0.0.1:{app_port}", app
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def run_requests(
+    total: int,
+    concurrency: int,
+    send_request: Callable[[int], Awaitable[httpx.Response]],
+) -> tuple[list[float], int, float]:
+    """Call `send_request(0..total-1)` with `concurrency` requests in flight; return latencies, errors and duration."""
+    latencies: list[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index, errors
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            started_at = time.perf_counter()
+            try:
+                response = await send_request(index)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started_at
+
+
+async def benchmark_routes(
+    base_url: str,
+    app_pid: int,
+    routes: tuple[str, ...],
+    total: int,
+    concurrency: int,
+    payload_bytes: int,
+) -> list[RouteResult]:
+    payload = os.urandom(payload_bytes)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+
+        def file_url(index: int) -> str:
+            return f"/files/{BENCH_DIRECTORY}{index}"
+
+        requests: dict[str, tuple[Callable[[int], Awaitable[httpx.Response]], int]] = {
+            "upload": (
+                lambda index: client.put(
+                    file_url(index), files={"file": (str(index), payload, "application/octet-stream")}
+                ),
+                payload_bytes,
+            ),
+            "list": (lambda index: client.get("/files", params={"directory": BENCH_DIRECTORY, "page_size": 100}), 0),
+            "head": (lambda index: client.head(file_url(index)), 0),
+            "download": (lambda index: client.get(file_url(index)), payload_bytes),
+            "delete": (lambda index: client.delete(file_url(index)), 0),
+        }
+
+        results = []
+        for route in routes:
+            send_request, bytes_per_request = requests[route]
+            rss_reset = reset_peak_rss(app_pid)
+            latencies, errors, duration = await run_requests(total, concurrency, send_request)
+            results.append(
+                RouteResult(
+                    route=route,
+                    requests=total,
+                    errors=errors,
+                    duration_seconds=round(duration, 3),
+                    requests_per_second=round(total / duration, 1),
+                    megabytes_per_second=round(total * bytes_per_request / duration / 1024**2, 2),
+                    peak_rss_bytes=peak_rss_bytes(app_pid),
+                    peak_rss_reset=rss_reset,
+                    **summarize_latencies(latencies),
+                )
+            )
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at a time")
+    parser.add_argument("--payload-bytes", type=int, default=64 * 1024, help="size of each uploaded file")
+    parser.add_argument("--app-workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=list(ROUTES), help="routes to benchmark")
+    parser.add_argument("--s3-faults", help="JSON of simulated S3 faults by operation, see S3_SIMULATED_FAULTS")
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of to stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    args = parse_args(argv)
+    with run_servers(app_workers=args.app_workers, s3_faults=args.s3_faults) as (base_url, app):
+        results = asyncio.run(
+            benchmark_routes(
+                base_url,
+                app_pid=app.pid,
+                routes=tuple(route for route in ROUTES if route in args.routes),
+                total=args.requests,
+                concurrency=args.concurrency,
+                payload_bytes=args.payload_bytes,
+            )
+        )
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "payload_bytes": args.payload_bytes,
+            "app_workers": args.app_workers,
+            "s3_faults": json.loads(args.s3_faults) if args.s3_faults else None,
+        },
+        "results": [asdict(result) for result in results],
+    }
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(report_json + "\n")
+    else:
+        print(report_json)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -118,6 +118,13 @@ function test:quick {
     run-tests -m "not slow" ${@:-"$THIS_DIR/tests/"}
 }
 
+# benchmark every route against a local moto.server; extra args are passed to the benchmark, e.g.
+# ./run.sh benchmark --requests 500 --concurrency 16 --payload-bytes 1048576 --output bench.json
+function benchmark {
+    PYTHONPATH="$THIS_DIR/src${PYTHONPATH:+:$PYTHONPATH}" \
+        python "$THIS_DIR/benchmarks/bench_routes.py" "$@"
+}
+
 # execute tests against the installed package; assumes the wheel is already installed
 function test:ci {
     INSTALLED_PKG_DIR="$(python -c 'import files_api; print(files_api.__path__[0])')"
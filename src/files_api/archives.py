@@ -0,0 +1,176 @@
+"""Reading and writing the archive formats used by the bulk routes."""
+
+import mimetypes
+import posixpath
+import shutil
+import tarfile
+import zipfile
+from datetime import datetime
+from tempfile import SpooledTemporaryFile
+from typing import (
+    BinaryIO,
+    Iterable,
+    Iterator,
+    Optional,
+)
+
+TAR_MEDIA_TYPES = frozenset(
+    {
+        "application/x-tar",
+        "application/tar",
+        "application/gzip",
+        "application/x-gzip",
+        "application/x-gtar",
+        "application/x-compressed-tar",
+    }
+)
+ARCHIVE_MEDIA_TYPES = {
+    "tar": "application/x-tar",
+    "zip": "application/zip",
+}
+# zip timestamps cannot represent anything before 1980
+MIN_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# compressed tar streams are decompressed transparently; reading the stream in 1 MiB blocks
+TAR_BLOCK_SIZE_BYTES = 1024**2
+
+
+def iter_tar_files(
+    fileobj: BinaryIO,
+    spool_max_bytes: int,
+) -> Iterator[tuple[str, BinaryIO, Optional[str]]]:
+    """
+    Yield the regular files of a (possibly compressed) tar stream as independent file objects.
+
+    The stream is read strictly sequentially, so it may be a request body that is still
+    arriving. Each member is copied into a `SpooledTemporaryFile` that stays in memory up to
+    `spool_max_bytes` and spills to disk beyond that, which lets the caller upload it while
+    the next member is being read. Directories, links and other special members are skipped.
+
+    :param fileobj: Readable tar stream, optionally gzip/bz2/xz compressed.
+    :param spool_max_bytes: Largest member size that is buffered in memory rather than on disk.
+
+    :return: Iterator over `(member_name, fileobj, guessed_content_type)` tuples. The caller must
+        close each file object, and check each name with `safe_relative_path`, as it is the
+        archive's own and may lead out of the directory the files are uploaded to.
+
+    :raises tarfile.TarError: If the stream is not a valid tar archive.
+    """
+    with tarfile.open(fileobj=fileobj, mode="r|*", bufsize=TAR_BLOCK_SIZE_BYTES) as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            member_file = tar.extractfile(member)
+            if member_file is None:
+                continue
+            spooled_file = SpooledTemporaryFile(max_size=spool_max_bytes)  # pylint: disable=consider-using-with
+            shutil.copyfileobj(member_file, spooled_file, TAR_BLOCK_SIZE_BYTES)
+            spooled_file.seek(0)
+            content_type, _ = mimetypes.guess_type(member.name)
+            yield member.name, spooled_file, content_type  # type: ignore[misc]
+
+
+def safe_relative_path(path: str) -> Optional[str]:
+    """
+    Normalize the path of an uploaded file or archive member, relative to the directory it is uploaded to.
+
+    Leading slashes and "." segments are dropped, and "a/../b" becomes "b".
+
+    :param path: Path as given by the client, e.g. a tar member name.
+
+    :return: The normalized path, or None if it is empty or leads out of the directory, e.g. "../x" or "a/../../x".
+    """
+    relative_path = posixpath.normpath(path).lstrip("/")
+    if relative_path in ("", ".", "..") or relative_path.startswith("../"):
+        return None
+    return relative_path
+
+
+def iter_tar_archive(files: Iterable[tuple[str, int, datetime, Iterable[bytes]]]) -> Iterator[bytes]:
+    """
+    Write an uncompressed (PAX) tar archive as a stream of byte chunks.
+
+    Each member's header is written from its declared size, so its content can be streamed
+    through without ever holding a whole file in memory.
+
+    :param files: `(path, size_bytes, last_modified, chunks)` tuples; `chunks` must add up to `size_bytes`.
+
+    :return: Iterator over the archive's bytes.
+
+    :raises ValueError: If a file's chunks do not add up to its declared size.
+    """
+    offset = 0
+    for path, size_bytes, last_modified, chunks in files:
+        tar_info = tarfile.TarInfo(path)
+        tar_info.size = size_bytes
+        tar_info.mtime = int(last_modified.timestamp())
+        tar_info.mode = 0o644
+        header = tar_info.tobuf(format=tarfile.PAX_FORMAT)
+        yield header
+        offset += len(header)
+
+        written = 0
+        for chunk in chunks:
+            written += len(chunk)
+            yield chunk
+        if written != size_bytes:
+            raise ValueError(f"{path} has {written} bytes, expected {size_bytes}")
+        offset += written
+
+        # members are padded to a whole number of blocks
+        if padding := -written % tarfile.BLOCKSIZE:
+            yield tarfile.NUL * padding
+            offset += padding
+
+    # two empty blocks mark the end of the archive, which is padded to a whole record
+    end_of_archive = 2 * tarfile.BLOCKSIZE
+    end_of_archive += -(offset + end_of_archive) % tarfile.RECORDSIZE
+    yield tarfile.NUL * end_of_archive
+
+
+def iter_zip_archive(files: Iterable[tuple[str, int, datetime, Iterable[bytes]]]) -> Iterator[bytes]:
+    """
+    Write an uncompressed zip archive as a stream of byte chunks.
+
+    `zipfile` writes to non-seekable streams by putting each member's CRC and sizes in a data
+    descriptor after its content, so content is streamed through chunk by chunk. Only the
+    central directory at the end grows with the number of files (about 100 bytes each).
+    Members larger than 4 GiB are written with ZIP64 extensions.
+
+    :param files: `(path, size_bytes, last_modified, chunks)` tuples; `chunks` must add up to `size_bytes`.
+
+    :return: Iterator over the archive's bytes.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zip_file:
+        for path, size_bytes, last_modified, chunks in files:
+            zip_info = zipfile.ZipInfo(path, date_time=max(last_modified.timetuple()[:6], MIN_ZIP_DATE_TIME))
+            zip_info.file_size = size_bytes
+            with zip_file.open(zip_info, mode="w") as member_file:
+                for chunk in chunks:
+                    member_file.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object that collects written bytes until they are drained."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        """Collect a copy of the bytes and return how many were written."""
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        """Do nothing: written bytes are only handed on by `drain`."""
+
+    def drain(self) -> Iterator[bytes]:
+        """Yield what was written since the last drain, as a single chunk, if anything."""
+        if self._chunks:
+            data = b"".join(self._chunks)
+            self._chunks.clear()
+            yield data
+
@@ -0,0 +1,56 @@
+"""
+FastAPI dependencies that hand app-scoped resources to the route handlers.
+
+Docs: https://fastapi.tiangolo.com/tutorial/dependencies/
+"""
+from typing import Optional
+
+from fastapi import Request
+
+from files_api.metrics import ApiMetrics
+from files_api.s3.body_cache import ObjectBodyCache
+from files_api.s3.change_journal import ChangeJournal
+from files_api.s3.listing_index import ObjectListingIndex
+from files_api.s3.read_objects import ObjectMetadataCache
+from files_api.s3.thread_pool import S3ThreadPool
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    ...
+
+
+def get_s3_client(request: Request) -> "S3Client":
+    """Return the S3 client created for this app in `files_api.main.lifespan`."""
+    return request.app.state.s3_client
+
+
+def get_s3_thread_pool(request: Request) -> S3ThreadPool:
+    """Return the thread pool that runs this app's blocking S3 calls."""
+    return request.app.state.s3_thread_pool
+
+
+def get_metadata_cache(request: Request) -> Optional[ObjectMetadataCache]:
+    """Return this app's object metadata cache, or None if it is disabled."""
+    return request.app.state.metadata_cache
+
+
+def get_body_cache(request: Request) -> Optional[ObjectBodyCache]:
+    """Return this app's local disk cache of object bodies, or None if it is disabled."""
+    return request.app.state.body_cache
+
+
+def get_listing_index(request: Request) -> Optional[ObjectListingIndex]:
+    """Return this app's local listing index, or None if it is disabled."""
+    return request.app.state.listing_index
+
+
+def get_change_journal(request: Request) -> Optional[ChangeJournal]:
+    """Return this app's journal of writes and deletes, or None if it is disabled."""
+    return request.app.state.change_journal
+
+
+def get_metrics(request: Request) -> Optional[ApiMetrics]:
+    """Return this app's metrics, or None if they are disabled."""
+    return request.app.state.metrics
+
@@ -0,0 +1,121 @@
+"""
+Helpers for the HTTP headers the file routes read and write: dates, byte ranges and validators.
+
+Docs: https://developer.mozilla.org/en-US/docs/Web/HTTP/Range_requests
+"""
+import re
+from datetime import (
+    datetime,
+    timezone,
+)
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import quote
+
+HTTP_DATE_FORMAT = "%a, %d %b %Y %H:%M:%S GMT"
+
+# a single range, e.g. "bytes=0-99", "bytes=100-" or "bytes=-65536" (the last 64 KiB)
+SINGLE_BYTE_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+# characters that cannot appear in a quoted Latin-1 `filename` parameter as is
+UNSAFE_FILENAME_CHARACTERS_PATTERN = re.compile(r'[^\x20-\x7e]|["\\;]')
+
+
+def format_http_date(value: datetime) -> str:
+    """Format a datetime as an HTTP date, e.g. "Wed, 21 Oct 2015 07:28:00 GMT"."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime(HTTP_DATE_FORMAT)
+
+
+def parse_http_date(value: str) -> Optional[datetime]:
+    """Parse an HTTP date into a timezone-aware datetime, or return None if it is malformed."""
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_single_byte_range(range_header: Optional[str]) -> Optional[str]:
+    """
+    Return the `Range` header if it asks for a single byte range that S3 can serve, otherwise None.
+
+    Multi-range and malformed headers may be ignored by a server, which then answers with the
+    whole file (RFC 9110, section 14.2); S3 only supports a single range anyway.
+    """
+    if range_header is None:
+        return None
+    match = SINGLE_BYTE_RANGE_PATTERN.match(range_header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if start and end and int(start) > int(end):
+        return None
+    return range_header.strip()
+
+
+def if_range_matches(if_range: str, etag: str, last_modified: datetime) -> bool:
+    """
+    Evaluate an `If-Range` header against the current version of a file.
+
+    :return: True if the validator still matches, meaning the requested range may be served;
+        False if the file changed and the whole file must be sent instead.
+    """
+    if_range = if_range.strip()
+    if if_range.startswith("W/"):
+        # If-Range requires a strong comparison, which weak ETags never pass
+        return False
+    if if_range.startswith('"'):
+        return if_range == etag
+    if_range_date = parse_http_date(if_range)
+    return if_range_date is not None and format_http_date(if_range_date) == format_http_date(last_modified)
+
+
+def etag_matches_any(if_none_match: str, etag: str) -> bool:
+    """
+    Return whether an `If-None-Match` header matches the ETag.
+
+    Uses the weak comparison that RFC 9110 prescribes for `If-None-Match`: `W/` prefixes are
+    ignored, and `*` matches any ETag.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque_etag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque_etag for candidate in if_none_match.split(","))
+
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: str,
+    last_modified: datetime,
+) -> bool:
+    """
+    Evaluate the conditional request headers of a GET or HEAD against the current version of a file.
+
+    `If-None-Match` takes precedence; `If-Modified-Since` is only used without it, and ignored
+    when it is not a valid date (RFC 9110, section 13.2.2).
+
+    :return: True if the client's copy is current and a 304 Not Modified should be sent.
+    """
+    if if_none_match is not None:
+        return etag_matches_any(if_none_match, etag)
+    if if_modified_since is not None:
+        if_modified_since_date = parse_http_date(if_modified_since)
+        if if_modified_since_date is not None:
+            # HTTP dates have a resolution of one second
+            return last_modified.replace(microsecond=0) <= if_modified_since_date
+    return False
+
+
+def content_disposition_attachment(filename: str) -> str:
+    """
+    Build a `Content-Disposition` header that downloads the response as a file of this name.
+
+    Header values must be Latin-1, so `filename` gets an ASCII approximation (unsafe characters
+    replaced by "_") for old clients, and `filename*` the exact UTF-8 name (RFC 6266/5987).
+    """
+    ascii_filename = UNSAFE_FILENAME_CHARACTERS_PATTERN.sub("_", filename)
+    return f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{quote(filename, safe='')}"
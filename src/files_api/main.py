@@ -4,24 +4,169 @@ Main entry point for the FastAPI application.
 This module initializes and configures the FastAPI app,
 including setting up routes and managing the S3 bucket name.
 """
+import asyncio
 import os
+from contextlib import (
+    asynccontextmanager,
+    suppress,
+)
+from typing import AsyncIterator
 
+from botocore.exceptions import (
+    BotoCoreError,
+    ClientError,
+)
 from fastapi import FastAPI
 import pydantic
 
 from files_api.errors import handle_pydantic_validation_errors
+from files_api.metrics import (
+    ApiMetrics,
+    MetricsMiddleware,
+)
 from files_api.routes import ROUTER
+from files_api.profiling import (
+    ProfilingMiddleware,
+    ServerTimingMiddleware,
+    instrument_s3_client_for_server_timing,
+)
+from files_api.s3.body_cache import ObjectBodyCache
+from files_api.s3.change_journal import ChangeJournal
+from files_api.s3.client import create_s3_client
+from files_api.s3.fault_injection import S3FaultInjector
+from files_api.s3.listing_index import ObjectListingIndex
+from files_api.s3.read_objects import ObjectMetadataCache
+from files_api.s3.thread_pool import S3ThreadPool
 
 from files_api.settings import Settings
 
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    ...
+
+####################
+# --- Lifespan --- #
+####################
+# fastapi docs on lifespan events: https://fastapi.tiangolo.com/advanced/events/#lifespan
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Create the process-wide S3 client, thread pool and caches on startup; release them on shutdown."""
+    settings: Settings = app.state.settings
+    app.state.s3_client = create_s3_client(
+        max_pool_connections=settings.s3_max_pool_connections,
+        connect_timeout=settings.s3_connect_timeout_seconds,
+        read_timeout=settings.s3_read_timeout_seconds,
+        max_attempts=settings.s3_max_attempts,
+        retry_mode=settings.s3_retry_mode,
+    )
+    if settings.s3_simulated_faults:
+        S3FaultInjector(settings.s3_simulated_faults, seed=settings.s3_simulated_faults_seed).instrument(
+            app.state.s3_client
+        )
+    app.state.s3_thread_pool = S3ThreadPool(max_workers=settings.s3_thread_pool_size)
+    app.state.metadata_cache = (
+        ObjectMetadataCache(
+            max_entries=settings.metadata_cache_max_entries,
+            ttl_seconds=settings.metadata_cache_ttl_seconds,
+            negative_ttl_seconds=settings.metadata_cache_negative_ttl_seconds,
+        )
+        if settings.metadata_cache_max_entries > 0
+        else None
+    )
+    app.state.body_cache = (
+        ObjectBodyCache(
+            directory=settings.body_cache_dir,
+            max_bytes=settings.body_cache_max_bytes,
+            max_object_bytes=settings.body_cache_max_object_bytes,
+        )
+        if settings.body_cache_dir is not None
+        else None
+    )
+    metrics: ApiMetrics | None = app.state.metrics
+    if metrics is not None:
+        metrics.instrument_s3_client(app.state.s3_client)
+        metrics.observe_caches(app.state.metadata_cache, app.state.body_cache)
+    if settings.server_timing_enabled:
+        instrument_s3_client_for_server_timing(app.state.s3_client)
+
+    app.state.change_journal = None
+    if settings.change_journal_enabled:
+        app.state.change_journal = ChangeJournal(
+            settings.s3_bucket_name,
+            path=settings.change_journal_path,
+            tombstone_retention_seconds=settings.change_journal_tombstone_retention_seconds,
+        )
+        app.state.change_journal.instrument(app.state.s3_client)
+
+    app.state.listing_index = None
+    reconcile_task = None
+    if settings.listing_index_enabled:
+        app.state.listing_index = ObjectListingIndex(
+            settings.s3_bucket_name,
+            path=settings.listing_index_path,
+            max_listing_concurrency=settings.s3_listing_max_concurrency,
+        )
+        app.state.listing_index.instrument(app.state.s3_client)
+        # the first full listing runs in the background; until it is done, GET /files lists from S3
+        reconcile_task = asyncio.create_task(
+            reconcile_listing_index_periodically(
+                app.state.listing_index,
+                app.state.s3_client,
+                app.state.s3_thread_pool,
+                interval_seconds=settings.listing_index_reconcile_seconds,
+            )
+        )
+    try:
+        yield
+    finally:
+        if reconcile_task is not None:
+            reconcile_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await reconcile_task
+        # e.g. responses still streaming from S3 when the server stops
+        await app.state.s3_thread_pool.shutdown()
+        if app.state.listing_index is not None:
+            # before the client, which the index's background size lookups use
+            app.state.listing_index.close()
+        app.state.s3_client.close()
+        if app.state.change_journal is not None:
+            app.state.change_journal.close()
+
+
+async def reconcile_listing_index_periodically(
+    listing_index: ObjectListingIndex,
+    s3_client: "S3Client",
+    s3_thread_pool: S3ThreadPool,
+    interval_seconds: float,
+) -> None:
+    """Reconcile the listing index with S3 now and then every `interval_seconds`, until cancelled."""
+    while True:
+        try:
+            await s3_thread_pool.run(listing_index.reconcile, s3_client)
+        except (BotoCoreError, ClientError):
+            # S3 is unavailable: keep serving the index as it is and try again on the next round
+            pass
+        await asyncio.sleep(interval_seconds)
+
 ##################
 # --- Routes --- #
 ##################
 def create_app(settings: Settings | None = None) -> FastAPI:
     """Create a FastAPI application."""
     settings = settings or Settings()
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
     app.state.settings = settings
+    app.state.metrics = ApiMetrics() if settings.metrics_enabled else None
+    # the middleware added last runs first, so metrics and timings include the profiler's overhead
+    if settings.profiling_dir is not None:
+        app.add_middleware(
+            ProfilingMiddleware, directory=settings.profiling_dir, sample_rate=settings.profiling_sample_rate
+        )
+    if settings.server_timing_enabled:
+        app.add_middleware(ServerTimingMiddleware)
+    if app.state.metrics is not None:
+        app.add_middleware(MetricsMiddleware, metrics=app.state.metrics)
 
 
     # adding arbitrary properties to state defining a s3 bucket name on the state obj
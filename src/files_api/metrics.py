@@ -0,0 +1,388 @@
+"""
+In-process Prometheus metrics for the API and its S3 calls.
+
+Metrics are plain counters, gauges and histograms guarded by a lock each, so recording one
+costs a dict lookup and an addition. `MetricsRegistry.render` writes them in the Prometheus
+text exposition format for `GET /metrics`.
+
+Docs: https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+
+import threading
+import time
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from bisect import bisect_left
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    Optional,
+    TypeVar,
+)
+
+from starlette.types import (
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
+
+from files_api.s3.body_cache import ObjectBodyCache
+from files_api.s3.read_objects import ObjectMetadataCache
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    ...
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_LATENCY_BUCKETS_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# request context key under which the start time of an S3 call is kept between botocore events
+_S3_CALL_STARTED_AT = "files_api_metrics_started_at"
+
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> Iterator[tuple[str, tuple[str, ...], float]]:
+        """Yield `(sample name, label values, value)` for every labelled series."""
+
+    def render(self) -> Iterator[str]:
+        """Yield the lines of the metric in the Prometheus text exposition format."""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        for sample_name, label_values, value in self.samples():
+            yield f"{sample_name}{_format_labels(self.label_names, label_values)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. of requests; label values are passed positionally."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        """Add `amount` to the series of these label values."""
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        """Return the current value of the series of these label values."""
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def samples(self) -> Iterator[tuple[str, tuple[str, ...], float]]:
+        """Yield the value of every series, ordered by label values."""
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield self.name, label_values, value
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. the number of requests in flight."""
+
+    type_name = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        """Subtract `amount` from the series of these label values."""
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, e.g. latencies, counted in cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS_SECONDS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: count per bucket (the last one is +Inf), and the sum of observations
+        self._bucket_counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Record one observation in the series of these label values."""
+        bucket_index = bisect_left(self.buckets, value)
+        with self._lock:
+            bucket_counts = self._bucket_counts.get(label_values)
+            if bucket_counts is None:
+                bucket_counts = self._bucket_counts[label_values] = [0] * (len(self.buckets) + 1)
+                self._sums[label_values] = 0.0
+            bucket_counts[bucket_index] += 1
+            self._sums[label_values] += value
+
+    def count(self, *label_values: str) -> int:
+        """Return how many values were observed in the series of these label values."""
+        with self._lock:
+            return sum(self._bucket_counts.get(label_values, ()))
+
+    def samples(self) -> Iterator[tuple[str, tuple[str, ...], float]]:
+        """Yield the cumulative bucket counts, sum and count of every series."""
+        with self._lock:
+            series = sorted(
+                (label_values, list(counts), self._sums[label_values])
+                for label_values, counts in self._bucket_counts.items()
+            )
+        for label_values, bucket_counts, total in series:
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip((*self.buckets, float("inf")), bucket_counts):
+                cumulative_count += bucket_count
+                yield f"{self.name}_bucket", (*label_values, _format_value(upper_bound)), cumulative_count
+            yield f"{self.name}_sum", label_values, total
+            yield f"{self.name}_count", label_values, cumulative_count
+
+    def render(self) -> Iterator[str]:
+        """Yield the lines of the histogram, whose bucket samples carry an extra `le` label."""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        bucket_label_names = (*self.label_names, "le")
+        for sample_name, label_values, value in self.samples():
+            label_names = bucket_label_names if sample_name.endswith("_bucket") else self.label_names
+            yield f"{sample_name}{_format_labels(label_names, label_values)} {_format_value(value)}"
+
+
+class CallbackMetric(_Metric):
+    """Metric whose samples are read from elsewhere (e.g. a cache's own counters) when rendered."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        type_name: str,
+        label_names: tuple[str, ...],
+        callback: Callable[[], dict[tuple[str, ...], float]],
+    ):
+        super().__init__(name, documentation, label_names)
+        self.type_name = type_name
+        self.callback = callback
+
+    def samples(self) -> Iterator[tuple[str, tuple[str, ...], float]]:
+        """Yield the values the callback returns, ordered by label values."""
+        for label_values, value in sorted(self.callback().items()):
+            yield self.name, label_values, value
+
+
+MetricT = TypeVar("MetricT", bound=_Metric)
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: MetricT) -> MetricT:
+        """Add a metric, replacing any earlier one with the same name, and return it."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = [line for metric in self._metrics.values() for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+class ApiMetrics:
+    """The metrics of one app: HTTP requests, S3 calls, and the object caches."""
+
+    def __init__(self) -> None:
+        self.registry = MetricsRegistry()
+        self.http_requests = self.registry.register(
+            Counter("files_api_http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+        )
+        self.http_request_duration = self.registry.register(
+            Histogram(
+                "files_api_http_request_duration_seconds",
+                "Time from receiving an HTTP request to sending the end of its response.",
+                ("method", "route", "status"),
+            )
+        )
+        self.http_requests_in_flight = self.registry.register(
+            Gauge("files_api_http_requests_in_flight", "HTTP requests currently being handled.")
+        )
+        self.http_received_bytes = self.registry.register(
+            Counter(
+                "files_api_http_received_bytes_total", "Bytes of HTTP request bodies received.", ("method", "route")
+            )
+        )
+        self.http_sent_bytes = self.registry.register(
+            Counter("files_api_http_sent_bytes_total", "Bytes of HTTP response bodies sent.", ("method", "route"))
+        )
+        self.s3_requests = self.registry.register(
+            Counter("files_api_s3_requests_total", "S3 API calls, including their retries.", ("operation",))
+        )
+        self.s3_errors = self.registry.register(
+            Counter(
+                "files_api_s3_errors_total",
+                "S3 API calls that failed, by S3 error code or exception type.",
+                ("operation", "error_code"),
+            )
+        )
+        self.s3_request_duration = self.registry.register(
+            Histogram(
+                "files_api_s3_request_duration_seconds",
+                "Duration of S3 API calls, including their retries.",
+                ("operation",),
+            )
+        )
+        self._metadata_cache: Optional[ObjectMetadataCache] = None
+        self._body_cache: Optional[ObjectBodyCache] = None
+        for metric_name, documentation, type_name, stat_name in (
+            ("files_api_cache_entries", "Entries in the object caches.", "gauge", "entries"),
+            ("files_api_cache_hits_total", "Object cache lookups that hit.", "counter", "hits"),
+            ("files_api_cache_misses_total", "Object cache lookups that missed.", "counter", "misses"),
+            ("files_api_cache_evictions_total", "Object cache entries evicted to make room.", "counter", "evictions"),
+        ):
+            self.registry.register(
+                CallbackMetric(metric_name, documentation, type_name, ("cache",), self._cache_stat_reader(stat_name))
+            )
+        self.registry.register(
+            CallbackMetric(
+                "files_api_body_cache_bytes",
+                "Total size of the object bodies in the local body cache.",
+                "gauge",
+                (),
+                lambda: {(): self._body_cache.total_bytes} if self._body_cache is not None else {},
+            )
+        )
+
+    def observe_caches(
+        self,
+        metadata_cache: Optional[ObjectMetadataCache],
+        body_cache: Optional[ObjectBodyCache],
+    ) -> None:
+        """Report the counters of these caches (replacing any caches observed before)."""
+        self._metadata_cache = metadata_cache
+        self._body_cache = body_cache
+
+    def instrument_s3_client(self, s3_client: "S3Client") -> None:
+        """Count and time every call made with the client, using botocore's event hooks."""
+        events = s3_client.meta.events
+        events.register("before-call.s3", self._on_s3_call_started)
+        events.register("after-call.s3", self._on_s3_call_finished)
+        events.register("after-call-error.s3", self._on_s3_call_failed)
+
+    def render(self) -> str:
+        """Return all of the app's metrics in the Prometheus text exposition format."""
+        return self.registry.render()
+
+    def _cache_stat_reader(self, stat_name: str) -> Callable[[], dict[tuple[str, ...], float]]:
+        def read_cache_stat() -> dict[tuple[str, ...], float]:
+            caches = (("metadata", self._metadata_cache), ("body", self._body_cache))
+            return {(cache_name,): cache.stats()[stat_name] for cache_name, cache in caches if cache is not None}
+
+        return read_cache_stat
+
+    def _on_s3_call_started(self, model: Any, context: dict[str, Any], **kwargs: Any) -> None:
+        context[_S3_CALL_STARTED_AT] = (model.name, time.perf_counter())
+
+    def _on_s3_call_finished(self, model: Any, context: dict[str, Any], parsed: dict[str, Any], **kwargs: Any) -> None:
+        self._record_s3_call(context, error_code=parsed.get("Error", {}).get("Code"))
+
+    def _on_s3_call_failed(self, context: dict[str, Any], exception: Exception, **kwargs: Any) -> None:
+        # the call never got a response, e.g. a connection error after all retries
+        self._record_s3_call(context, error_code=type(exception).__name__)
+
+    def _record_s3_call(self, context: dict[str, Any], error_code: Optional[str]) -> None:
+        started = context.pop(_S3_CALL_STARTED_AT, None)
+        if started is None:
+            return
+        operation, started_at = started
+        self.s3_requests.inc(operation)
+        self.s3_request_duration.observe(time.perf_counter() - started_at, operation)
+        if error_code:
+            self.s3_errors.inc(operation, error_code)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the HTTP metrics of `ApiMetrics` for every request.
+
+    Requests are labelled with the path template of the route that handled them (e.g.
+    `/files/{file_path:path}`), not the raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: ApiMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle a request, recording its metrics once the response is sent."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+        received_bytes = 0
+        sent_bytes = 0
+
+        async def counting_receive() -> Message:
+            nonlocal received_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                received_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message: Message) -> None:
+            nonlocal status_code, sent_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                sent_bytes += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.http_requests_in_flight.inc()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            self.metrics.http_requests_in_flight.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            self.metrics.http_requests.inc(method, route_path, str(status_code))
+            self.metrics.http_request_duration.observe(
+                time.perf_counter() - started_at, method, route_path, str(status_code)
+            )
+            if received_bytes:
+                self.metrics.http_received_bytes.inc(method, route_path, amount=received_bytes)
+            if sent_bytes:
+                self.metrics.http_sent_bytes.inc(method, route_path, amount=sent_bytes)
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...]) -> str:
+    if not label_names:
+        return ""
+    pairs = (f'{name}="{_escape_label_value(value)}"' for name, value in zip(label_names, label_values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
@@ -0,0 +1,170 @@
+"""
+Per-request performance diagnostics: a `Server-Timing` breakdown and on-demand profiles.
+
+`ServerTimingMiddleware` adds a `Server-Timing` header listing every S3 call the request
+made on the S3 thread pool, plus the remaining handler time, so browser dev tools and
+`curl -v` show where the time went. `ProfilingMiddleware` runs `cProfile` for a random
+fraction of requests, or for requests sent with an `X-Profile: 1` header, and writes each
+profile to a directory for `python -m pstats` or snakeviz.
+
+Docs: https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Server-Timing
+"""
+
+import cProfile
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from itertools import count
+from pathlib import Path
+from typing import (
+    Any,
+    Optional,
+)
+
+import anyio.to_thread
+from starlette.types import (
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    ...
+
+PROFILE_REQUEST_HEADER = b"x-profile"
+# request context key under which the start time of an S3 call is kept between botocore events
+_S3_CALL_STARTED_AT = "files_api_server_timing_started_at"
+
+# S3 calls of the current request as (operation, duration in seconds); None outside of a timed request.
+# anyio copies the context into the S3 thread pool's workers, so calls made there are recorded too;
+# helpers that fan out to executors of their own (multipart parts, listing shards, bulk uploads and
+# deletes, archive prefetching) submit their work with `copy_context().run` for the same reason.
+_S3_CALL_TIMINGS: ContextVar[Optional[list[tuple[str, float]]]] = ContextVar("s3_call_timings", default=None)
+
+
+def instrument_s3_client_for_server_timing(s3_client: "S3Client") -> None:
+    """Record the duration of every call made with the client in the current request's `Server-Timing`."""
+    events = s3_client.meta.events
+    events.register("before-call.s3", _on_s3_call_started)
+    events.register("after-call.s3", _on_s3_call_finished)
+    events.register("after-call-error.s3", _on_s3_call_finished)
+
+
+def _on_s3_call_started(model: Any, context: dict[str, Any], **kwargs: Any) -> None:
+    if _S3_CALL_TIMINGS.get() is not None:
+        context[_S3_CALL_STARTED_AT] = (model.name, time.perf_counter())
+
+
+def _on_s3_call_finished(context: dict[str, Any], **kwargs: Any) -> None:
+    started = context.pop(_S3_CALL_STARTED_AT, None)
+    timings = _S3_CALL_TIMINGS.get()
+    if started is not None and timings is not None:
+        operation, started_at = started
+        timings.append((operation, time.perf_counter() - started_at))
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that adds a `Server-Timing` header to every HTTP response.
+
+    The header has one `s3` entry per S3 call (described by its operation name), an `app`
+    entry for the rest of the time until the response started, and a `total`. Time spent
+    streaming the body happens after the header is sent and is not included.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        timings: list[tuple[str, float]] = []
+        token = _S3_CALL_TIMINGS.set(timings)
+
+        async def send_with_server_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                header = _format_server_timing(timings, total_seconds=time.perf_counter() - started_at)
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            _S3_CALL_TIMINGS.reset(token)
+
+
+def _format_server_timing(timings: list[tuple[str, float]], total_seconds: float) -> str:
+    entries = [f's3;desc="{operation}";dur={duration * 1000:.1f}' for operation, duration in timings]
+    # concurrent S3 calls can add up to more than the wall-clock time
+    app_seconds = max(total_seconds - sum(duration for _, duration in timings), 0.0)
+    entries.append(f"app;dur={app_seconds * 1000:.1f}")
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles a sample of requests with `cProfile`.
+
+    A request is profiled with probability `sample_rate`, or always if it has an
+    `X-Profile: 1` header. Each profile is written to `directory` as
+    `<unix time>-<method>-<path>-<n>.prof`, e.g. for `python -m pstats <file>`.
+
+    The profiler traces the event loop thread from the start of the request until its
+    response is sent, so it shows the route and serialization code (and any other request's
+    work interleaved on the loop), but not the S3 calls running on worker threads; use
+    `Server-Timing` for those. Only one request is profiled at a time; requests selected
+    while another is being profiled are served without a profile.
+    """
+
+    def __init__(self, app: ASGIApp, directory: Path, sample_rate: float = 0.0):
+        """
+        :param app: The ASGI app to wrap.
+        :param directory: Directory to write profiles to; created if needed.
+        :param sample_rate: Fraction of requests to profile without being asked to, from 0 to 1.
+        """
+        self.app = app
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._profile_numbers = count()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        # cProfile supports only one active profiler at a time
+        if not self._lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                profiler.disable()
+            await anyio.to_thread.run_sync(profiler.dump_stats, self._profile_path(scope))
+        finally:
+            self._lock.release()
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if dict(scope["headers"]).get(PROFILE_REQUEST_HEADER) == b"1":
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _profile_path(self, scope: Scope) -> Path:
+        path_slug = re.sub(r"[^A-Za-z0-9._-]+", "_", scope["path"]).strip("_")[:100] or "root"
+        file_name = f"{int(time.time())}-{scope['method']}-{path_slug}-{next(self._profile_numbers)}.prof"
+        return self.directory / file_name
@@ -5,106 +5,339 @@
 
     Routes include:
     - Uploading files (`PUT /files/{file_path:path}`)
-    - Listing files with pagination (`GET /files`)
+    - Listing files with pagination, recursively or one directory level at a time (`GET /files`)
+    - Exporting the listing of a whole directory or bucket as one NDJSON stream (`GET /inventory`)
+    - Finding files by size, modification time and extension (`GET /query`)
+    - Reporting the number and total size of the files under a directory (`GET /usage`)
+    - Syncing incrementally: the files written and deleted since a cursor (`GET /changes`)
     - Retrieving file metadata (`HEAD /files/{file_path:path}`)
     - Downloading files (`GET /files/{file_path:path}`)
     - Deleting files (`DELETE /files/{file_path:path}`)
+    - Deleting many files or a whole directory (`POST /bulk/delete`)
+    - Uploading many files, as a multipart form or a tar stream (`POST /bulk/upload/{directory:path}`)
+    - Downloading a whole directory as a zip or tar archive (`GET /archive/{directory:path}`)
+    - Uploading large files straight to S3 with presigned part URLs (`POST /uploads`, `/uploads/parts`,
+      `/uploads/complete` and `/uploads/abort`)
+    - Prometheus metrics (`GET /metrics`)
 
     Each route interacts with the S3 bucket specified in the application state
     (`app.state.s3_bucket_name`) -> [now currently: `app.state.settings.s3_bucket_name`], using helper functions from the `files_api.s3`
     module for file management.
 
+    The S3 client is created once per app (see `files_api.main.lifespan`) and injected into
+    each route with the `get_s3_client` dependency. boto3 is blocking, so every S3 call is run
+    on the app's `S3ThreadPool` (the `get_s3_thread_pool` dependency) to keep the event loop free.
+
     All responses are structured based on defined Pydantic models for consistency and ease of use.
 """
+import asyncio
+import json
+import posixpath
+import tarfile
+from datetime import timezone
+from typing import (
+    AsyncIterator,
+    BinaryIO,
+    Iterator,
+    Literal,
+    NoReturn,
+    Optional,
+)
+
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
     Request,
     Response,
     UploadFile,
     status,
 )
-from fastapi.responses import StreamingResponse
+from fastapi.responses import (
+    FileResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 
-from files_api.s3.delete_objects import delete_s3_object
+from files_api.archives import (
+    ARCHIVE_MEDIA_TYPES,
+    TAR_MEDIA_TYPES,
+    iter_tar_archive,
+    iter_tar_files,
+    iter_zip_archive,
+    safe_relative_path,
+)
+from files_api.http_headers import (
+    content_disposition_attachment,
+    format_http_date,
+    if_range_matches,
+    is_not_modified,
+    parse_http_date,
+    parse_single_byte_range,
+)
+from files_api.dependencies import (
+    get_body_cache,
+    get_change_journal,
+    get_listing_index,
+    get_metadata_cache,
+    get_metrics,
+    get_s3_client,
+    get_s3_thread_pool,
+)
+from files_api.metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    ApiMetrics,
+)
+from files_api.s3.body_cache import (
+    CachedBody,
+    ObjectBodyCache,
+)
+from files_api.s3.change_journal import (
+    ChangeJournal,
+    CursorExpiredError,
+)
+from files_api.s3.listing_index import ObjectListingIndex
+from files_api.s3.delete_objects import (
+    DeleteObjectResult,
+    delete_s3_object,
+    delete_s3_objects,
+)
 from files_api.s3.read_objects import (
+    ObjectMetadataCache,
+    S3ObjectMetadata,
     fetch_s3_object,
+    fetch_s3_object_metadata,
+    fetch_s3_directory_listing,
     fetch_s3_objects_metadata,
     fetch_s3_objects_using_page_token,
+    generate_presigned_download_url,
+    iter_s3_object_bodies,
+    iter_s3_object_keys,
+    iter_s3_object_pages_in_parallel,
+    iter_s3_objects,
     object_exists_in_s3,
 )
-from files_api.s3.write_objects import upload_s3_object
+from files_api.s3.thread_pool import S3ThreadPool
+from files_api.s3.write_objects import (
+    UploadObjectResult,
+    abort_s3_multipart_upload,
+    complete_s3_multipart_upload,
+    create_s3_multipart_upload,
+    generate_presigned_upload_part_urls,
+    max_multipart_upload_bytes,
+    upload_s3_fileobj,
+    upload_s3_fileobjs,
+)
 from files_api.schemas import (
+    AbortUploadRequest,
+    BulkDeleteRequest,
+    BulkDeleteResult,
+    BulkUploadResponse,
+    BulkUploadResult,
+    CompleteUploadRequest,
+    CreateUploadRequest,
+    CreateUploadResponse,
     DeleteFileResponse,
+    DirectoryUsage,
+    DirectoryUsageParams,
+    DirectoryUsageResponse,
+    FileChange,
     FileMetadata,
+    GetChangesQueryParams,
+    GetChangesResponse,
     GetFilesQueryParams,
     GetFilesResponse,
+    LATEST_CHANGES_CURSOR,
     PutFileResponse,
+    QueryFilesParams,
+    QueryFilesResponse,
+    decode_cursor_page_token,
+    decode_directory_page_token,
+    encode_cursor_page_token,
+    encode_directory_page_token,
+    UploadPartUrl,
+    UploadPartUrlsRequest,
+    UploadPartUrlsResponse,
 )
 from files_api.settings import Settings
+from files_api.streams import BlockingStreamReader
 from botocore.exceptions import ClientError
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.types import (
+    Receive,
+    Scope,
+    Send,
+)
+
+try:
+    from botocore.response import StreamingBody
+    from mypy_boto3_s3 import S3Client
+    from mypy_boto3_s3.type_defs import ObjectTypeDef
+except ImportError:
+    ...
 
 ROUTER = APIRouter()
 
+# botocore streams bodies in 1 KiB chunks by default; larger chunks mean far fewer thread hops
+DOWNLOAD_CHUNK_SIZE_BYTES = 256 * 1024
+
+
 # ROUTER WORKS like FastAPI Routes
 @ROUTER.put("/files/{file_path:path}")
 async def upload_file(request: Request,
                       file_path: str,
                       file: UploadFile,
-                      response: Response
+                      response: Response,
+                      s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+                      s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+                      metadata_cache: Optional[ObjectMetadataCache] = Depends(get_metadata_cache),  # noqa: B008
                       ) -> PutFileResponse:
     """
     Uploads a file to the specified S3 bucket. If the file already
     exists, it is updated; otherwise, a new file is created.
 
+    The file is streamed from the upload's spool file to S3 (as a multipart upload
+    above `settings.s3_multipart_threshold_bytes`) rather than read into memory.
+
     Returns a response indicating the status of the upload.
     """
     settings: Settings = request.app.state.settings
+    if file.size is not None and file.size > max_multipart_upload_bytes(settings.s3_multipart_part_size_bytes):
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="The file is too large for a multipart upload with the configured part size",
+        )
 
-    file_contents: bytes = await file.read()
-
-    object_already_exists_at_path = object_exists_in_s3(settings.s3_bucket_name, object_key=file_path)
-    if object_already_exists_at_path:
-        message = f"Existing file updated at path: /{file_path}"
-        response.status_code = status.HTTP_200_OK
-    else:
-        message = f"New file uploaded at path: /{file_path}"
-        response.status_code = status.HTTP_201_CREATED
-
-    upload_s3_object(
+    created = await s3_thread_pool.run(
+        upload_s3_fileobj,
         bucket_name=settings.s3_bucket_name,
         object_key=file_path,
-        file_content=file_contents,
+        fileobj=file.file,
         content_type=file.content_type,
+        multipart_threshold=settings.s3_multipart_threshold_bytes,
+        part_size=settings.s3_multipart_part_size_bytes,
+        max_concurrency=settings.s3_multipart_max_concurrency,
+        conditional_writes=settings.s3_conditional_writes,
+        s3_client=s3_client,
+        metadata_cache=metadata_cache,
     )
+    if created:
+        message = f"New file uploaded at path: /{file_path}"
+        response.status_code = status.HTTP_201_CREATED
+    else:
+        message = f"Existing file updated at path: /{file_path}"
+        response.status_code = status.HTTP_200_OK
 
     return PutFileResponse(
         file_path=f"{file_path}",
         message=message
     )
 
+
 @ROUTER.get("/files")
 async def list_files(
     request: Request,
     query_params: GetFilesQueryParams = Depends(),  # noqa: B008
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+    metadata_cache: Optional[ObjectMetadataCache] = Depends(get_metadata_cache),  # noqa: B008
+    listing_index: Optional[ObjectListingIndex] = Depends(get_listing_index),  # noqa: B008
 ) -> GetFilesResponse:
     """
     List files with pagination.
+
+    When the local listing index is enabled and built, recursive listings are answered from
+    it without calling S3, which also allows jumping to any page with `offset` and counting
+    the files of a directory with `include_count=true`. Its page tokens resume after the last
+    file listed, so they keep working if the index is unavailable and S3 is listed instead.
+
+    With `recursive=false`, only the files directly in `directory` are listed, next to its
+    subdirectories in `directories`; S3 rolls up everything below them, so browsing a level of
+    a deep tree takes one call per page instead of walking the whole subtree. A directory's
+    page counts both files and subdirectories against `page_size`.
+
+    With `include_metadata=true`, each listed file is enriched with its content type, ETag and
+    user metadata; this costs one HEAD per file, made concurrently.
     """
     settings: Settings = request.app.state.settings
 
-    if query_params.page_token:
-        files, next_page_token = fetch_s3_objects_using_page_token(
+    directories: Optional[list[str]] = None
+    total_count: Optional[int] = None
+    directory_page = decode_directory_page_token(query_params.page_token) if query_params.page_token else None
+    cursor_page = decode_cursor_page_token(query_params.page_token) if query_params.page_token else None
+    index_is_ready = listing_index is not None and listing_index.ready
+    if directory_page is not None or not query_params.recursive:
+        if directory_page is not None:
+            directory, continuation_token, page_size = directory_page
+        else:
+            directory, continuation_token, page_size = query_params.directory or "", None, query_params.page_size
+            # "a/b" browses the same directory as "a/b/", not the siblings starting with "a/b"
+            if directory and not directory.endswith("/"):
+                directory += "/"
+        files, directories, continuation_token = await s3_thread_pool.run(
+            fetch_s3_directory_listing,
+            bucket_name=settings.s3_bucket_name,
+            prefix=directory,
+            max_keys=page_size,
+            continuation_token=continuation_token,
+            s3_client=s3_client,
+        )
+        next_page_token = (
+            encode_directory_page_token(directory, continuation_token, page_size) if continuation_token else None
+        )
+    elif index_is_ready and (cursor_page is not None or not query_params.page_token):
+        if cursor_page is not None:
+            directory, start_after, page_size = cursor_page
+        else:
+            directory, start_after, page_size = query_params.directory or "", None, query_params.page_size
+        # one extra row tells whether there is a next page
+        indexed_objects = await s3_thread_pool.run(
+            listing_index.list_objects,
+            prefix=directory,
+            start_after=start_after,
+            offset=query_params.offset or 0,
+            limit=page_size + 1,
+        )
+        files = [
+            {"Key": indexed.key, "LastModified": indexed.last_modified, "Size": indexed.size_bytes}
+            for indexed in indexed_objects[:page_size]
+        ]
+        next_page_token = (
+            encode_cursor_page_token(directory, files[-1]["Key"], page_size)
+            if len(indexed_objects) > page_size
+            else None
+        )
+        if query_params.include_count:
+            total_count = await s3_thread_pool.run(listing_index.count, prefix=directory)
+    elif query_params.offset is not None or query_params.include_count:
+        raise_for_unavailable_listing_index(listing_index, feature="offset and include_count")
+    elif cursor_page is not None:
+        directory, start_after, page_size = cursor_page
+        files, next_page_token = await s3_thread_pool.run(
+            fetch_s3_objects_metadata,
+            bucket_name=settings.s3_bucket_name,
+            prefix=directory,
+            max_keys=page_size,
+            start_after=start_after,
+            s3_client=s3_client,
+        )
+    elif query_params.page_token:
+        files, next_page_token = await s3_thread_pool.run(
+            fetch_s3_objects_using_page_token,
             bucket_name=settings.s3_bucket_name,
             continuation_token=query_params.page_token,
             max_keys=query_params.page_size,
+            s3_client=s3_client,
         )
     else:
-        files, next_page_token = fetch_s3_objects_metadata(
+        files, next_page_token = await s3_thread_pool.run(
+            fetch_s3_objects_metadata,
             bucket_name=settings.s3_bucket_name,
             prefix=query_params.directory,
             max_keys=query_params.page_size,
+            s3_client=s3_client,
         )
 
     file_metadata_objs = [
@@ -115,55 +348,387 @@ async def list_files(
         )
         for item in files
     ]
-    return GetFilesResponse(files=file_metadata_objs, next_page_token=next_page_token if next_page_token else None)
+    if query_params.include_metadata:
+        all_object_metadata = await asyncio.gather(
+            *(
+                s3_thread_pool.run(
+                    fetch_s3_object_metadata,
+                    settings.s3_bucket_name,
+                    object_key=item["Key"],
+                    s3_client=s3_client,
+                    metadata_cache=metadata_cache,
+                )
+                for item in files
+            )
+        )
+        for file_metadata, object_metadata in zip(file_metadata_objs, all_object_metadata):
+            # the object may have been deleted between the listing and the HEAD
+            if object_metadata is not None:
+                file_metadata.content_type = object_metadata.content_type
+                file_metadata.etag = object_metadata.etag
+                file_metadata.user_metadata = object_metadata.user_metadata
+
+    return GetFilesResponse(
+        files=file_metadata_objs,
+        directories=directories,
+        total_count=total_count,
+        next_page_token=next_page_token if next_page_token else None,
+    )
+
+
+@ROUTER.get("/query")
+async def query_files(
+    query_params: QueryFilesParams = Depends(),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+    listing_index: Optional[ObjectListingIndex] = Depends(get_listing_index),  # noqa: B008
+) -> QueryFilesResponse:
+    """
+    Find files by size, modification time and extension, sorted, e.g. the largest or oldest ones.
+
+    For example, the 20 largest files under `models/` modified in the last week:
+    `GET /query?directory=models/&modified_after=<a week ago>&sort_by=size_bytes&order=desc&limit=20`.
+
+    Queries are answered from the local listing index, which keeps the listing of the bucket
+    indexed by size and modification time, so only the matching files are read and returned
+    instead of the whole listing; the bucket is not scanned per query.
+    """
+    if listing_index is None or not listing_index.ready:
+        raise_for_unavailable_listing_index(listing_index, feature="queries")
+
+    indexed_objects = await s3_thread_pool.run(
+        listing_index.query,
+        prefix=query_params.directory,
+        extensions=query_params.extension_list,
+        min_size_bytes=query_params.min_size_bytes,
+        max_size_bytes=query_params.max_size_bytes,
+        modified_after=query_params.modified_after,
+        modified_before=query_params.modified_before,
+        sort_by="key" if query_params.sort_by == "file_path" else query_params.sort_by,
+        descending=query_params.order == "desc",
+        limit=query_params.limit,
+    )
+    return QueryFilesResponse(
+        files=[
+            FileMetadata(file_path=indexed.key, last_modified=indexed.last_modified, size_bytes=indexed.size_bytes)
+            for indexed in indexed_objects
+        ]
+    )
+
+
+@ROUTER.get("/usage")
+async def get_directory_usage(
+    query_params: DirectoryUsageParams = Depends(),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+    listing_index: Optional[ObjectListingIndex] = Depends(get_listing_index),  # noqa: B008
+) -> DirectoryUsageResponse:
+    """
+    Report the number and total size of the files under a directory (the whole bucket by default).
+
+    The response also breaks the directory down into the files directly in it and its largest
+    immediate subdirectories, so a client can drill down one level per request.
+
+    The totals are kept by the local listing index for every directory and updated with each
+    upload and delete made through this service, so a directory's usage is looked up rather
+    than summed over its files; the bucket is not scanned per request.
+    """
+    if listing_index is None or not listing_index.ready:
+        raise_for_unavailable_listing_index(listing_index, feature="directory usage reports")
+
+    usage = await s3_thread_pool.run(listing_index.usage, query_params.directory)
+    subdirectories = await s3_thread_pool.run(
+        listing_index.subdirectory_usage, query_params.directory, limit=query_params.limit
+    )
+    return DirectoryUsageResponse(
+        directory=usage.directory,
+        file_count=usage.object_count,
+        total_bytes=usage.total_bytes,
+        direct_file_count=usage.file_count,
+        direct_bytes=usage.file_bytes,
+        subdirectories=[
+            DirectoryUsage(
+                directory=subdirectory.directory,
+                file_count=subdirectory.object_count,
+                total_bytes=subdirectory.total_bytes,
+            )
+            for subdirectory in subdirectories
+        ],
+    )
+
+
+@ROUTER.get("/changes")
+async def get_changes(
+    query_params: GetChangesQueryParams = Depends(),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+    change_journal: Optional[ChangeJournal] = Depends(get_change_journal),  # noqa: B008
+) -> GetChangesResponse:
+    """
+    Return the files written and deleted through this service since a cursor, oldest first.
+
+    A client syncs a directory by listing it once (`GET /inventory`) after taking a cursor with
+    `GET /changes?since=latest`, and from then on only reads the changes after its last
+    cursor: `GET /changes?since=<cursor>&directory=<directory>`, until `has_more` is false.
+    Each changed file is returned once, with its latest change, so a sync costs one entry per
+    file changed since rather than a listing of the whole directory.
+
+    Without `since`, every change still in the journal is returned, with a cursor to go on from.
+
+    Only changes made through this service are journaled. A 410 means the changes after the
+    cursor are no longer known, e.g. deletes older than the retention period were dropped or
+    the journal was lost in a restart; the client must list the directory again.
+    """
+    if change_journal is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="incremental sync needs the change journal, which is disabled",
+        )
+
+    if query_params.since == LATEST_CHANGES_CURSOR:
+        cursor = await s3_thread_pool.run(change_journal.latest_cursor)
+        return GetChangesResponse(changes=[], cursor=cursor, has_more=False)
+    try:
+        changes, cursor = await s3_thread_pool.run(
+            change_journal.changes_since,
+            query_params.since,
+            prefix=query_params.directory,
+            limit=query_params.limit,
+        )
+    except CursorExpiredError as err:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"{err}; list the files again and sync from GET /changes?since={LATEST_CHANGES_CURSOR}",
+        ) from err
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err)) from err
+    return GetChangesResponse(
+        changes=[
+            FileChange(
+                file_path=change.key,
+                change="delete" if change.deleted else "put",
+                etag=change.etag,
+                changed_at=change.changed_at,
+            )
+            for change in changes
+        ],
+        cursor=cursor,
+        has_more=len(changes) == query_params.limit,
+    )
+
+
+@ROUTER.get("/inventory")
+async def export_inventory(
+    request: Request,
+    directory: str = "",
+    start_after: Optional[str] = None,
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+) -> StreamingResponse:
+    """
+    Export the listing of every file under a directory (the whole bucket by default) in one response.
+
+    Streams newline-delimited JSON, one line per file in key order, e.g.
+    `{"file_path":"a.txt","last_modified":"2024-01-01T00:00:00Z","size_bytes":3,"etag":"\\"...\\""}`.
+    S3 is paged internally at 1000 keys per call, with `settings.s3_listing_max_concurrency` key
+    ranges listed at once and only a few pages of each ahead of the serializer, so memory use
+    stays constant however large the bucket is. An interrupted export can be resumed with
+    `start_after` set to the last `file_path` received.
+    """
+    settings: Settings = request.app.state.settings
+
+    pages = iter_s3_object_pages_in_parallel(
+        settings.s3_bucket_name,
+        prefix=directory,
+        start_after=start_after,
+        max_concurrency=settings.s3_listing_max_concurrency,
+        s3_client=s3_client,
+    )
+    return StreamingResponse(content=stream_inventory(pages, s3_thread_pool), media_type="application/x-ndjson")
+
 
 @ROUTER.head("/files/{file_path:path}")
 async def get_file_metadata(request: Request,
                             file_path: str,
-                            response: Response
+                            response: Response,
+                            s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+                            s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+                            metadata_cache: Optional[ObjectMetadataCache] = Depends(get_metadata_cache),  # noqa: B008
                             ) -> Response:
     """
     Retrieve file metadata.
 
+    Answers 304 Not Modified when `If-None-Match` or `If-Modified-Since` show that the
+    client's copy is current.
+
     Note: by convention, HEAD requests MUST NOT return a body in the response.
     """
     try:
         settings: Settings = request.app.state.settings
-        get_object_response = fetch_s3_object(settings.s3_bucket_name, object_key=file_path)
-        response.headers["Content-Type"] = get_object_response["ContentType"]
-        response.headers["Content-Length"] = str(get_object_response["ContentLength"])
-        response.headers["Last-Modified"] = get_object_response["LastModified"].strftime("%a, %d %b %Y %H:%M:%S GMT")
-        response.status_code = status.HTTP_200_OK
-        return response
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "NoSuchKey":
-            raise HTTPException(status_code=404, detail="File not found")
-        else:
-            raise HTTPException(status_code=500, detail="Internal Server Error")
+        object_metadata = await s3_thread_pool.run(
+            fetch_s3_object_metadata,
+            settings.s3_bucket_name,
+            object_key=file_path,
+            s3_client=s3_client,
+            metadata_cache=metadata_cache,
+        )
+    except ClientError:
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+    if object_metadata is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if is_not_modified(
+        request.headers.get("If-None-Match"),
+        request.headers.get("If-Modified-Since"),
+        etag=object_metadata.etag,
+        last_modified=object_metadata.last_modified,
+    ):
+        return not_modified_response(object_metadata.etag, format_http_date(object_metadata.last_modified))
+
+    response.headers["Content-Type"] = object_metadata.content_type
+    response.headers["Content-Length"] = str(object_metadata.size_bytes)
+    response.headers["Last-Modified"] = format_http_date(object_metadata.last_modified)
+    response.headers["ETag"] = object_metadata.etag
+    response.headers["Accept-Ranges"] = "bytes"
+    response.status_code = status.HTTP_200_OK
+    return response
 
 
 @ROUTER.get("/files/{file_path:path}")
 async def get_file(
     request: Request,
     file_path: str,
-) -> StreamingResponse:
+    redirect: bool = False,
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+    metadata_cache: Optional[ObjectMetadataCache] = Depends(get_metadata_cache),  # noqa: B008
+    body_cache: Optional[ObjectBodyCache] = Depends(get_body_cache),  # noqa: B008
+) -> Response:
     """
     Retrieve a file.
+
+    With `settings.download_redirects` enabled, the body is not served by this API at all:
+    the response is a 307 redirect to a short-lived presigned S3 URL, so the client downloads
+    straight from S3 (sending its `Range` and conditional headers there). This happens when
+    the client asks for it with `?redirect=true`, without any S3 call, or when the file is
+    larger than `settings.download_redirect_threshold_bytes`, as known from the (cached) metadata.
+
+    A single byte range can be requested with a `Range` header (optionally guarded by
+    `If-Range`); only that slice is read from S3 and it is returned as a 206.
+
+    When the local body cache is enabled, small enough files are served from local disk as
+    long as their ETag (from the metadata cache or a HEAD) still matches the cached copy.
+    Files the metadata cache already knows to be too large to cache, and byte ranges of files
+    that are not cached, are read from S3 without that HEAD, and ranges are never cached.
+
+    `If-None-Match` and `If-Modified-Since` are answered with a 304 Not Modified and no body
+    when the client's copy is current. They are evaluated locally if the file's metadata is
+    already known (body cache enabled, or a fresh metadata cache entry), and otherwise
+    forwarded to S3 with the GET.
     """
     # 2 - Internal Server Error:
         # Error Case: Not authenticated/authorized to access object to make calls to AWS
         # Error Case: Access to AWS but non-existent bucket
 
     settings: Settings = request.app.state.settings
+    if_none_match = request.headers.get("If-None-Match")
+    if_modified_since = request.headers.get("If-Modified-Since")
+    byte_range = parse_single_byte_range(request.headers.get("Range"))
+
+    if redirect and settings.download_redirects:
+        return presigned_redirect_response(settings, file_path, s3_client)
+
+    use_body_cache = body_cache is not None and should_use_body_cache(
+        body_cache, settings.s3_bucket_name, file_path, byte_range, metadata_cache
+    )
+    object_metadata: Optional[S3ObjectMetadata] = None
+    # the body cache and the redirect threshold both decide based on the file's metadata
+    if use_body_cache or settings.download_redirects:
+        object_metadata = await s3_thread_pool.run(
+            fetch_s3_object_metadata,
+            settings.s3_bucket_name,
+            object_key=file_path,
+            s3_client=s3_client,
+            metadata_cache=metadata_cache,
+        )
+        if object_metadata is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    elif metadata_cache is not None and (if_none_match is not None or if_modified_since is not None):
+        # a miss (or a cached "missing") leaves the conditional to S3
+        _, object_metadata = metadata_cache.get(settings.s3_bucket_name, file_path)
 
-    object_exists = object_exists_in_s3(bucket_name=settings.s3_bucket_name, object_key=file_path)
-    if not object_exists:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    if object_metadata is not None and is_not_modified(
+        if_none_match, if_modified_since, etag=object_metadata.etag, last_modified=object_metadata.last_modified
+    ):
+        return not_modified_response(object_metadata.etag, format_http_date(object_metadata.last_modified))
 
-    get_object_response = fetch_s3_object(settings.s3_bucket_name, object_key=file_path)
+    if (
+        settings.download_redirects
+        and object_metadata is not None
+        and object_metadata.size_bytes > settings.download_redirect_threshold_bytes
+    ):
+        return presigned_redirect_response(settings, file_path, s3_client)
+
+    if use_body_cache and object_metadata is not None:
+        if byte_range is None:
+            cached_body = await s3_thread_pool.run(
+                body_cache.acquire_or_download, settings.s3_bucket_name, object_metadata, s3_client=s3_client
+            )
+        else:
+            cached_body = body_cache.acquire(settings.s3_bucket_name, object_metadata)
+        if cached_body is not None:
+            return CachedBodyResponse(cached_body, object_metadata, body_cache, s3_thread_pool)
+
+    # If-None-Match takes precedence, and S3 would otherwise answer 304 if either condition held
+    forwarded_if_modified_since = (
+        parse_http_date(if_modified_since) if if_none_match is None and if_modified_since is not None else None
+    )
+
+    # a single GET; a missing key surfaces as NoSuchKey instead of needing a HEAD first
+    try:
+        get_object_response = await s3_thread_pool.run(
+            fetch_s3_object,
+            settings.s3_bucket_name,
+            object_key=file_path,
+            s3_client=s3_client,
+            byte_range=byte_range,
+            if_none_match=if_none_match,
+            if_modified_since=forwarded_if_modified_since,
+        )
+        if_range = request.headers.get("If-Range")
+        if byte_range is not None and if_range is not None and not if_range_matches(
+            if_range, etag=get_object_response["ETag"], last_modified=get_object_response["LastModified"]
+        ):
+            # the file changed since the client's partial download started: send all of it
+            get_object_response["Body"].close()
+            get_object_response = await s3_thread_pool.run(
+                fetch_s3_object, settings.s3_bucket_name, object_key=file_path, s3_client=s3_client
+            )
+    except ClientError as err:
+        if err.response["Error"]["Code"] == "304":
+            s3_headers = err.response["ResponseMetadata"]["HTTPHeaders"]
+            return not_modified_response(s3_headers.get("etag"), s3_headers.get("last-modified"))
+        if err.response["Error"]["Code"] == "NoSuchKey":
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+        if err.response["Error"]["Code"] == "InvalidRange":
+            headers = {"Content-Range": f"bytes */{err.response['Error'].get('ActualObjectSize', '*')}"}
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Requested range not satisfiable",
+                headers=headers,
+            )
+        raise
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(get_object_response["ContentLength"]),
+        "ETag": get_object_response["ETag"],
+        "Last-Modified": format_http_date(get_object_response["LastModified"]),
+    }
+    if "ContentRange" in get_object_response:
+        headers["Content-Range"] = get_object_response["ContentRange"]
     return StreamingResponse(
-        content=get_object_response["Body"],
+        content=stream_s3_body(get_object_response["Body"], s3_thread_pool),
+        status_code=status.HTTP_206_PARTIAL_CONTENT if "ContentRange" in get_object_response else status.HTTP_200_OK,
         media_type=get_object_response["ContentType"],
+        headers=headers,
     )
 
 
@@ -172,6 +737,10 @@ async def delete_file(
     request: Request,
     file_path: str,
     response: Response,
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+    metadata_cache: Optional[ObjectMetadataCache] = Depends(get_metadata_cache),  # noqa: B008
+    body_cache: Optional[ObjectBodyCache] = Depends(get_body_cache),  # noqa: B008
 ) -> Response:
     """
     Delete a file.
@@ -180,13 +749,503 @@ async def delete_file(
 
     settings: Settings = request.app.state.settings
     try:
-        # Check if file exists before trying to delete
-        if not object_exists_in_s3(bucket_name=settings.s3_bucket_name, object_key=file_path):
+        # Check if file exists before trying to delete: S3's DeleteObject succeeds for
+        # missing keys too, so this HEAD is the only way to answer 404. It bypasses the
+        # metadata cache, which may not have seen a change made by another writer.
+        object_exists = await s3_thread_pool.run(
+            object_exists_in_s3,
+            bucket_name=settings.s3_bucket_name,
+            object_key=file_path,
+            s3_client=s3_client,
+        )
+        if not object_exists:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
 
         # Proceed with file deletion
-        delete_s3_object(settings.s3_bucket_name, object_key=file_path)
+        await s3_thread_pool.run(
+            delete_s3_object,
+            settings.s3_bucket_name,
+            object_key=file_path,
+            s3_client=s3_client,
+            metadata_cache=metadata_cache,
+        )
+        if body_cache is not None:
+            await s3_thread_pool.run(body_cache.discard, settings.s3_bucket_name, file_path)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     except ClientError as e:
         # Handle any unexpected AWS errors (e.g., permissions, network errors, etc.)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error during file deletion")
+
+
+@ROUTER.post("/bulk/delete")
+async def bulk_delete_files(
+    request: Request,
+    bulk_delete_request: BulkDeleteRequest,
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+    metadata_cache: Optional[ObjectMetadataCache] = Depends(get_metadata_cache),  # noqa: B008
+    body_cache: Optional[ObjectBodyCache] = Depends(get_body_cache),  # noqa: B008
+) -> StreamingResponse:
+    """
+    Delete a list of files, or every file under a directory, with `DeleteObjects` requests of up to 1000 keys.
+
+    The outcome for each file is streamed back as newline-delimited JSON (one `BulkDeleteResult`
+    per line) as batches complete, so arbitrarily large directories can be deleted without
+    buffering the results. Deleting a file that does not exist counts as a success.
+    """
+    settings: Settings = request.app.state.settings
+
+    if bulk_delete_request.file_paths is not None:
+        object_keys: Iterator[str] = iter(bulk_delete_request.file_paths)
+    else:
+        object_keys = iter_s3_object_keys(
+            settings.s3_bucket_name, prefix=bulk_delete_request.directory, s3_client=s3_client
+        )
+    batch_results = delete_s3_objects(
+        settings.s3_bucket_name,
+        object_keys,
+        max_concurrency=settings.s3_bulk_delete_max_concurrency,
+        s3_client=s3_client,
+        metadata_cache=metadata_cache,
+    )
+    return StreamingResponse(
+        content=stream_bulk_delete_results(batch_results, s3_thread_pool, body_cache, settings.s3_bucket_name),
+        media_type="application/x-ndjson",
+    )
+
+
+@ROUTER.post("/bulk/upload/{directory:path}")
+async def bulk_upload_files(
+    request: Request,
+    directory: str,
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+    metadata_cache: Optional[ObjectMetadataCache] = Depends(get_metadata_cache),  # noqa: B008
+) -> BulkUploadResponse:
+    """
+    Upload many files under a directory in one request.
+
+    The body is either a `multipart/form-data` form with any number of `files` fields (each
+    file's name, which may contain slashes, is its path under the directory), or a tar stream
+    (optionally gzip/bz2/xz compressed) whose regular files are uploaded at their archive paths.
+    Tar streams are uploaded while the body is still arriving. Up to
+    `settings.s3_bulk_upload_max_concurrency` files are uploaded at the same time.
+
+    Returns a manifest saying, per file, whether it was created, updated, or failed. If a tar
+    stream turns out to be malformed, the files before the damage may already have been uploaded.
+    Paths that lead out of the directory (e.g. "../x") are rejected with a 422 for a form, and
+    reported as failed for a tar stream, whose other files are still uploaded.
+    """
+    settings: Settings = request.app.state.settings
+    media_type = request.headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+    def upload_all(files: Iterator[tuple[str, BinaryIO, Optional[str]]]) -> list[UploadObjectResult]:
+        rejected: list[UploadObjectResult] = []
+
+        def files_under_directory() -> Iterator[tuple[str, BinaryIO, Optional[str]]]:
+            for file_path, fileobj, content_type in files:
+                relative_path = safe_relative_path(file_path)
+                if relative_path is None:
+                    fileobj.close()
+                    rejected.append(
+                        UploadObjectResult(
+                            key=file_path,
+                            created=None,
+                            error_code="InvalidPath",
+                            error_message="The path leads out of the directory",
+                        )
+                    )
+                    continue
+                yield posixpath.join(directory, relative_path), fileobj, content_type
+
+        uploaded = list(
+            upload_s3_fileobjs(
+                settings.s3_bucket_name,
+                files_under_directory(),
+                max_concurrency=settings.s3_bulk_upload_max_concurrency,
+                multipart_threshold=settings.s3_multipart_threshold_bytes,
+                part_size=settings.s3_multipart_part_size_bytes,
+                multipart_max_concurrency=settings.s3_multipart_max_concurrency,
+                conditional_writes=settings.s3_conditional_writes,
+                s3_client=s3_client,
+                metadata_cache=metadata_cache,
+            )
+        )
+        return uploaded + rejected
+
+    if media_type == "multipart/form-data":
+        # Starlette spools the files of a form to temporary files before the route runs
+        async with request.form(max_files=settings.bulk_upload_max_form_files) as form:
+            uploads = [
+                (upload.filename, upload.file, upload.content_type)
+                for upload in form.getlist("files")
+                if isinstance(upload, StarletteUploadFile) and upload.filename
+            ]
+            for file_path, _, _ in uploads:
+                if safe_relative_path(file_path) is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail=f"File name leads out of the directory: {file_path}",
+                    )
+            results = await s3_thread_pool.run(upload_all, iter(uploads))
+    elif media_type in TAR_MEDIA_TYPES:
+        tar_stream = BlockingStreamReader(request.stream())
+        try:
+            results = await s3_thread_pool.run(
+                upload_all, iter_tar_files(tar_stream, spool_max_bytes=settings.s3_multipart_threshold_bytes)
+            )
+        except tarfile.TarError as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid tar stream: {err}")
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Expected a multipart/form-data body or a tar stream",
+        )
+
+    return BulkUploadResponse(
+        files=sorted(
+            (
+                BulkUploadResult(
+                    file_path=result.key,
+                    status="failed" if result.created is None else "created" if result.created else "updated",
+                    error_code=result.error_code,
+                    error_message=result.error_message,
+                )
+                for result in results
+            ),
+            key=lambda bulk_upload_result: bulk_upload_result.file_path,
+        )
+    )
+
+
+@ROUTER.get("/archive/{directory:path}")
+async def download_archive(
+    request: Request,
+    directory: str,
+    archive_format: Literal["zip", "tar"] = Query("zip", alias="format"),
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+) -> StreamingResponse:
+    """
+    Download every file under a directory as a single uncompressed zip (default) or tar archive.
+
+    The archive is written while it streams: the listing is paged lazily, and the next
+    `settings.archive_prefetch_objects` small files are downloaded ahead so the archive
+    writer is not waiting on an S3 round trip per file. Files larger than
+    `settings.archive_max_prefetch_bytes` are streamed through when reached, so memory use
+    does not depend on the size of the directory. Files keep their full path in the archive.
+    """
+    settings: Settings = request.app.state.settings
+
+    object_bodies = iter_s3_object_bodies(
+        settings.s3_bucket_name,
+        iter_s3_objects(
+            settings.s3_bucket_name,
+            prefix=directory,
+            max_concurrency=settings.s3_listing_max_concurrency,
+            s3_client=s3_client,
+        ),
+        prefetch=settings.archive_prefetch_objects,
+        max_prefetch_bytes=settings.archive_max_prefetch_bytes,
+        s3_client=s3_client,
+    )
+    archive_files = (
+        (object_body.key, object_body.size_bytes, object_body.last_modified, object_body.chunks)
+        for object_body in object_bodies
+    )
+    write_archive = iter_zip_archive if archive_format == "zip" else iter_tar_archive
+    archive_name = f"{posixpath.basename(directory.rstrip('/')) or 'files'}.{archive_format}"
+    return StreamingResponse(
+        content=s3_thread_pool.iterate(write_archive(archive_files)),
+        media_type=ARCHIVE_MEDIA_TYPES[archive_format],
+        headers={"Content-Disposition": content_disposition_attachment(archive_name)},
+    )
+
+
+@ROUTER.post("/uploads")
+async def create_upload(
+    request: Request,
+    create_upload_request: CreateUploadRequest,
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+) -> CreateUploadResponse:
+    """
+    Start a multipart upload whose parts the client sends straight to S3.
+
+    The flow is: `POST /uploads` for an upload ID, `POST /uploads/parts` for presigned part
+    URLs, a PUT of each part to its URL (in parallel, keeping the `ETag` S3 answers with),
+    and finally `POST /uploads/complete` with the part ETags, or `POST /uploads/abort`.
+    No file bytes pass through this API.
+    """
+    settings: Settings = request.app.state.settings
+    upload_id = await s3_thread_pool.run(
+        create_s3_multipart_upload,
+        settings.s3_bucket_name,
+        object_key=create_upload_request.file_path,
+        content_type=create_upload_request.content_type,
+        s3_client=s3_client,
+    )
+    return CreateUploadResponse(file_path=create_upload_request.file_path, upload_id=upload_id)
+
+
+@ROUTER.post("/uploads/parts")
+async def create_upload_part_urls(
+    request: Request,
+    upload_part_urls_request: UploadPartUrlsRequest,
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+) -> UploadPartUrlsResponse:
+    """
+    Presign a URL for each requested part number of a multipart upload.
+
+    Parts other than the last must be at least 5 MiB. Signing is local, so an unknown upload
+    ID is only reported by S3 when the part is PUT.
+    """
+    settings: Settings = request.app.state.settings
+    # presigning is a local HMAC computation, so it does not need the S3 thread pool
+    part_urls = generate_presigned_upload_part_urls(
+        settings.s3_bucket_name,
+        object_key=upload_part_urls_request.file_path,
+        upload_id=upload_part_urls_request.upload_id,
+        part_numbers=upload_part_urls_request.part_numbers,
+        expires_in_seconds=settings.upload_part_url_expires_seconds,
+        s3_client=s3_client,
+    )
+    return UploadPartUrlsResponse(
+        parts=[UploadPartUrl(part_number=part_number, url=url) for part_number, url in part_urls.items()],
+        expires_in_seconds=settings.upload_part_url_expires_seconds,
+    )
+
+
+@ROUTER.post("/uploads/complete")
+async def complete_upload(
+    request: Request,
+    complete_upload_request: CompleteUploadRequest,
+    response: Response,
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+    metadata_cache: Optional[ObjectMetadataCache] = Depends(get_metadata_cache),  # noqa: B008
+) -> PutFileResponse:
+    """
+    Assemble the uploaded parts into the file.
+
+    Like `PUT /files/{file_path}`, answers 201 if the file was created and 200 if an
+    existing file was replaced.
+    """
+    settings: Settings = request.app.state.settings
+    file_path = complete_upload_request.file_path
+    try:
+        created = await s3_thread_pool.run(
+            complete_s3_multipart_upload,
+            settings.s3_bucket_name,
+            object_key=file_path,
+            upload_id=complete_upload_request.upload_id,
+            parts=[{"PartNumber": part.part_number, "ETag": part.etag} for part in complete_upload_request.parts],
+            conditional_writes=settings.s3_conditional_writes,
+            s3_client=s3_client,
+            metadata_cache=metadata_cache,
+        )
+    except ClientError as err:
+        raise_for_multipart_upload_error(err)
+        raise
+
+    if created:
+        message = f"New file uploaded at path: /{file_path}"
+        response.status_code = status.HTTP_201_CREATED
+    else:
+        message = f"Existing file updated at path: /{file_path}"
+        response.status_code = status.HTTP_200_OK
+    return PutFileResponse(file_path=file_path, message=message)
+
+
+@ROUTER.post("/uploads/abort")
+async def abort_upload(
+    request: Request,
+    abort_upload_request: AbortUploadRequest,
+    s3_client: "S3Client" = Depends(get_s3_client),  # noqa: B008
+    s3_thread_pool: S3ThreadPool = Depends(get_s3_thread_pool),  # noqa: B008
+) -> Response:
+    """Abort a multipart upload; S3 deletes the parts uploaded so far."""
+    settings: Settings = request.app.state.settings
+    try:
+        await s3_thread_pool.run(
+            abort_s3_multipart_upload,
+            settings.s3_bucket_name,
+            object_key=abort_upload_request.file_path,
+            upload_id=abort_upload_request.upload_id,
+            s3_client=s3_client,
+        )
+    except ClientError as err:
+        raise_for_multipart_upload_error(err)
+        raise
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+def raise_for_unavailable_listing_index(listing_index: Optional[ObjectListingIndex], feature: str) -> NoReturn:
+    """Reject a request that needs the listing index: 400 if it is disabled, 503 while it is being built."""
+    if listing_index is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{feature} need the listing index, which is disabled",
+        )
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"{feature} need the listing index, which is still being built",
+    )
+
+
+def raise_for_multipart_upload_error(err: ClientError) -> None:
+    """Translate the S3 errors caused by a bad multipart upload request into 4xx responses."""
+    error_code = err.response["Error"]["Code"]
+    if error_code == "NoSuchUpload":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    if error_code in ("InvalidPart", "InvalidPartOrder", "EntityTooSmall"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=err.response["Error"].get("Message"))
+
+
+@ROUTER.get("/metrics", include_in_schema=False)
+async def get_metrics_text(metrics: Optional[ApiMetrics] = Depends(get_metrics)) -> PlainTextResponse:  # noqa: B008
+    """Render the app's metrics in the Prometheus text format, or 404 if metrics are disabled."""
+    if metrics is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+async def stream_s3_body(body: "StreamingBody", s3_thread_pool: S3ThreadPool) -> AsyncIterator[bytes]:
+    """Stream an S3 object body chunk by chunk, reading it on the S3 thread pool, and close it when done."""
+    try:
+        async for chunk in s3_thread_pool.iterate(body.iter_chunks(DOWNLOAD_CHUNK_SIZE_BYTES)):
+            yield chunk
+    finally:
+        body.close()
+
+
+class CachedBodyResponse(FileResponse):
+    """
+    Serve a body from the local body cache by its path, then release the cache's lease on it.
+
+    Being a `FileResponse`, it answers `Range` and `If-Range` itself, and is sent without
+    copying the file through Python by servers that support the ASGI `pathsend` extension.
+    The ETag and Last-Modified are S3's, not the local file's.
+    """
+
+    def __init__(
+        self,
+        cached_body: CachedBody,
+        object_metadata: S3ObjectMetadata,
+        body_cache: ObjectBodyCache,
+        s3_thread_pool: S3ThreadPool,
+    ):
+        super().__init__(
+            cached_body.path,
+            media_type=object_metadata.content_type,
+            headers={
+                "ETag": object_metadata.etag,
+                "Last-Modified": format_http_date(object_metadata.last_modified),
+            },
+        )
+        self.cached_body = cached_body
+        self.body_cache = body_cache
+        self.s3_thread_pool = s3_thread_pool
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Send the file, and release the lease however sending ends, e.g. when the client disconnects."""
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # releasing may unlink the file of an entry that left the cache meanwhile
+            await self.s3_thread_pool.run(self.body_cache.release, self.cached_body)
+
+
+def should_use_body_cache(
+    body_cache: ObjectBodyCache,
+    bucket_name: str,
+    file_path: str,
+    byte_range: Optional[str],
+    metadata_cache: Optional[ObjectMetadataCache],
+) -> bool:
+    """
+    Return whether a download may be served from the body cache, which costs a HEAD unless the metadata is cached.
+
+    Not for files the metadata cache knows to be too large to cache, nor for byte ranges of
+    files without a cached body, which are not worth downloading whole.
+    """
+    if byte_range is not None and not body_cache.contains(bucket_name, file_path):
+        return False
+    if metadata_cache is not None:
+        _, object_metadata = metadata_cache.get(bucket_name, file_path)
+        if object_metadata is not None and not body_cache.is_cacheable(object_metadata):
+            return False
+    return True
+
+
+def not_modified_response(etag: Optional[str], last_modified: Optional[str]) -> Response:
+    """Build a bodiless 304 Not Modified response that still identifies the current version of the file."""
+    headers = {"ETag": etag, "Last-Modified": last_modified}
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={name: value for name, value in headers.items() if value is not None},
+    )
+
+
+async def stream_bulk_delete_results(
+    batch_results: Iterator[list[DeleteObjectResult]],
+    s3_thread_pool: S3ThreadPool,
+    body_cache: Optional[ObjectBodyCache],
+    bucket_name: str,
+) -> AsyncIterator[bytes]:
+    """Run a bulk delete on the S3 thread pool and stream its per-file results as JSON lines."""
+    async for results in s3_thread_pool.iterate(batch_results):
+        if body_cache is not None:
+            await s3_thread_pool.run(
+                body_cache.discard, bucket_name, *[result.key for result in results if result.deleted]
+            )
+        lines = []
+        for result in results:
+            bulk_delete_result = BulkDeleteResult(
+                file_path=result.key,
+                deleted=result.deleted,
+                error_code=result.error_code,
+                error_message=result.error_message,
+            )
+            lines.append(bulk_delete_result.model_dump_json(exclude_none=True) + "\n")
+        yield "".join(lines).encode()
+
+
+async def stream_inventory(
+    pages: Iterator[list["ObjectTypeDef"]],
+    s3_thread_pool: S3ThreadPool,
+) -> AsyncIterator[bytes]:
+    """List pages on the S3 thread pool, one ahead, and stream their entries as JSON lines."""
+    async for page in s3_thread_pool.iterate(pages, read_ahead=True):
+        # plain json.dumps: building a pydantic model per file would dominate the cost of large exports
+        yield "".join(
+            json.dumps(
+                {
+                    "file_path": item["Key"],
+                    "last_modified": item["LastModified"].astimezone(timezone.utc).isoformat().replace("+00:00", "Z"),
+                    "size_bytes": item["Size"],
+                    "etag": item.get("ETag"),
+                },
+                separators=(",", ":"),
+            )
+            + "\n"
+            for item in page
+        ).encode()
+
+
+def presigned_redirect_response(settings: Settings, file_path: str, s3_client: "S3Client") -> RedirectResponse:
+    """Redirect the client to download the file straight from S3 with a presigned URL."""
+    # presigning is a local HMAC computation, so it does not need the S3 thread pool
+    presigned_url = generate_presigned_download_url(
+        settings.s3_bucket_name,
+        object_key=file_path,
+        expires_in_seconds=settings.download_redirect_expires_seconds,
+        s3_client=s3_client,
+    )
+    return RedirectResponse(
+        presigned_url,
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        # the URL stops working once it expires, so it must not be reused from a cache
+        headers={"Cache-Control": "no-store"},
+    )
+
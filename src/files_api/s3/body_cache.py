@@ -0,0 +1,225 @@
+"""Local disk cache of S3 object bodies, so hot objects are not streamed from S3 on every download."""
+
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import (
+    dataclass,
+    field,
+)
+from pathlib import Path
+from typing import Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+from files_api.s3.read_objects import S3ObjectMetadata
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    ...
+
+BODY_FILE_SUFFIX = ".body"
+PARTIAL_FILE_SUFFIX = ".part"
+DOWNLOAD_CHUNK_SIZE_BYTES = 1024**2
+# downloads are serialized per stripe of keys, which bounds the number of locks
+NUM_DOWNLOAD_LOCKS = 256
+
+
+@dataclass(eq=False)
+class CachedBody:
+    """A body in the cache, leased to a reader until `ObjectBodyCache.release`."""
+
+    etag: str
+    path: Path
+    size_bytes: int
+    # leases not yet released, and whether the entry left the cache; its file is unlinked once both allow it
+    readers: int = field(default=0, repr=False)
+    removed: bool = field(default=False, repr=False)
+
+
+class ObjectBodyCache:
+    """
+    Read-through LRU cache of object bodies stored as files in a local directory.
+
+    Entries are keyed by bucket, key and ETag, so a cached body is served only while the
+    object's current ETag (cheaply known from a HEAD or the metadata cache) still matches.
+    The total size of cached bodies is capped at `max_bytes`, evicting the least recently
+    used bodies first, and objects larger than `max_object_bytes` are never cached.
+    Concurrent misses on the same object wait for a single download instead of each
+    fetching the body.
+
+    Bodies are served from their path, e.g. by a `FileResponse` that the server can send
+    without copying it through Python. `acquire` and `acquire_or_download` lease the entry
+    until `release`: an entry that is evicted, discarded or replaced while leased leaves the
+    cache (and its size is no longer counted) at once, but its file is only unlinked once the
+    last lease is released. Every download gets a file of its own, so such a file is never
+    replaced by a newer copy of the body.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, max_object_bytes: int):
+        """
+        :param directory: Directory to store bodies in. Bodies left over from a previous run are removed.
+        :param max_bytes: Maximum total size of the cached bodies.
+        :param max_object_bytes: Size of the largest object that is cached.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], CachedBody] = OrderedDict()
+        self._total_bytes = 0
+        self._download_locks = [threading.Lock() for _ in range(NUM_DOWNLOAD_LOCKS)]
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # the index lives in memory, so bodies from a previous run cannot be trusted
+        for pattern in (f"*{BODY_FILE_SUFFIX}", f"*{PARTIAL_FILE_SUFFIX}"):
+            for leftover_path in self.directory.glob(pattern):
+                leftover_path.unlink(missing_ok=True)
+
+    @property
+    def total_bytes(self) -> int:
+        """Total size of the bodies in the cache, not counting removed ones that are still being read."""
+        return self._total_bytes
+
+    def is_cacheable(self, object_metadata: S3ObjectMetadata) -> bool:
+        """Return whether the object is small enough to be cached."""
+        return object_metadata.size_bytes <= min(self.max_object_bytes, self.max_bytes)
+
+    def contains(self, bucket_name: str, object_key: str) -> bool:
+        """Return whether a body of the object is cached, whatever its ETag."""
+        with self._lock:
+            return (bucket_name, object_key) in self._entries
+
+    def acquire(self, bucket_name: str, object_metadata: S3ObjectMetadata) -> Optional[CachedBody]:
+        """
+        Lease the cached body of the object, without downloading it on a miss.
+
+        :param bucket_name: Name of the S3 bucket.
+        :param object_metadata: Current metadata of the object; its ETag selects the cached body.
+
+        :return: The cached body, which the caller must `release`; None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get((bucket_name, object_metadata.key))
+            if entry is None or entry.etag != object_metadata.etag:
+                return None
+            self._entries.move_to_end((bucket_name, object_metadata.key))
+            self.hits += 1
+            entry.readers += 1
+            return entry
+
+    def acquire_or_download(
+        self,
+        bucket_name: str,
+        object_metadata: S3ObjectMetadata,
+        s3_client: Optional["S3Client"] = None,
+    ) -> Optional[CachedBody]:
+        """
+        Lease the cached body of the object, downloading it on a miss.
+
+        :param bucket_name: Name of the S3 bucket.
+        :param object_metadata: Current metadata of the object; its ETag selects the cached body.
+        :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+        :return: The cached body, which the caller must `release`. None if the object is not
+            cacheable or changed in S3 since `object_metadata` was read.
+        """
+        if not self.is_cacheable(object_metadata):
+            return None
+
+        cached_body = self.acquire(bucket_name, object_metadata)
+        if cached_body is not None:
+            return cached_body
+
+        # single flight: the first miss downloads, concurrent misses wait and then hit
+        with self._download_lock(bucket_name, object_metadata.key):
+            cached_body = self.acquire(bucket_name, object_metadata)
+            if cached_body is not None:
+                return cached_body
+            with self._lock:
+                self.misses += 1
+            return self._download(bucket_name, object_metadata, s3_client or boto3.client("s3"))
+
+    def release(self, cached_body: CachedBody) -> None:
+        """End a lease taken by `acquire` or `acquire_or_download`, e.g. once the body has been sent."""
+        with self._lock:
+            cached_body.readers -= 1
+            if cached_body.removed and cached_body.readers == 0:
+                cached_body.path.unlink(missing_ok=True)
+
+    def discard(self, bucket_name: str, *object_keys: str) -> None:
+        """Remove any cached bodies of the objects, e.g. after they were deleted."""
+        with self._lock:
+            for object_key in object_keys:
+                entry = self._entries.pop((bucket_name, object_key), None)
+                if entry is not None:
+                    self._remove(entry)
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache's size and its hit, miss and eviction counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _download_lock(self, bucket_name: str, object_key: str) -> threading.Lock:
+        return self._download_locks[hash((bucket_name, object_key)) % NUM_DOWNLOAD_LOCKS]
+
+    def _download(
+        self, bucket_name: str, object_metadata: S3ObjectMetadata, s3_client: "S3Client"
+    ) -> Optional[CachedBody]:
+        try:
+            # If-Match guarantees that the body belongs to the ETag it is cached under
+            response = s3_client.get_object(Bucket=bucket_name, Key=object_metadata.key, IfMatch=object_metadata.etag)
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ("PreconditionFailed", "NoSuchKey"):
+                return None
+            raise
+
+        # never the name of an earlier download, whose file may still be read after it left the cache
+        path = self.directory / f"{uuid.uuid4().hex}{BODY_FILE_SUFFIX}"
+        # write to a temporary file first so that a partial download is never served
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=PARTIAL_FILE_SUFFIX)
+        try:
+            with os.fdopen(file_descriptor, "wb") as tmp_file, response["Body"] as body:
+                shutil.copyfileobj(body, tmp_file, DOWNLOAD_CHUNK_SIZE_BYTES)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            previous_entry = self._entries.pop((bucket_name, object_metadata.key), None)
+            if previous_entry is not None:
+                self._remove(previous_entry)
+            cached_body = CachedBody(
+                etag=object_metadata.etag, path=path, size_bytes=object_metadata.size_bytes, readers=1
+            )
+            self._entries[(bucket_name, object_metadata.key)] = cached_body
+            self._total_bytes += object_metadata.size_bytes
+            while self._total_bytes > self.max_bytes:
+                _, evicted_entry = self._entries.popitem(last=False)
+                self._remove(evicted_entry)
+                self.evictions += 1
+        return cached_body
+
+    def _remove(self, entry: CachedBody) -> None:
+        # must be called while holding self._lock; the file of a leased entry is unlinked by `release`
+        self._total_bytes -= entry.size_bytes
+        entry.removed = True
+        if entry.readers == 0:
+            entry.path.unlink(missing_ok=True)
@@ -0,0 +1,249 @@
+"""Journal of the writes and deletes this service makes, for clients that sync incrementally."""
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import (
+    datetime,
+    timezone,
+)
+from pathlib import Path
+from typing import (
+    Any,
+    Optional,
+)
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    ...
+
+# request context key under which the key being written or deleted is kept between botocore events
+_JOURNALED_KEY = "files_api_change_journal_key"
+_WRITE_OPERATIONS = ("PutObject", "CompleteMultipartUpload", "CopyObject")
+# replacing a key's entry gives it a new, higher sequence number and removes the old one
+_RECORD_SQL = "INSERT OR REPLACE INTO changes (key, deleted, etag, changed_at) VALUES (?, ?, ?, ?)"
+DEFAULT_TOMBSTONE_RETENTION_SECONDS = 7 * 24 * 60 * 60
+# expired deletes are looked for at most this often
+_COMPACT_INTERVAL_SECONDS = 60.0
+
+
+class CursorExpiredError(Exception):
+    """
+    Raised when the changes after a cursor can no longer be read, and the client must list everything again.
+
+    Either deletes after the cursor have been dropped, or the cursor is from another journal,
+    e.g. an in-memory one from before a restart.
+    """
+
+
+@dataclass(frozen=True)
+class Change:
+    """The latest change to one key, as recorded in the journal."""
+
+    sequence: int
+    key: str
+    deleted: bool
+    # ETag of the written object; None for deletes
+    etag: Optional[str]
+    changed_at: datetime
+
+
+class ChangeJournal:
+    """
+    SQLite journal of the objects this service writes and deletes in one bucket, in the order it made the changes.
+
+    Each change gets the next sequence number, and a client that keeps a cursor to the last
+    change it has seen reads only what changed since, instead of listing everything again.
+    The journal is compacted as it goes: a key keeps only its latest change, so reading from
+    a cursor costs one row per key changed since, however often each one changed. Deletes
+    are kept for `tombstone_retention_seconds` and then dropped; a cursor older than a
+    dropped delete can no longer be served (`CursorExpiredError`).
+
+    Only changes made with clients passed to `instrument` are journaled; objects written to
+    the bucket by anything else are not.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        path: Optional[Path] = None,
+        tombstone_retention_seconds: float = DEFAULT_TOMBSTONE_RETENTION_SECONDS,
+    ):
+        """
+        :param bucket_name: Name of the S3 bucket whose changes are journaled.
+        :param path: SQLite database file, kept across restarts; None keeps the journal in memory.
+        :param tombstone_retention_seconds: How long deletes are kept, i.e. how long a client
+            can go without syncing before it has to list everything again.
+        """
+        self.bucket_name = bucket_name
+        self.tombstone_retention_seconds = tombstone_retention_seconds
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False)
+        self._connection.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS changes (
+                -- AUTOINCREMENT never reuses a number, even that of the last change once it is replaced
+                sequence INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL UNIQUE,
+                deleted INTEGER NOT NULL,
+                etag TEXT,
+                changed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS changes_by_changed_at ON changes (deleted, changed_at);
+            -- id: random, part of every cursor, so cursors of another journal are not mistaken for ours;
+            -- horizon: the highest sequence number of a dropped delete, below which cursors have expired
+            CREATE TABLE IF NOT EXISTS journal (id TEXT NOT NULL, horizon INTEGER NOT NULL);
+            INSERT INTO journal SELECT lower(hex(randomblob(8))), 0 WHERE NOT EXISTS (SELECT * FROM journal);
+            """
+        )
+        self._journal_id = self._connection.execute("SELECT id FROM journal").fetchone()[0]
+        self._last_compacted_at = 0.0
+
+    def instrument(self, s3_client: "S3Client") -> None:
+        """Journal every successful write and delete made with the client."""
+        events = s3_client.meta.events
+        for operation in (*_WRITE_OPERATIONS, "DeleteObject", "DeleteObjects"):
+            events.register(f"before-parameter-build.s3.{operation}", self._on_before_parameter_build)
+        for operation in _WRITE_OPERATIONS:
+            events.register(f"after-call.s3.{operation}", self._on_object_written)
+        events.register("after-call.s3.DeleteObject", self._on_object_deleted)
+        events.register("after-call.s3.DeleteObjects", self._on_objects_deleted)
+
+    def record_write(self, key: str, etag: Optional[str] = None) -> None:
+        """Record that an object was written."""
+        self._record(key, deleted=False, etag=etag)
+
+    def record_delete(self, key: str) -> None:
+        """Record that an object was deleted."""
+        self._record(key, deleted=True, etag=None)
+
+    def changes_since(
+        self, cursor: Optional[str] = None, prefix: str = "", limit: int = 1000
+    ) -> tuple[list[Change], str]:
+        """
+        Return the latest change to each key changed after a cursor, oldest first.
+
+        :param cursor: Cursor returned by an earlier call or by `latest_cursor`; None for every
+            change still in the journal, which never expires: dropped deletes are of keys a
+            client starting from scratch has never seen.
+        :param prefix: Only changes to keys starting with this prefix.
+        :param limit: Maximum number of changes to return.
+
+        :return: The changes, and the cursor to read on from. Fewer than `limit` changes means
+            the client is up to date.
+
+        :raises CursorExpiredError: If the changes after the cursor can no longer be read.
+        :raises ValueError: If the cursor is malformed.
+        """
+        sequence = self._decode_cursor(cursor) if cursor is not None else 0
+        with self._lock:
+            latest_sequence = self._latest_sequence()
+            if cursor is not None and (sequence < self._horizon() or sequence > latest_sequence):
+                raise CursorExpiredError("the changes after this cursor are no longer available")
+            rows = self._connection.execute(
+                "SELECT sequence, key, deleted, etag, changed_at FROM changes "
+                "WHERE sequence > ? AND substr(key, 1, ?) = ? ORDER BY sequence LIMIT ?",
+                (sequence, len(prefix), prefix, limit),
+            ).fetchall()
+        changes = [
+            Change(
+                sequence=row_sequence,
+                key=key,
+                deleted=bool(deleted),
+                etag=etag,
+                changed_at=datetime.fromtimestamp(changed_at, tz=timezone.utc),
+            )
+            for row_sequence, key, deleted, etag, changed_at in rows
+        ]
+        # once all changes are read, skip past the later ones to other keys than the prefix's
+        next_sequence = changes[-1].sequence if len(changes) == limit else latest_sequence
+        return changes, self._encode_cursor(next_sequence)
+
+    def latest_cursor(self) -> str:
+        """Return a cursor to the latest change, to read only the changes made from now on."""
+        with self._lock:
+            return self._encode_cursor(self._latest_sequence())
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """
+        Drop the deletes older than the retention period and return how many were dropped.
+
+        Older entries of each key are already dropped when the key changes again.
+        """
+        expired_before = (now if now is not None else time.time()) - self.tombstone_retention_seconds
+        with self._lock, self._connection:
+            horizon = self._connection.execute(
+                "SELECT MAX(sequence) FROM changes WHERE deleted = 1 AND changed_at < ?", (expired_before,)
+            ).fetchone()[0]
+            if horizon is None:
+                return 0
+            dropped = self._connection.execute(
+                "DELETE FROM changes WHERE deleted = 1 AND changed_at < ?", (expired_before,)
+            ).rowcount
+            self._connection.execute("UPDATE journal SET horizon = MAX(horizon, ?)", (horizon,))
+        return dropped
+
+    def stats(self) -> dict[str, Any]:
+        """Return the number of journaled keys and deletes, and the sequence number below which cursors expired."""
+        with self._lock:
+            entries, deletes = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(deleted), 0) FROM changes"
+            ).fetchone()
+            horizon = self._horizon()
+        return {"entries": entries, "deletes": deletes, "horizon": horizon}
+
+    def close(self) -> None:
+        """Close the database; a journal kept in a file can be reopened later."""
+        with self._lock:
+            self._connection.close()
+
+    def _record(self, key: str, deleted: bool, etag: Optional[str]) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(_RECORD_SQL, (key, int(deleted), etag, time.time()))
+        if time.monotonic() - self._last_compacted_at >= _COMPACT_INTERVAL_SECONDS:
+            self._last_compacted_at = time.monotonic()
+            self.compact()
+
+    def _horizon(self) -> int:
+        return self._connection.execute("SELECT horizon FROM journal").fetchone()[0]
+
+    def _latest_sequence(self) -> int:
+        row = self._connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row[0] if row else 0
+
+    def _encode_cursor(self, sequence: int) -> str:
+        return f"{self._journal_id}-{sequence}"
+
+    def _decode_cursor(self, cursor: str) -> int:
+        journal_id, _, sequence = cursor.rpartition("-")
+        if not journal_id or not sequence.isdigit():
+            raise ValueError("cursor is malformed")
+        if journal_id != self._journal_id:
+            raise CursorExpiredError("the cursor is from another change journal")
+        return int(sequence)
+
+    def _on_before_parameter_build(self, params: dict[str, Any], context: dict[str, Any], **kwargs: Any) -> None:
+        # only calls on the journaled bucket are recorded; DeleteObjects has no single key
+        if params.get("Bucket") == self.bucket_name:
+            context[_JOURNALED_KEY] = params.get("Key", "")
+
+    def _on_object_written(self, parsed: dict[str, Any], context: dict[str, Any], **kwargs: Any) -> None:
+        key = context.get(_JOURNALED_KEY)
+        if key is None or "Error" in parsed:
+            return
+        etag = parsed.get("ETag") or parsed.get("CopyObjectResult", {}).get("ETag")
+        self.record_write(key, etag=etag)
+
+    def _on_object_deleted(self, parsed: dict[str, Any], context: dict[str, Any], **kwargs: Any) -> None:
+        key = context.get(_JOURNALED_KEY)
+        if key is not None and "Error" not in parsed:
+            self.record_delete(key)
+
+    def _on_objects_deleted(self, parsed: dict[str, Any], context: dict[str, Any], **kwargs: Any) -> None:
+        if _JOURNALED_KEY not in context:
+            return
+        for deleted in parsed.get("Deleted", []):
+            self.record_delete(deleted["Key"])
@@ -0,0 +1,44 @@
+"""Construction of the S3 client shared by every request in the process."""
+
+from typing import Literal
+
+import boto3
+from botocore.config import Config
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    ...
+
+
+def create_s3_client(
+    max_pool_connections: int = 10,
+    connect_timeout: float = 60.0,
+    read_timeout: float = 60.0,
+    max_attempts: int = 3,
+    retry_mode: Literal["legacy", "standard", "adaptive"] = "standard",
+) -> "S3Client":
+    """
+    Create a pooled S3 client.
+
+    boto3 clients are thread-safe, so a single client (and its connection pool) can be
+    shared by all requests instead of paying for credential resolution, endpoint setup
+    and a fresh pool on every call.
+
+    :param max_pool_connections: Maximum number of connections kept in the client's pool.
+    :param connect_timeout: Seconds to wait when opening a connection.
+    :param read_timeout: Seconds to wait when reading from a connection.
+    :param max_attempts: Maximum number of attempts per call, including the first one.
+    :param retry_mode: botocore retry mode, e.g. "standard" or "adaptive".
+
+    :return: A new S3 client. Call `close()` on it when it is no longer needed.
+    """
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries={"total_max_attempts": max_attempts, "mode": retry_mode},
+    )
+    # a dedicated session avoids sharing boto3's module-level default session across apps
+    session = boto3.session.Session()
+    return session.client("s3", config=config)
@@ -1,19 +1,50 @@
 """Functions for deleting objects from an S3 bucket--the "D" in CRUD."""
 
-from typing import Optional
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextvars import copy_context
+from dataclasses import dataclass
+from itertools import islice
+from typing import (
+    Iterable,
+    Iterator,
+    Optional,
+)
 
 import boto3
+from botocore.exceptions import ClientError
+
+from files_api.s3.read_objects import ObjectMetadataCache
 
 try:
     from mypy_boto3_s3 import S3Client
 except ImportError:
     ...
 
+# S3 accepts at most 1000 keys per DeleteObjects request
+MAX_KEYS_PER_DELETE_OBJECTS = 1_000
+DEFAULT_BULK_DELETE_MAX_CONCURRENCY = 4
+
+
+@dataclass(frozen=True)
+class DeleteObjectResult:
+    """Outcome of deleting one key in a bulk delete."""
+
+    key: str
+    deleted: bool
+    error_code: Optional[str] = None
+    error_message: Optional[str] = None
+
 
 def delete_s3_object(
         bucket_name: str,
         object_key: str,
-        s3_client: Optional["S3Client"] = None
+        s3_client: Optional["S3Client"] = None,
+        metadata_cache: Optional[ObjectMetadataCache] = None,
     ) -> None:
     """
     Delete an object from the S3 bucket.
@@ -21,6 +52,95 @@ def delete_s3_object(
     :param bucket_name: Name of the S3 bucket.
     :param object_key: Key of the object to delete.
     :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+    :param metadata_cache: Optional metadata cache to invalidate the object's entry in.
     """
     s3_client = s3_client or boto3.client("s3")
-    s3_client.delete_object(Bucket=bucket_name, Key=object_key)
+    try:
+        s3_client.delete_object(Bucket=bucket_name, Key=object_key)
+    finally:
+        if metadata_cache is not None:
+            metadata_cache.invalidate(bucket_name, object_key)
+
+
+def delete_s3_objects(
+    bucket_name: str,
+    object_keys: Iterable[str],
+    max_concurrency: int = DEFAULT_BULK_DELETE_MAX_CONCURRENCY,
+    s3_client: Optional["S3Client"] = None,
+    metadata_cache: Optional[ObjectMetadataCache] = None,
+) -> Iterator[list[DeleteObjectResult]]:
+    """
+    Delete many objects with `delete_objects`, 1000 keys per request.
+
+    Keys are consumed lazily, so `object_keys` can be a paged listing (see
+    `files_api.s3.read_objects.iter_s3_object_keys`) of any size. Up to `max_concurrency`
+    batches are in flight at a time, and each batch's results are yielded as soon as it
+    completes, so results are not in the order of `object_keys`.
+
+    Like `delete_object`, deleting a key that does not exist counts as a success. If a
+    whole request fails (e.g. access denied), every key of its batch is reported as failed
+    with that error instead of aborting the remaining batches.
+
+    :param bucket_name: Name of the S3 bucket.
+    :param object_keys: Keys of the objects to delete.
+    :param max_concurrency: Maximum number of `delete_objects` requests in flight.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+    :param metadata_cache: Optional metadata cache to invalidate the objects' entries in.
+
+    :return: Iterator over the per-key results of each completed batch.
+    """
+    s3_client = s3_client or boto3.client("s3")
+
+    def delete_batch(batch: list[str]) -> list[DeleteObjectResult]:
+        try:
+            return _delete_batch(bucket_name, batch, s3_client)
+        finally:
+            if metadata_cache is not None:
+                for object_key in batch:
+                    metadata_cache.invalidate(bucket_name, object_key)
+
+    key_iterator = iter(object_keys)
+    in_flight: set[Future[list[DeleteObjectResult]]] = set()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        while batch := list(islice(key_iterator, MAX_KEYS_PER_DELETE_OBJECTS)):
+            # wait for a slot before listing the next batch so memory stays bounded
+            if len(in_flight) >= max_concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            in_flight.add(executor.submit(copy_context().run, delete_batch, batch))
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def _delete_batch(bucket_name: str, object_keys: list[str], s3_client: "S3Client") -> list[DeleteObjectResult]:
+    """Delete up to 1000 keys with a single `delete_objects` request and return each key's outcome."""
+    try:
+        # quiet mode only lists the keys that failed, which keeps the response small
+        response = s3_client.delete_objects(
+            Bucket=bucket_name,
+            Delete={"Objects": [{"Key": object_key} for object_key in object_keys], "Quiet": True},
+        )
+    except ClientError as err:
+        return [
+            DeleteObjectResult(
+                key=object_key,
+                deleted=False,
+                error_code=err.response["Error"].get("Code"),
+                error_message=err.response["Error"].get("Message"),
+            )
+            for object_key in object_keys
+        ]
+
+    errors = {error["Key"]: error for error in response.get("Errors", [])}
+    return [
+        DeleteObjectResult(
+            key=object_key,
+            deleted=object_key not in errors,
+            error_code=errors[object_key].get("Code") if object_key in errors else None,
+            error_message=errors[object_key].get("Message") if object_key in errors else None,
+        )
+        for object_key in object_keys
+    ]
@@ -0,0 +1,226 @@
+"""
+Simulated S3 latency, errors and throttling, for testing how the API behaves when S3 misbehaves.
+
+`S3FaultInjector` hooks into a client's `before-send` event, so it works the same in front
+of real S3, `moto.server` or `moto.mock_aws`: every request attempt first waits for a latency
+drawn from the operation's distribution, and may then be answered with a simulated
+`500 InternalError`, a `503 SlowDown`, or a read timeout instead of being sent. Because the
+faults happen below botocore's retry handler, the client's retry mode, attempt limit and
+timeouts are exercised exactly as they would be against a struggling S3.
+
+Faults are configured per operation name (e.g. "GetObject"), with "*" as the default for
+operations that are not listed. For example, as JSON (see `Settings.s3_simulated_faults`):
+
+    {
+        "*": {"latency": {"median_seconds": 0.02, "p99_seconds": 0.25}},
+        "PutObject": {"slow_down_rate": 0.05, "max_requests_per_second": 100},
+        "GetObject": {"error_rate": 0.01}
+    }
+
+Docs: https://docs.aws.amazon.com/AmazonS3/latest/API/ErrorResponses.html
+"""
+
+import io
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import (
+    dataclass,
+    field,
+)
+from typing import (
+    Any,
+    Iterator,
+    Optional,
+)
+
+from botocore.awsrequest import (
+    AWSPreparedRequest,
+    AWSResponse,
+)
+from botocore.exceptions import ReadTimeoutError
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    ...
+
+DEFAULT_OPERATION = "*"
+# z-score of the 99th percentile of a standard normal distribution
+_Z_99 = 2.3263478740408408
+
+
+@dataclass(frozen=True)
+class LatencyDistribution:
+    """
+    Log-normal latency, the usual shape of service latencies: most calls near the median, with a long tail.
+
+    :param median_seconds: Median (p50) latency.
+    :param p99_seconds: 99th percentile latency; equal to the median for a constant latency.
+    """
+
+    median_seconds: float
+    p99_seconds: Optional[float] = None
+
+    def __post_init__(self):
+        if self.median_seconds < 0:
+            raise ValueError("median_seconds must be >= 0")
+        if self.p99_seconds is not None and self.p99_seconds < self.median_seconds:
+            raise ValueError("p99_seconds must be >= median_seconds")
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw a latency in seconds."""
+        if self.median_seconds == 0 or self.p99_seconds is None or self.p99_seconds == self.median_seconds:
+            return self.median_seconds
+        sigma = math.log(self.p99_seconds / self.median_seconds) / _Z_99
+        return rng.lognormvariate(math.log(self.median_seconds), sigma)
+
+
+@dataclass(frozen=True)
+class OperationFaults:
+    """
+    Faults injected into the request attempts of one S3 operation.
+
+    :param latency: Latency added before each attempt. A latency of at least the client's
+        read timeout is cut short with a `ReadTimeoutError`, as a hung connection would be.
+    :param error_rate: Fraction of attempts answered with `500 InternalError`.
+    :param slow_down_rate: Fraction of attempts answered with `503 SlowDown`.
+    :param max_requests_per_second: Attempts above this rate (with a burst of one second's
+        worth) are answered with `503 SlowDown`, like S3's per-prefix request rate limits.
+    """
+
+    latency: Optional[LatencyDistribution] = None
+    error_rate: float = 0.0
+    slow_down_rate: float = 0.0
+    max_requests_per_second: Optional[float] = None
+
+    def __post_init__(self):
+        if not 0 <= self.error_rate <= 1 or not 0 <= self.slow_down_rate <= 1:
+            raise ValueError("error_rate and slow_down_rate must be between 0 and 1")
+        if self.max_requests_per_second is not None and self.max_requests_per_second <= 0:
+            raise ValueError("max_requests_per_second must be > 0")
+
+
+@dataclass
+class _TokenBucket:
+    rate: float
+    tokens: float
+    updated_at: float = field(default_factory=time.monotonic)
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class _RawResponse(io.BytesIO):
+    """The minimal urllib3-like body botocore reads an `AWSResponse` from."""
+
+    def stream(self, **kwargs: Any) -> Iterator[bytes]:
+        yield self.getvalue()
+
+
+class S3FaultInjector:
+    """
+    Injects latency, errors and throttling into the requests made by S3 clients.
+
+    Create one injector per simulated S3 and `instrument` each client with it; the request
+    rate limits are shared by all of its clients. The counters (see `stats`) count request
+    attempts, so a call that was retried twice counts three times.
+    """
+
+    def __init__(self, faults: dict[str, OperationFaults], seed: Optional[int] = None):
+        """
+        :param faults: Faults by operation name, e.g. "GetObject"; "*" applies to operations that are not listed.
+        :param seed: Seed of the random number generator, for reproducible runs.
+        """
+        self.faults = faults
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._buckets: dict[str, _TokenBucket] = {}
+
+        self.attempts = 0
+        self.errors = 0
+        self.throttles = 0
+        self.timeouts = 0
+
+    def instrument(self, s3_client: "S3Client") -> None:
+        """Inject faults into every request the client sends from now on."""
+        read_timeout = s3_client.meta.config.read_timeout
+
+        def on_before_send(request: AWSPreparedRequest, event_name: str, **kwargs: Any) -> Optional[AWSResponse]:
+            return self._on_before_send(request, operation=event_name.rsplit(".", 1)[-1], read_timeout=read_timeout)
+
+        # first, so that faults are also injected in front of moto's mock_aws, which answers in before-send too
+        s3_client.meta.events.register_first("before-send.s3", on_before_send)
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of request attempts and of the faults injected into them."""
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "errors": self.errors,
+                "throttles": self.throttles,
+                "timeouts": self.timeouts,
+            }
+
+    def _on_before_send(
+        self, request: AWSPreparedRequest, operation: str, read_timeout: Optional[float]
+    ) -> Optional[AWSResponse]:
+        faults = self.faults.get(operation) or self.faults.get(DEFAULT_OPERATION)
+        with self._lock:
+            self.attempts += 1
+        if faults is None:
+            return None
+
+        if faults.latency is not None:
+            with self._lock:
+                latency_seconds = faults.latency.sample(self._rng)
+            if read_timeout is not None and latency_seconds >= read_timeout:
+                time.sleep(read_timeout)
+                with self._lock:
+                    self.timeouts += 1
+                raise ReadTimeoutError(endpoint_url=request.url)
+            time.sleep(latency_seconds)
+
+        with self._lock:
+            if faults.max_requests_per_second is not None and not self._take_token(operation, faults):
+                self.throttles += 1
+                return _error_response(request, 503, "SlowDown", "Please reduce your request rate.")
+            roll = self._rng.random()
+            if roll < faults.error_rate:
+                self.errors += 1
+                return _error_response(request, 500, "InternalError", "We encountered an internal error.")
+            if roll < faults.error_rate + faults.slow_down_rate:
+                self.throttles += 1
+                return _error_response(request, 503, "SlowDown", "Please reduce your request rate.")
+        return None
+
+    def _take_token(self, operation: str, faults: OperationFaults) -> bool:
+        # must be called while holding self._lock
+        bucket = self._buckets.get(operation)
+        if bucket is None:
+            rate = faults.max_requests_per_second
+            bucket = self._buckets[operation] = _TokenBucket(rate=rate, tokens=max(rate, 1.0))
+        return bucket.take()
+
+
+def _error_response(request: AWSPreparedRequest, status_code: int, code: str, message: str) -> AWSResponse:
+    request_id = uuid.uuid4().hex[:16].upper()
+    # like S3, HEAD responses have no body; botocore then reports the status code as the error code
+    body = (
+        b""
+        if request.method == "HEAD"
+        else (
+            f'<?xml version="1.0" encoding="UTF-8"?>\n<Error><Code>{code}</Code><Message>{message}</Message>'
+            f"<RequestId>{request_id}</RequestId></Error>"
+        ).encode()
+    )
+    headers = {"x-amz-request-id": request_id, "Content-Type": "application/xml", "Content-Length": str(len(body))}
+    return AWSResponse(request.url, status_code, headers, _RawResponse(body))
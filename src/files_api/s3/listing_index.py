@@ -0,0 +1,580 @@
+"""Local index of the keys in a bucket, for listing, paging and counting without calling S3."""
+
+import itertools
+import posixpath
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import (
+    datetime,
+    timezone,
+)
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import (
+    Any,
+    Iterable,
+    Optional,
+)
+
+import boto3
+from botocore.exceptions import (
+    BotoCoreError,
+    ClientError,
+)
+
+from files_api.s3.read_objects import (
+    DEFAULT_LISTING_MAX_CONCURRENCY,
+    iter_s3_object_pages_in_parallel,
+)
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    ...
+
+# request context key under which the key being written or deleted is kept between botocore events
+_INDEXED_KEY = "files_api_listing_index_key"
+# ... and the size of the object a PutObject writes, when known from its body
+_INDEXED_SIZE = "files_api_listing_index_size"
+_WRITE_OPERATIONS = ("PutObject", "CompleteMultipartUpload", "CopyObject")
+_UPSERT_SQL = (
+    "INSERT OR REPLACE INTO objects (key, size_bytes, last_modified, extension, generation) VALUES (?, ?, ?, ?, ?)"
+)
+# adds the changes in object count and bytes of one directory to its totals
+_USAGE_DELTA_SQL = (
+    "INSERT INTO directory_usage (directory, parent, object_count, total_bytes, file_count, file_bytes) "
+    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (directory) DO UPDATE SET "
+    "object_count = object_count + excluded.object_count, total_bytes = total_bytes + excluded.total_bytes, "
+    "file_count = file_count + excluded.file_count, file_bytes = file_bytes + excluded.file_bytes"
+)
+# keeps `IN (...)` lists well below SQLite's limit on query parameters
+_MAX_SQL_PARAMETERS = 500
+# columns that `ObjectListingIndex.query` can sort by
+SORT_COLUMNS = ("key", "size_bytes", "last_modified")
+
+
+@dataclass(frozen=True)
+class IndexedObject:
+    """An object as recorded in the listing index."""
+
+    key: str
+    size_bytes: int
+    last_modified: datetime
+
+
+@dataclass(frozen=True)
+class DirectoryUsage:
+    """Number and total size of the objects under a directory."""
+
+    # "" for the root of the bucket, otherwise ends with "/"
+    directory: str
+    # everything under the directory, at any depth
+    object_count: int
+    total_bytes: int
+    # only the objects directly in the directory
+    file_count: int
+    file_bytes: int
+
+
+class ObjectListingIndex:
+    """
+    SQLite index of the keys, sizes and modification times of the objects in one bucket.
+
+    The index is filled by a full listing of the bucket (`reconcile`) and kept current by the
+    writes and deletes made with clients passed to `instrument`, so it reflects this
+    service's own changes immediately and other writers' changes after the next
+    reconciliation. Until the first reconciliation has finished, `ready` is False and
+    callers should list from S3 instead. An index kept in a file keeps its rows when it is
+    reopened, so its next reconciliation only corrects the keys that changed while it was
+    closed instead of building the index again; it is not ready until then, because those
+    rows may be stale.
+
+    Keys are stored in S3's (UTF-8 binary) order, so a prefix is a range of the primary key:
+    a page of a prefix costs one index seek, and offsets and counts are answered locally
+    without paging through S3.
+
+    The object count and total size of every directory (every prefix ending with "/") are
+    kept alongside, and updated with each change for the changed key's ancestor directories
+    only, so the usage of a directory is one lookup however many objects it holds.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        path: Optional[Path] = None,
+        max_listing_concurrency: int = DEFAULT_LISTING_MAX_CONCURRENCY,
+    ):
+        """
+        :param bucket_name: Name of the S3 bucket to index.
+        :param path: SQLite database file, kept across restarts; None keeps the index in memory.
+            An existing index of another bucket is cleared.
+        :param max_listing_concurrency: Key ranges listed at the same time by `reconcile`.
+        """
+        self.bucket_name = bucket_name
+        self.max_listing_concurrency = max_listing_concurrency
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False)
+        self._connection.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS objects (
+                key TEXT PRIMARY KEY,
+                size_bytes INTEGER NOT NULL,
+                last_modified REAL NOT NULL,
+                -- lowercased, with the dot, e.g. ".ckpt"; "" if none
+                extension TEXT NOT NULL,
+                generation INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            -- for queries and top-N by size, age and extension (see `query`)
+            CREATE INDEX IF NOT EXISTS objects_by_size ON objects (size_bytes);
+            CREATE INDEX IF NOT EXISTS objects_by_last_modified ON objects (last_modified);
+            CREATE INDEX IF NOT EXISTS objects_by_extension ON objects (extension);
+            CREATE TABLE IF NOT EXISTS directory_usage (
+                directory TEXT PRIMARY KEY,
+                -- NULL for the root directory ""
+                parent TEXT,
+                object_count INTEGER NOT NULL,
+                total_bytes INTEGER NOT NULL,
+                file_count INTEGER NOT NULL,
+                file_bytes INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            -- for the largest subdirectories of a directory (see `subdirectory_usage`)
+            CREATE INDEX IF NOT EXISTS directory_usage_by_parent ON directory_usage (parent, total_bytes);
+            -- last_reconciled_at: NULL until a reconciliation of the bucket has finished
+            CREATE TABLE IF NOT EXISTS index_state (bucket_name TEXT NOT NULL, last_reconciled_at REAL);
+            """
+        )
+        with self._connection:
+            state = self._connection.execute("SELECT bucket_name, last_reconciled_at FROM index_state").fetchone()
+            if state is None or state[0] != bucket_name:
+                self._connection.execute("DELETE FROM objects")
+                self._connection.execute("DELETE FROM directory_usage")
+                self._connection.execute("DELETE FROM index_state")
+                self._connection.execute("INSERT INTO index_state VALUES (?, NULL)", (bucket_name,))
+                state = (bucket_name, None)
+        # each reconciliation stamps the keys it (or a concurrent write) saw with a new generation,
+        # then removes the keys of older generations, which no longer exist in S3
+        self._generation = self._connection.execute("SELECT COALESCE(MAX(generation), 0) FROM objects").fetchone()[0]
+        self._deleted_during_reconciliation: Optional[set[str]] = None
+        self._reconcile_lock = threading.Lock()
+
+        # writes whose size is not known from the request (multipart uploads, copies) are looked up
+        # with a HEAD by a background thread, off the request path; a later change to the key
+        # replaces the lookup's stamp, so a lookup that raced that change is not applied
+        self._size_lookups: queue.Queue[Optional[tuple[str, int]]] = queue.Queue()
+        self._size_lookup_stamps: dict[str, int] = {}
+        self._next_stamp = itertools.count()
+        self._size_lookup_thread: Optional[threading.Thread] = None
+
+        # a reopened index may have missed other writers' changes while it was closed
+        self.ready = False
+        self.reconciliations = 0
+        self.last_reconciled_at: Optional[float] = state[1]
+        self.last_reconcile_seconds: Optional[float] = None
+
+    def instrument(self, s3_client: "S3Client") -> None:
+        """Apply every successful write and delete made with the client to the index."""
+        events = s3_client.meta.events
+        for operation in (*_WRITE_OPERATIONS, "DeleteObject", "DeleteObjects"):
+            events.register(f"before-parameter-build.s3.{operation}", self._on_before_parameter_build)
+        for operation in _WRITE_OPERATIONS:
+            events.register(f"after-call.s3.{operation}", self._on_object_written)
+        events.register("after-call.s3.DeleteObject", self._on_object_deleted)
+        events.register("after-call.s3.DeleteObjects", self._on_objects_deleted)
+        if self._size_lookup_thread is None:
+            self._size_lookup_thread = threading.Thread(
+                target=self._look_up_sizes, args=(s3_client,), name="listing-index-size-lookups", daemon=True
+            )
+            self._size_lookup_thread.start()
+
+    def reconcile(self, s3_client: Optional["S3Client"] = None) -> None:
+        """
+        Bring the index in line with a full listing of the bucket.
+
+        Writes and deletes applied while the listing runs are kept. Only one reconciliation
+        runs at a time; a call made while another is running waits for it and then runs.
+        """
+        s3_client = s3_client or boto3.client("s3")
+        with self._reconcile_lock:
+            started_at = time.monotonic()
+            with self._lock:
+                self._generation += 1
+                generation = self._generation
+                self._deleted_during_reconciliation = set()
+            try:
+                for page in iter_s3_object_pages_in_parallel(
+                    self.bucket_name, max_concurrency=self.max_listing_concurrency, s3_client=s3_client
+                ):
+                    with self._lock, self._connection:
+                        deleted = self._deleted_during_reconciliation
+                        page = [item for item in page if item["Key"] not in deleted]
+                        # keys written since this reconciliation started already carry its generation,
+                        # and are newer than the page, which may have been listed before the write
+                        previous = self._rows([item["Key"] for item in page])
+                        page = [item for item in page if previous.get(item["Key"], (0, 0))[1] != generation]
+                        previous_sizes = {key: size_bytes for key, (size_bytes, _) in previous.items()}
+                        self._connection.executemany(
+                            _UPSERT_SQL,
+                            [_row(item["Key"], item["Size"], item["LastModified"], generation) for item in page],
+                        )
+                        self._apply_usage_deltas(
+                            _usage_delta(item["Key"], item["Size"], previous_sizes.get(item["Key"])) for item in page
+                        )
+                with self._lock, self._connection:
+                    stale = self._connection.execute(
+                        "SELECT key, size_bytes FROM objects WHERE generation < ?", (generation,)
+                    ).fetchall()
+                    self._connection.execute("DELETE FROM objects WHERE generation < ?", (generation,))
+                    self._apply_usage_deltas((key, -1, -size_bytes) for key, size_bytes in stale)
+                    self.last_reconciled_at = time.time()
+                    self._connection.execute(
+                        "UPDATE index_state SET last_reconciled_at = ?", (self.last_reconciled_at,)
+                    )
+            finally:
+                with self._lock:
+                    self._deleted_during_reconciliation = None
+            self.ready = True
+            self.reconciliations += 1
+            self.last_reconcile_seconds = time.monotonic() - started_at
+
+    def put(self, key: str, size_bytes: int, last_modified: datetime) -> None:
+        """Record that an object was written."""
+        with self._lock:
+            self._size_lookup_stamps.pop(key, None)
+            self._put(key, size_bytes, last_modified)
+
+    def discard(self, key: str) -> None:
+        """Record that an object was deleted."""
+        with self._lock, self._connection:
+            self._size_lookup_stamps.pop(key, None)
+            previous_size = self._sizes([key]).get(key)
+            if previous_size is not None:
+                self._connection.execute("DELETE FROM objects WHERE key = ?", (key,))
+                self._apply_usage_deltas([(key, -1, -previous_size)])
+            if self._deleted_during_reconciliation is not None:
+                self._deleted_during_reconciliation.add(key)
+
+    def list_objects(
+        self,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 1000,
+    ) -> list[IndexedObject]:
+        """
+        Return a page of the objects whose keys start with a prefix, in key order.
+
+        :param prefix: Prefix to filter objects by.
+        :param start_after: Only return keys after this one (a cursor).
+        :param offset: Number of matching objects to skip (after `start_after`).
+        :param limit: Maximum number of objects to return.
+        """
+        where, params = self._key_range(prefix, start_after)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT key, size_bytes, last_modified FROM objects WHERE {where} ORDER BY key LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [_indexed_object(*row) for row in rows]
+
+    def query(  # pylint: disable=too-many-arguments
+        self,
+        prefix: str = "",
+        extensions: Iterable[str] = (),
+        min_size_bytes: Optional[int] = None,
+        max_size_bytes: Optional[int] = None,
+        modified_after: Optional[datetime] = None,
+        modified_before: Optional[datetime] = None,
+        sort_by: str = "key",
+        descending: bool = False,
+        limit: int = 100,
+    ) -> list[IndexedObject]:
+        """
+        Return the first objects matching all of the given filters, in the given order.
+
+        e.g. the 20 largest files under "models/" modified in the last week:
+        `query("models/", modified_after=week_ago, sort_by="size_bytes", descending=True, limit=20)`.
+
+        :param prefix: Prefix to filter objects by.
+        :param extensions: Only objects with one of these extensions, e.g. ".ckpt" (case-insensitive).
+        :param min_size_bytes: Only objects at least this large.
+        :param max_size_bytes: Only objects at most this large.
+        :param modified_after: Only objects modified at or after this time.
+        :param modified_before: Only objects modified before this time.
+        :param sort_by: One of `SORT_COLUMNS`; ties are broken by key.
+        :param descending: Sort from the largest value down.
+        :param limit: Maximum number of objects to return.
+        """
+        if sort_by not in SORT_COLUMNS:
+            raise ValueError(f"sort_by must be one of {SORT_COLUMNS}")
+        where, key_params = self._key_range(prefix)
+        conditions, params = [where], list(key_params)
+        extensions = [_normalize_extension(extension) for extension in extensions]
+        if extensions:
+            conditions.append(f"extension IN ({', '.join('?' * len(extensions))})")
+            params.extend(extensions)
+        for condition, value in (
+            ("size_bytes >= ?", min_size_bytes),
+            ("size_bytes <= ?", max_size_bytes),
+            ("last_modified >= ?", modified_after.timestamp() if modified_after else None),
+            ("last_modified < ?", modified_before.timestamp() if modified_before else None),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        direction = "DESC" if descending else "ASC"
+        order_by = f"key {direction}" if sort_by == "key" else f"{sort_by} {direction}, key"
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT key, size_bytes, last_modified FROM objects WHERE {' AND '.join(conditions)} "
+                f"ORDER BY {order_by} LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [_indexed_object(*row) for row in rows]
+
+    def count(self, prefix: str = "") -> int:
+        """Return the number of objects whose keys start with a prefix."""
+        where, params = self._key_range(prefix)
+        with self._lock:
+            return self._connection.execute(f"SELECT COUNT(*) FROM objects WHERE {where}", params).fetchone()[0]
+
+    def usage(self, directory: str = "") -> DirectoryUsage:
+        """
+        Return the number and total size of the objects under a directory.
+
+        :param directory: "" for the whole bucket, otherwise a prefix ending with "/".
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT directory, object_count, total_bytes, file_count, file_bytes FROM directory_usage "
+                "WHERE directory = ?",
+                (directory,),
+            ).fetchone()
+        return DirectoryUsage(*row) if row else DirectoryUsage(directory, 0, 0, 0, 0)
+
+    def subdirectory_usage(self, directory: str = "", limit: int = 100) -> list[DirectoryUsage]:
+        """
+        Return the usage of the immediate subdirectories of a directory, largest first.
+
+        :param directory: "" for the whole bucket, otherwise a prefix ending with "/".
+        :param limit: Maximum number of subdirectories to return.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT directory, object_count, total_bytes, file_count, file_bytes FROM directory_usage "
+                "WHERE parent = ? ORDER BY total_bytes DESC, directory LIMIT ?",
+                (directory, limit),
+            ).fetchall()
+        return [DirectoryUsage(*row) for row in rows]
+
+    def stats(self) -> dict[str, Any]:
+        """Return the number of indexed objects and the state of the reconciliations."""
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+        return {
+            "entries": entries,
+            "ready": self.ready,
+            "reconciliations": self.reconciliations,
+            "last_reconciled_at": self.last_reconciled_at,
+            "last_reconcile_seconds": self.last_reconcile_seconds,
+        }
+
+    def flush(self) -> None:
+        """Wait until the writes whose size had to be looked up have been applied."""
+        self._size_lookups.join()
+
+    def close(self) -> None:
+        """Stop the size lookup thread and close the database; a file-backed index can be reopened later."""
+        if self._size_lookup_thread is not None:
+            self._size_lookups.put(None)
+            self._size_lookup_thread.join()
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def _key_range(prefix: str, start_after: Optional[str] = None) -> tuple[str, tuple[str, ...]]:
+        conditions, params = ["key >= ?"], [prefix]
+        upper_bound = _prefix_upper_bound(prefix)
+        if upper_bound is not None:
+            conditions.append("key < ?")
+            params.append(upper_bound)
+        if start_after is not None:
+            conditions.append("key > ?")
+            params.append(start_after)
+        return " AND ".join(conditions), tuple(params)
+
+    def _sizes(self, keys: list[str]) -> dict[str, int]:
+        """Return the indexed sizes of those of the keys that are indexed; the caller holds the lock."""
+        return {key: size_bytes for key, (size_bytes, _) in self._rows(keys).items()}
+
+    def _rows(self, keys: list[str]) -> dict[str, tuple[int, int]]:
+        """Return the indexed size and generation of those of the keys that are indexed; the caller holds the lock."""
+        rows: dict[str, tuple[int, int]] = {}
+        for start in range(0, len(keys), _MAX_SQL_PARAMETERS):
+            chunk = keys[start : start + _MAX_SQL_PARAMETERS]
+            for key, size_bytes, generation in self._connection.execute(
+                f"SELECT key, size_bytes, generation FROM objects WHERE key IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ):
+                rows[key] = (size_bytes, generation)
+        return rows
+
+    def _apply_usage_deltas(self, deltas: Iterable[tuple[str, int, int]]) -> None:
+        """
+        Add changes in object count and bytes, given per key, to the usage of the keys' directories.
+
+        The caller holds the lock. Changes are summed per directory first, so a page of keys in
+        the same directories costs one update per directory rather than one per key and level.
+        """
+        totals: dict[str, list[int]] = {}
+        for key, count, size_bytes in deltas:
+            if not count and not size_bytes:
+                continue
+            directories = _ancestor_directories(key)
+            for directory in directories:
+                total = totals.setdefault(directory, [0, 0, 0, 0])
+                total[0] += count
+                total[1] += size_bytes
+            totals[directories[-1]][2] += count
+            totals[directories[-1]][3] += size_bytes
+        self._connection.executemany(
+            _USAGE_DELTA_SQL,
+            [(directory, _parent_directory(directory), *total) for directory, total in totals.items()],
+        )
+        emptied = [directory for directory, total in totals.items() if total[0] < 0]
+        for start in range(0, len(emptied), _MAX_SQL_PARAMETERS):
+            chunk = emptied[start : start + _MAX_SQL_PARAMETERS]
+            self._connection.execute(
+                "DELETE FROM directory_usage WHERE object_count <= 0 "
+                f"AND directory IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+
+    def _put(self, key: str, size_bytes: int, last_modified: datetime) -> None:
+        # must be called while holding self._lock
+        with self._connection:
+            previous_size = self._sizes([key]).get(key)
+            self._connection.execute(_UPSERT_SQL, _row(key, size_bytes, last_modified, self._generation))
+            self._apply_usage_deltas([_usage_delta(key, size_bytes, previous_size)])
+
+    def _look_up_sizes(self, s3_client: "S3Client") -> None:
+        while (item := self._size_lookups.get()) is not None:
+            key, stamp = item
+            try:
+                response = s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            except (BotoCoreError, ClientError):
+                # deleted again already, or S3 is unavailable; the next reconciliation settles it
+                response = None
+            except Exception:  # pylint: disable=broad-except
+                # keep looking up the other keys; this one is settled by the next reconciliation too
+                response = None
+            with self._lock:
+                if response is not None and self._size_lookup_stamps.get(key) == stamp:
+                    del self._size_lookup_stamps[key]
+                    self._put(key, response["ContentLength"], response["LastModified"])
+            self._size_lookups.task_done()
+        self._size_lookups.task_done()
+
+    def _on_before_parameter_build(self, params: dict[str, Any], context: dict[str, Any], **kwargs: Any) -> None:
+        # only calls on the indexed bucket are applied; DeleteObjects has no single key
+        if params.get("Bucket") == self.bucket_name:
+            context[_INDEXED_KEY] = params.get("Key", "")
+            context[_INDEXED_SIZE] = _body_size(params)
+
+    def _on_object_written(
+        self, http_response: Any, parsed: dict[str, Any], context: dict[str, Any], **kwargs: Any
+    ) -> None:
+        key = context.get(_INDEXED_KEY)
+        if key is None or "Error" in parsed:
+            return
+        size_bytes = context.get(_INDEXED_SIZE)
+        if size_bytes is not None:
+            # S3 sets the modification time when it receives the write, as does the response's Date
+            self.put(key, size_bytes, _response_date(http_response))
+            return
+        # write responses carry no size, so it is looked up in the background
+        with self._lock:
+            stamp = next(self._next_stamp)
+            self._size_lookup_stamps[key] = stamp
+        self._size_lookups.put((key, stamp))
+
+    def _on_object_deleted(self, parsed: dict[str, Any], context: dict[str, Any], **kwargs: Any) -> None:
+        key = context.get(_INDEXED_KEY)
+        if key is not None and "Error" not in parsed:
+            self.discard(key)
+
+    def _on_objects_deleted(self, parsed: dict[str, Any], context: dict[str, Any], **kwargs: Any) -> None:
+        if _INDEXED_KEY not in context:
+            return
+        for deleted in parsed.get("Deleted", []):
+            self.discard(deleted["Key"])
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Return the smallest string greater than every string starting with `prefix`, or None if there is none."""
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+    next_code_point = ord(prefix[-1]) + 1
+    # surrogates cannot be encoded as UTF-8 (nor appear in keys), so U+D7FF is followed by U+E000
+    if 0xD800 <= next_code_point <= 0xDFFF:
+        next_code_point = 0xE000
+    return prefix[:-1] + chr(next_code_point)
+
+
+def _ancestor_directories(key: str) -> list[str]:
+    """Return the directories containing a key, from the root down, e.g. ["", "a/", "a/b/"] for "a/b/c.txt"."""
+    # a key ending with "/" (a directory marker) belongs to its parent directory, not to itself
+    return [""] + [key[: index + 1] for index, char in enumerate(key[:-1]) if char == "/"]
+
+
+def _parent_directory(directory: str) -> Optional[str]:
+    if not directory:
+        return None
+    return directory[: directory[:-1].rfind("/") + 1]
+
+
+def _usage_delta(key: str, size_bytes: int, previous_size: Optional[int]) -> tuple[str, int, int]:
+    """Return the change in object count and bytes caused by writing a key that had `previous_size` (None if new)."""
+    if previous_size is None:
+        return (key, 1, size_bytes)
+    return (key, 0, size_bytes - previous_size)
+
+
+def _body_size(params: dict[str, Any]) -> Optional[int]:
+    """Return the size of the object a PutObject writes, or None if it is not known up front (or not a PutObject)."""
+    if "ContentLength" in params:
+        return params["ContentLength"]
+    body = params.get("Body")
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode())
+    return None
+
+
+def _response_date(http_response: Any) -> datetime:
+    try:
+        return parsedate_to_datetime(http_response.headers["Date"])
+    except (KeyError, TypeError, ValueError):
+        return datetime.now(timezone.utc)
+
+
+def _normalize_extension(extension: str) -> str:
+    extension = extension.lower()
+    return extension if not extension or extension.startswith(".") else f".{extension}"
+
+
+def _row(key: str, size_bytes: int, last_modified: datetime, generation: int) -> tuple[Any, ...]:
+    extension = posixpath.splitext(key)[1].lower()
+    return (key, size_bytes, last_modified.timestamp(), extension, generation)
+
+
+def _indexed_object(key: str, size_bytes: int, last_modified: float) -> IndexedObject:
+    return IndexedObject(
+        key=key, size_bytes=size_bytes, last_modified=datetime.fromtimestamp(last_modified, tz=timezone.utc)
+    )
@@ -1,13 +1,40 @@
 """Functions for reading objects from an S3 bucket--the "R" in CRUD."""
 
-from typing import Optional
+import threading
+import time
+from collections import (
+    OrderedDict,
+    deque,
+)
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+)
+from contextvars import copy_context
+from dataclasses import (
+    dataclass,
+    field,
+)
+from datetime import datetime
+from functools import partial
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Union,
+)
 
 import boto3
+from botocore.exceptions import ClientError
 
 try:
+    from botocore.response import StreamingBody
     from mypy_boto3_s3 import S3Client
     from mypy_boto3_s3.type_defs import (
         GetObjectOutputTypeDef,
+        HeadObjectOutputTypeDef,
         ObjectTypeDef,
         ListObjectsV2OutputTypeDef,
     )
@@ -15,12 +42,164 @@ except ImportError:
     ...
 
 DEFAULT_MAX_KEYS = 1_000
+DEFAULT_PREFETCH_OBJECTS = 8
+DEFAULT_MAX_PREFETCH_BYTES = 8 * 1024**2
+STREAM_CHUNK_SIZE_BYTES = 256 * 1024
+DEFAULT_PRESIGNED_URL_EXPIRES_SECONDS = 300
+DEFAULT_LISTING_MAX_CONCURRENCY = 8
+# pages a parallel listing buffers ahead of the consumer, per shard listed at the same time
+_BUFFERED_PAGES_PER_SHARD = 8
+# split points of a parallel listing of keys that are not grouped into directories, in S3's key order
+_SPLIT_CHARACTERS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+@dataclass(frozen=True)
+class S3ObjectMetadata:
+    """Metadata of an S3 object, read with `head_object` so that the body is never opened."""
+
+    key: str
+    size_bytes: int
+    content_type: str
+    etag: str
+    last_modified: datetime
+    user_metadata: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_head_object_response(cls, object_key: str, response: "HeadObjectOutputTypeDef") -> "S3ObjectMetadata":
+        """Build the metadata of an object from the response of a `head_object` call for its key."""
+        return cls(
+            key=object_key,
+            size_bytes=response["ContentLength"],
+            content_type=response.get("ContentType", "application/octet-stream"),
+            etag=response["ETag"],
+            last_modified=response["LastModified"],
+            user_metadata=response.get("Metadata", {}),
+        )
+
+
+@dataclass(frozen=True)
+class S3ObjectBody:
+    """An S3 object's body, as yielded by `iter_s3_object_bodies`."""
+
+    key: str
+    size_bytes: int
+    last_modified: datetime
+    chunks: Iterator[bytes]
+
+
+class ObjectMetadataCache:
+    """
+    Bounded, thread-safe cache of `fetch_s3_object_metadata` results.
+
+    Entries expire after `ttl_seconds`; "does not exist" results are cached too, but only for
+    `negative_ttl_seconds`. Once `max_entries` is reached, the least recently used entry is
+    evicted. Writes and deletes made by this process call `invalidate`, and a lookup that was
+    already in flight when an invalidation happened is not stored, so this process never
+    serves metadata older than its own writes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param max_entries: Maximum number of cached keys.
+        :param ttl_seconds: How long metadata of existing objects is served from the cache.
+        :param negative_ttl_seconds: How long "does not exist" results are served from the cache.
+        :param clock: Monotonic clock returning seconds; injectable for tests.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (bucket, key) -> (expires_at, metadata or None if the object does not exist)
+        self._entries: OrderedDict[tuple[str, str], tuple[float, Optional[S3ObjectMetadata]]] = OrderedDict()
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped by every invalidation; pass it back to `put` to detect racing writes."""
+        return self._generation
+
+    def get(self, bucket_name: str, object_key: str) -> tuple[bool, Optional[S3ObjectMetadata]]:
+        """
+        Look up an object's metadata.
+
+        :return: Tuple of
+            1. Whether the cache had a fresh entry for the object.
+            2. The cached metadata, or None if the object is cached as not existing (or not cached).
+        """
+        with self._lock:
+            entry = self._entries.get((bucket_name, object_key))
+            if entry is None or entry[0] <= self._clock():
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end((bucket_name, object_key))
+            self.hits += 1
+            return True, entry[1]
+
+    def put(
+        self,
+        bucket_name: str,
+        object_key: str,
+        metadata: Optional[S3ObjectMetadata],
+        generation: Optional[int] = None,
+    ) -> None:
+        """
+        Cache an object's metadata, or None to record that the object does not exist.
+
+        :param generation: Value of `generation` read before the metadata was fetched. If an
+            invalidation happened since, the metadata may predate a write and is not cached.
+        """
+        ttl_seconds = self.ttl_seconds if metadata is not None else self.negative_ttl_seconds
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[(bucket_name, object_key)] = (self._clock() + ttl_seconds, metadata)
+            self._entries.move_to_end((bucket_name, object_key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, bucket_name: str, object_key: str) -> None:
+        """Forget an object's metadata, e.g. after it was written or deleted."""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop((bucket_name, object_key), None)
+
+    def clear(self) -> None:
+        """Forget all cached metadata."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache's size and its hit, miss and eviction counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
 
 
 def object_exists_in_s3(
         bucket_name: str,
         object_key: str,
-        s3_client: Optional["S3Client"] = None
+        s3_client: Optional["S3Client"] = None,
+        metadata_cache: Optional[ObjectMetadataCache] = None,
     ) -> bool:
     """
     Check if an object exists in the S3 bucket using head_object.
@@ -28,39 +207,120 @@ def object_exists_in_s3(
     :param bucket_name: Name of the S3 bucket.
     :param object_key: Key of the object to check.
     :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+    :param metadata_cache: Optional cache to answer from, and to fill on a miss.
 
     :return: True if the object exists, False otherwise.
     """
+    object_metadata = fetch_s3_object_metadata(
+        bucket_name, object_key, s3_client=s3_client, metadata_cache=metadata_cache
+    )
+    return object_metadata is not None
+
+
+def fetch_s3_object_metadata(
+    bucket_name: str,
+    object_key: str,
+    s3_client: Optional["S3Client"] = None,
+    metadata_cache: Optional[ObjectMetadataCache] = None,
+) -> Optional[S3ObjectMetadata]:
+    """
+    Fetch metadata of an object in the S3 bucket using head_object.
+
+    :param bucket_name: Name of the S3 bucket.
+    :param object_key: Key of the object to fetch metadata for.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+    :param metadata_cache: Optional cache to answer from, and to fill on a miss.
+
+    :return: Metadata of the object, or None if the object does not exist.
+    """
+    if metadata_cache is not None:
+        is_cached, cached_metadata = metadata_cache.get(bucket_name, object_key)
+        if is_cached:
+            return cached_metadata
+        generation = metadata_cache.generation
+
     s3_client = s3_client or boto3.client("s3")
     try:
-        s3_client.head_object(Bucket=bucket_name, Key=object_key)
-        return True
+        response = s3_client.head_object(Bucket=bucket_name, Key=object_key)
+        object_metadata: Optional[S3ObjectMetadata] = S3ObjectMetadata.from_head_object_response(
+            object_key, response
+        )
     except s3_client.exceptions.ClientError as err:
         error_code = err.response["Error"]["Code"]
-        if error_code == "404":
-            return False
-        raise
+        if error_code != "404":
+            raise
+        object_metadata = None
+
+    if metadata_cache is not None:
+        metadata_cache.put(bucket_name, object_key, object_metadata, generation=generation)
+    return object_metadata
 
 
 def fetch_s3_object(
     bucket_name: str,
     object_key: str,
     s3_client: Optional["S3Client"] = None,
+    byte_range: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+    if_modified_since: Optional[datetime] = None,
 ) -> "GetObjectOutputTypeDef":
     """
-    Fetch metadata of an object in the S3 bucket.
+    Fetch an object in the S3 bucket, including its body stream.
+
+    Use `fetch_s3_object_metadata` when only the metadata is needed.
 
     :param bucket_name: Name of the S3 bucket.
     :param object_key: Key of the object to fetch.
     :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+    :param byte_range: Optional HTTP `Range` value, e.g. "bytes=0-99", to fetch only part of the body.
+        The response then has a `ContentRange`, unless S3 ignored the range and sent the whole body.
+    :param if_none_match: Optional HTTP `If-None-Match` value to forward to S3.
+    :param if_modified_since: Optional `If-Modified-Since` time to forward to S3.
+        If either condition says the caller's copy is current, S3 answers 304, which boto3
+        raises as a `ClientError` with the error code "304".
 
-    :return: Metadata of the object.
+    :return: The object's metadata and its (unread) body stream. The caller must close the body.
     """
     s3_client = s3_client or boto3.client("s3")
-    response = s3_client.get_object(Bucket= bucket_name, Key= object_key)
+    optional_params = {
+        "Range": byte_range,
+        "IfNoneMatch": if_none_match,
+        "IfModifiedSince": if_modified_since,
+    }
+    response = s3_client.get_object(
+        Bucket=bucket_name,
+        Key=object_key,
+        **{name: value for name, value in optional_params.items() if value is not None},
+    )
     return response
 
 
+def generate_presigned_download_url(
+    bucket_name: str,
+    object_key: str,
+    expires_in_seconds: int = DEFAULT_PRESIGNED_URL_EXPIRES_SECONDS,
+    s3_client: Optional["S3Client"] = None,
+) -> str:
+    """
+    Create a presigned URL that lets anyone holding it GET the object directly from S3.
+
+    Signing happens locally; S3 is not contacted, so the object is not checked to exist.
+
+    :param bucket_name: Name of the S3 bucket.
+    :param object_key: Key of the object.
+    :param expires_in_seconds: Number of seconds the URL stays valid for.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: The presigned URL.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    return s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": bucket_name, "Key": object_key},
+        ExpiresIn=expires_in_seconds,
+    )
+
+
 def fetch_s3_objects_using_page_token(
     bucket_name: str,
     continuation_token: str,
@@ -96,6 +356,7 @@ def fetch_s3_objects_metadata(
     prefix: Optional[str] = None,
     max_keys: int = DEFAULT_MAX_KEYS,
     s3_client: Optional["S3Client"] = None,
+    start_after: Optional[str] = None,
 ) -> tuple[list["ObjectTypeDef"], Optional[str]]:
     """
     Fetch list of object keys and their metadata.
@@ -104,14 +365,383 @@ def fetch_s3_objects_metadata(
     :param prefix: Prefix to filter objects by.
     :param max_keys: Maximum number of keys to return within this page.
     :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+    :param start_after: Only list keys after this one.
 
     :return: Tuple of a list of objects and the next continuation token.
         1. Possibly empty list of objects in the current page.
         2. Next continuation token if there are more pages, otherwise None.
     """
     s3_client = s3_client or boto3.client("s3")
-    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix or "", MaxKeys=max_keys)
+    optional_params = {"StartAfter": start_after} if start_after else {}
+    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix or "", MaxKeys=max_keys, **optional_params)
     files: list["ObjectTypeDef"] = response.get("Contents", [])
     next_page_token: str | None = response.get("NextContinuationToken")
 
     return files, next_page_token
+
+
+def fetch_s3_directory_listing(
+    bucket_name: str,
+    prefix: str = "",
+    delimiter: str = "/",
+    max_keys: int = DEFAULT_MAX_KEYS,
+    continuation_token: Optional[str] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> tuple[list["ObjectTypeDef"], list[str], Optional[str]]:
+    """
+    Fetch one level of a "directory": the objects directly under a prefix and its "subdirectories".
+
+    Keys that contain the delimiter after the prefix are rolled up by S3 into one common
+    prefix per subdirectory, so listing a directory costs one call per page of direct
+    children no matter how many objects are nested below them.
+
+    :param bucket_name: Name of the S3 bucket to list objects from.
+    :param prefix: Prefix of the directory, usually ending with the delimiter; "" for the root.
+    :param delimiter: Character that separates directories in keys.
+    :param max_keys: Maximum number of objects plus subdirectories to return within this page.
+    :param continuation_token: Token of the page to fetch, from a previous call with the same prefix and delimiter.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: Tuple of
+        1. Possibly empty list of objects directly under the prefix in the current page.
+        2. Possibly empty list of subdirectory prefixes (ending with the delimiter) in the current page.
+        3. Next continuation token if there are more pages, otherwise None.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    # unlike a flat listing, every page must repeat the prefix and delimiter to stay rolled up
+    optional_params = {"ContinuationToken": continuation_token} if continuation_token else {}
+    response = s3_client.list_objects_v2(
+        Bucket=bucket_name, Prefix=prefix, Delimiter=delimiter, MaxKeys=max_keys, **optional_params
+    )
+    files: list["ObjectTypeDef"] = response.get("Contents", [])
+    subdirectories = [common_prefix["Prefix"] for common_prefix in response.get("CommonPrefixes", [])]
+    next_page_token: str | None = response.get("NextContinuationToken")
+
+    return files, subdirectories, next_page_token
+
+
+def iter_s3_object_pages(
+    bucket_name: str,
+    prefix: Optional[str] = None,
+    start_after: Optional[str] = None,
+    max_keys: int = DEFAULT_MAX_KEYS,
+    s3_client: Optional["S3Client"] = None,
+) -> Iterator[list["ObjectTypeDef"]]:
+    """
+    Yield the pages of listing entries of all objects under a prefix.
+
+    :param bucket_name: Name of the S3 bucket to list objects from.
+    :param prefix: Prefix to filter objects by.
+    :param start_after: Only list keys after this one, e.g. to resume an interrupted listing.
+    :param max_keys: Maximum number of objects per page; S3 returns at most 1000.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: Iterator over non-empty pages, in lexicographical key order. Each page is listed
+        lazily, with one `ListObjectsV2` call, when the previous one has been consumed.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    params: dict[str, Any] = {"Bucket": bucket_name, "Prefix": prefix or "", "MaxKeys": max_keys}
+    if start_after:
+        params["StartAfter"] = start_after
+    while True:
+        response = s3_client.list_objects_v2(**params)
+        files: list["ObjectTypeDef"] = response.get("Contents", [])
+        if files:
+            yield files
+        if not response.get("NextContinuationToken"):
+            return
+        params["ContinuationToken"] = response["NextContinuationToken"]
+
+
+def iter_s3_object_pages_in_parallel(
+    bucket_name: str,
+    prefix: Optional[str] = None,
+    start_after: Optional[str] = None,
+    max_concurrency: int = DEFAULT_LISTING_MAX_CONCURRENCY,
+    s3_client: Optional["S3Client"] = None,
+) -> Iterator[list["ObjectTypeDef"]]:
+    """
+    Yield the pages of listing entries of all objects under a prefix, listing several key ranges at once.
+
+    A continuation-token chain can only be followed one page (one round trip) at a time, so
+    the keyspace is split into contiguous ranges ("shards") that are each listed with their
+    own chain, `max_concurrency` at a time. The split points are the subdirectories found by
+    one delimited listing (descending while everything is in a single subdirectory), or,
+    for keys that are not grouped into directories, a fixed set of leading characters.
+
+    Shards are consumed in key order, so the result is the same stream of objects as
+    `iter_s3_object_pages`, in the same order. At most `8 * (max_concurrency + 1)` pages are
+    listed ahead of the consumer, so memory stays bounded however large the bucket is; the
+    speedup is largest when the objects are spread over many subdirectories.
+
+    :param bucket_name: Name of the S3 bucket to list objects from.
+    :param prefix: Prefix to filter objects by.
+    :param start_after: Only list keys after this one, e.g. to resume an interrupted listing.
+    :param max_concurrency: Number of shards listed at the same time; 1 lists sequentially.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: Iterator over non-empty pages of at most 1000 objects, in lexicographical key order.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    prefix = prefix or ""
+    split_points = (
+        _find_listing_split_points(bucket_name, prefix, start_after, max_concurrency * 4, s3_client)
+        if max_concurrency > 1
+        else []
+    )
+    if not split_points:
+        yield from iter_s3_object_pages(bucket_name, prefix=prefix, start_after=start_after, s3_client=s3_client)
+        return
+
+    # shard i holds the keys from split point i - 1 (inclusive) up to split point i (exclusive)
+    bounds = list(zip([None, *split_points], [*split_points, None]))
+    buffers: list[deque[Union[list["ObjectTypeDef"], Exception, None]]] = [deque() for _ in bounds]
+    max_buffered_pages = max_concurrency * _BUFFERED_PAGES_PER_SHARD
+    # pages buffered across all shards, the shard being consumed, and whether the consumer stopped
+    state = {"buffered_pages": 0, "head": 0, "stopped": False}
+    changed = threading.Condition()
+
+    def put(index: int, item: Union[list["ObjectTypeDef"], Exception, None]) -> bool:
+        with changed:
+            # the shard being consumed may go ahead even when the budget is spent by later shards,
+            # or the consumer could wait for it forever
+            changed.wait_for(
+                lambda: state["stopped"]
+                or state["buffered_pages"] < max_buffered_pages
+                or (index == state["head"] and len(buffers[index]) < _BUFFERED_PAGES_PER_SHARD)
+            )
+            if state["stopped"]:
+                return False
+            buffers[index].append(item)
+            state["buffered_pages"] += 1
+            changed.notify_all()
+            return True
+
+    def list_shard(index: int) -> None:
+        lower, upper = bounds[index]
+        try:
+            for page in _iter_s3_object_range_pages(bucket_name, prefix, start_after, lower, upper, s3_client):
+                if not put(index, page):
+                    return
+            put(index, None)
+        except Exception as err:  # pylint: disable=broad-except
+            put(index, err)
+
+    def take(index: int) -> Union[list["ObjectTypeDef"], Exception, None]:
+        with changed:
+            state["head"] = index
+            changed.notify_all()
+            changed.wait_for(lambda: len(buffers[index]) > 0)
+            state["buffered_pages"] -= 1
+            changed.notify_all()
+            return buffers[index].popleft()
+
+    # shards start in key order, so the shard being consumed always has a thread listing it
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [executor.submit(copy_context().run, list_shard, index) for index in range(len(bounds))]
+        try:
+            for index in range(len(bounds)):
+                while (item := take(index)) is not None:
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        finally:
+            with changed:
+                state["stopped"] = True
+                changed.notify_all()
+            for future in futures:
+                future.cancel()
+
+
+def iter_s3_objects(
+    bucket_name: str,
+    prefix: Optional[str] = None,
+    max_concurrency: int = 1,
+    s3_client: Optional["S3Client"] = None,
+) -> Iterator["ObjectTypeDef"]:
+    """
+    Yield the listing entries of all objects under a prefix, paging through the listing as needed.
+
+    :param bucket_name: Name of the S3 bucket to list objects from.
+    :param prefix: Prefix to filter objects by.
+    :param max_concurrency: Number of key ranges listed at the same time, see `iter_s3_object_pages_in_parallel`.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: Iterator over objects in lexicographical key order. Pages are listed lazily, see `iter_s3_object_pages`.
+    """
+    for page in iter_s3_object_pages_in_parallel(
+        bucket_name, prefix=prefix, max_concurrency=max_concurrency, s3_client=s3_client
+    ):
+        yield from page
+
+
+def iter_s3_object_keys(
+    bucket_name: str,
+    prefix: Optional[str] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> Iterator[str]:
+    """
+    Yield the keys of all objects under a prefix, paging through the listing as needed.
+
+    :param bucket_name: Name of the S3 bucket to list objects from.
+    :param prefix: Prefix to filter objects by.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: Iterator over object keys in lexicographical order. Pages are listed lazily.
+    """
+    for item in iter_s3_objects(bucket_name, prefix=prefix, s3_client=s3_client):
+        yield item["Key"]
+
+
+def iter_s3_object_bodies(
+    bucket_name: str,
+    objects: Iterable["ObjectTypeDef"],
+    prefetch: int = DEFAULT_PREFETCH_OBJECTS,
+    max_prefetch_bytes: int = DEFAULT_MAX_PREFETCH_BYTES,
+    s3_client: Optional["S3Client"] = None,
+) -> Iterator[S3ObjectBody]:
+    """
+    Yield the bodies of listed objects in listing order, downloading the next few ahead of the consumer.
+
+    Objects of at most `max_prefetch_bytes` (by their listed size) are downloaded in full by
+    up to `prefetch` background threads while the consumer is still reading earlier bodies,
+    so many small objects do not each cost a round trip on the consumer's critical path.
+    Larger objects are only opened once the consumer reaches them and are then streamed,
+    so memory stays under roughly `(prefetch + 1) * max_prefetch_bytes` however many
+    objects are read. Objects deleted since they were listed are skipped.
+
+    :param bucket_name: Name of the S3 bucket.
+    :param objects: Listing entries, e.g. from `iter_s3_objects`; consumed lazily.
+    :param prefetch: Maximum number of objects downloaded ahead of the consumer.
+    :param max_prefetch_bytes: Size of the largest object that is downloaded ahead.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: Iterator over the objects' bodies. Each body's `chunks` must be consumed (or
+        closed) before advancing to the next object.
+    """
+    s3_client = s3_client or boto3.client("s3")
+
+    def get_object(object_key: str) -> Optional["GetObjectOutputTypeDef"]:
+        try:
+            return s3_client.get_object(Bucket=bucket_name, Key=object_key)
+        except ClientError as err:
+            if err.response["Error"]["Code"] == "NoSuchKey":
+                return None
+            raise
+
+    def download(object_key: str) -> Optional[S3ObjectBody]:
+        response = get_object(object_key)
+        if response is None:
+            return None
+        with response["Body"] as body:
+            content = body.read()
+        return S3ObjectBody(
+            key=object_key, size_bytes=len(content), last_modified=response["LastModified"], chunks=iter([content])
+        )
+
+    def open_stream(object_key: str) -> Optional[S3ObjectBody]:
+        response = get_object(object_key)
+        if response is None:
+            return None
+        return S3ObjectBody(
+            key=object_key,
+            size_bytes=response["ContentLength"],
+            last_modified=response["LastModified"],
+            chunks=_iter_body_chunks(response["Body"]),
+        )
+
+    # prefetched downloads, and the large objects between them that are opened on demand
+    window: deque[Union[Future[Optional[S3ObjectBody]], Callable[[], Optional[S3ObjectBody]]]] = deque()
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        try:
+            for item in objects:
+                if item["Size"] <= max_prefetch_bytes:
+                    window.append(executor.submit(copy_context().run, download, item["Key"]))
+                else:
+                    window.append(partial(open_stream, item["Key"]))
+                while len(window) > prefetch:
+                    object_body = _resolve(window.popleft())
+                    if object_body is not None:
+                        yield object_body
+            while window:
+                object_body = _resolve(window.popleft())
+                if object_body is not None:
+                    yield object_body
+        finally:
+            # the consumer stopped early: do not download what it will never read
+            for pending in window:
+                if isinstance(pending, Future):
+                    pending.cancel()
+
+
+def _find_listing_split_points(
+    bucket_name: str,
+    prefix: str,
+    start_after: Optional[str],
+    max_shards: int,
+    s3_client: "S3Client",
+) -> list[str]:
+    """Return up to `max_shards - 1` keys, in order, that split the listing of a prefix into ranges."""
+    while True:
+        params: dict[str, Any] = {"Bucket": bucket_name, "Prefix": prefix, "Delimiter": "/"}
+        if start_after:
+            params["StartAfter"] = start_after
+        response = s3_client.list_objects_v2(**params)
+        directories = [common_prefix["Prefix"] for common_prefix in response.get("CommonPrefixes", [])]
+        if len(directories) != 1 or response.get("Contents") or response.get("IsTruncated"):
+            break
+        # everything is in one subdirectory: split inside it instead
+        prefix = directories[0]
+
+    # a truncated listing only shows the first directories; the last shard takes the rest
+    split_points = directories if len(directories) > 1 else [prefix + character for character in _SPLIT_CHARACTERS]
+    split_points = sorted(point for point in split_points if not start_after or point > start_after)
+    if len(split_points) >= max_shards:
+        split_points = [split_points[index * len(split_points) // max_shards] for index in range(1, max_shards)]
+    return split_points
+
+
+def _iter_s3_object_range_pages(  # pylint: disable=too-many-arguments
+    bucket_name: str,
+    prefix: str,
+    start_after: Optional[str],
+    lower: Optional[str],
+    upper: Optional[str],
+    s3_client: "S3Client",
+) -> Iterator[list["ObjectTypeDef"]]:
+    """Yield the pages of the keys under a prefix that are after `start_after`, at least `lower` and below `upper`."""
+    if lower is not None:
+        # the listing can only start after a key, so start just before `lower` and drop what precedes it
+        start_after = max(start_after or "", _key_just_before(lower))
+    for page in iter_s3_object_pages(bucket_name, prefix=prefix, start_after=start_after, s3_client=s3_client):
+        in_range = [
+            item for item in page if (lower is None or item["Key"] >= lower) and (upper is None or item["Key"] < upper)
+        ]
+        if in_range:
+            yield in_range
+        if upper is not None and page[-1]["Key"] >= upper:
+            return
+
+
+def _key_just_before(key: str) -> str:
+    """Return a string below `key` that (practically) no other key falls between, for `StartAfter`."""
+    if key[-1] == "\x00":
+        return key[:-1]
+    previous = ord(key[-1]) - 1
+    # surrogates cannot be encoded in UTF-8, and sort like the code points below them there
+    if 0xD800 <= previous <= 0xDFFF:
+        previous = 0xD7FF
+    return key[:-1] + chr(previous) + chr(0x10FFFF)
+
+
+def _resolve(
+    pending: Union["Future[Optional[S3ObjectBody]]", Callable[[], Optional[S3ObjectBody]]],
+) -> Optional[S3ObjectBody]:
+    """Wait for a prefetched body, or open a body that was left to be opened on demand."""
+    return pending.result() if isinstance(pending, Future) else pending()
+
+
+def _iter_body_chunks(body: "StreamingBody") -> Iterator[bytes]:
+    """Stream an S3 object body chunk by chunk and close it when done, or when the iterator is closed."""
+    with body:
+        yield from body.iter_chunks(STREAM_CHUNK_SIZE_BYTES)
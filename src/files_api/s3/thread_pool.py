@@ -0,0 +1,116 @@
+"""Run the blocking `files_api.s3` helpers from async code without blocking the event loop."""
+
+import asyncio
+from functools import partial
+from typing import (
+    AsyncIterator,
+    Callable,
+    Iterator,
+    Optional,
+    ParamSpec,
+    TypeVar,
+)
+
+import anyio
+import anyio.to_thread
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# sentinel returned by `next()` once a streamed iterator is exhausted
+_EXHAUSTED = object()
+
+
+class S3ThreadPool:
+    """
+    Bounded pool of worker threads for blocking S3 calls.
+
+    boto3 only offers a synchronous API. Calling it directly from an `async def` route
+    blocks the event loop for the whole S3 round trip, so a worker serves one request at a
+    time. Running each call on a worker thread lets concurrent requests overlap their S3
+    latency, and the capacity limit keeps the number of in-flight calls in line with the
+    size of the S3 client's connection pool.
+    """
+
+    def __init__(self, max_workers: int):
+        """
+        :param max_workers: Maximum number of S3 calls running at the same time.
+        """
+        self.max_workers = max_workers
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+        self._shut_down = False
+
+    @property
+    def limiter(self) -> anyio.CapacityLimiter:
+        """Capacity limiter that bounds how many calls run on the pool's threads at a time."""
+        # created lazily so that the limiter is bound to the running event loop
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.max_workers)
+        return self._limiter
+
+    async def run(self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """
+        Call `func(*args, **kwargs)` on a worker thread and wait for its result.
+
+        :param func: Blocking function to call, e.g. `files_api.s3.read_objects.fetch_s3_object`.
+
+        :return: Whatever `func` returns. Exceptions raised by `func` propagate to the caller.
+
+        :raises RuntimeError: If the pool has been shut down.
+        """
+        if self._shut_down:
+            raise RuntimeError("the S3 thread pool has been shut down")
+        return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=self.limiter)
+
+    async def shutdown(self) -> None:
+        """
+        Stop accepting calls and wait for the running ones to finish, e.g. before closing the S3 client they use.
+        """
+        self._shut_down = True
+        # every running call holds one of the limiter's tokens, so holding all of them means none is left
+        for _ in range(self.max_workers):
+            await self.limiter.acquire_on_behalf_of(object())
+
+    async def iterate(self, iterator: Iterator[T], read_ahead: bool = False) -> AsyncIterator[T]:
+        """
+        Pull items from a blocking iterator (e.g. an S3 body stream) on worker threads.
+
+        :param iterator: Iterator whose `__next__` may block on network I/O.
+        :param read_ahead: Fetch the next item while the caller is still processing the current
+            one, e.g. to list the next page of a listing while serializing this one. At most one
+            item is read ahead.
+
+        :return: Async iterator over the same items.
+        """
+        if not read_ahead:
+            try:
+                while True:
+                    item = await self.run(next, iterator, _EXHAUSTED)
+                    if item is _EXHAUSTED:
+                        break
+                    yield item  # type: ignore[misc]
+            finally:
+                await self._close(iterator)
+            return
+
+        next_item = asyncio.ensure_future(self.run(next, iterator, _EXHAUSTED))
+        try:
+            while True:
+                item = await next_item
+                if item is _EXHAUSTED:
+                    break
+                next_item = asyncio.ensure_future(self.run(next, iterator, _EXHAUSTED))
+                yield item  # type: ignore[misc]
+        finally:
+            # e.g. the client disconnected: the item being read ahead is dropped, but a generator
+            # cannot be closed while a worker thread is still running it
+            if not next_item.done():
+                await asyncio.wait([next_item])
+            if not next_item.cancelled():
+                next_item.exception()
+            await self._close(iterator)
+
+    async def _close(self, iterator: Iterator[T]) -> None:
+        # e.g. a generator's `finally`, which stops the threads of a parallel listing; closing may block on them
+        if hasattr(iterator, "close"):
+            await self.run(iterator.close)
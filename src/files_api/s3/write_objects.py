@@ -1,20 +1,69 @@
 """Functions for writing objects from an S3 bucket--the "C" and "U" in CRUD."""
 
-from typing import Optional
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextvars import copy_context
+from dataclasses import dataclass
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+)
 
 import boto3
+from botocore.exceptions import ClientError
+
+from files_api.s3.read_objects import (
+    ObjectMetadataCache,
+    object_exists_in_s3,
+)
 
 try:
     from mypy_boto3_s3 import S3Client
+    from mypy_boto3_s3.type_defs import CompletedPartTypeDef
 except ImportError:
     ...
 
+# S3 rejects multipart uploads whose parts (other than the last) are smaller than 5 MiB
+MIN_MULTIPART_PART_SIZE_BYTES = 5 * 1024**2
+DEFAULT_MULTIPART_THRESHOLD_BYTES = 16 * 1024**2
+DEFAULT_MULTIPART_PART_SIZE_BYTES = 8 * 1024**2
+DEFAULT_MULTIPART_MAX_CONCURRENCY = 4
+DEFAULT_BULK_UPLOAD_MAX_CONCURRENCY = 16
+# S3 numbers multipart upload parts from 1 to 10,000, each at most 5 GiB
+MAX_MULTIPART_PART_NUMBER = 10_000
+MAX_MULTIPART_PART_SIZE_BYTES = 5 * 1024**3
+# the size of a streamed file is not known up front, so the part size doubles every this many parts;
+# from the default 8 MiB, the 10,000 parts then hold about 8 TB, more than S3's 5 TB object limit
+MULTIPART_PART_SIZE_DOUBLING_PARTS = 1000
+DEFAULT_PRESIGNED_PART_URL_EXPIRES_SECONDS = 3600
+
+
+@dataclass(frozen=True)
+class UploadObjectResult:
+    """Outcome of uploading one file in a bulk upload."""
+
+    key: str
+    # None if the upload failed
+    created: Optional[bool]
+    error_code: Optional[str] = None
+    error_message: Optional[str] = None
+
+
 def upload_s3_object(
     bucket_name: str,
     object_key: str,
     file_content: bytes,
     content_type: Optional[str] = None,
     s3_client: Optional["S3Client"] = None,
+    metadata_cache: Optional[ObjectMetadataCache] = None,
 ) -> None:
     """
     Upload a file to an S3 bucket.
@@ -24,12 +73,439 @@ def upload_s3_object(
     :param file_content: The content of the file to upload.
     :param content_type: The MIME type of the file, e.g. "text/plain" for a text file.
     :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+    :param metadata_cache: Optional metadata cache to invalidate the object's entry in.
     """
     content_type = content_type or "application/octet-stream"
     s3_client = s3_client or boto3.client("s3")
-    s3_client.put_object(
+    try:
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=object_key,
+            Body=file_content,
+            ContentType=content_type,
+        )
+    finally:
+        if metadata_cache is not None:
+            metadata_cache.invalidate(bucket_name, object_key)
+
+
+def upload_s3_fileobj(
+    bucket_name: str,
+    object_key: str,
+    fileobj: BinaryIO,
+    content_type: Optional[str] = None,
+    multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD_BYTES,
+    part_size: int = DEFAULT_MULTIPART_PART_SIZE_BYTES,
+    max_concurrency: int = DEFAULT_MULTIPART_MAX_CONCURRENCY,
+    conditional_writes: bool = True,
+    s3_client: Optional["S3Client"] = None,
+    metadata_cache: Optional[ObjectMetadataCache] = None,
+) -> bool:
+    """
+    Stream a file-like object to an S3 bucket without reading all of it into memory.
+
+    Files of at most `multipart_threshold` bytes are sent with a single `put_object`.
+    Larger files are sent as a multipart upload, reading `part_size` bytes at a time and
+    uploading up to `max_concurrency` parts in parallel, so at most roughly
+    `(max_concurrency + 1) * part_size` bytes are held in memory. Past every 1,000 parts the
+    part size doubles (up to 5 GiB), so that files of any size S3 accepts fit in its 10,000
+    parts. If any part fails, the multipart upload is aborted so that no orphaned parts are
+    left behind.
+
+    With `conditional_writes`, the final write (the PUT, or the multipart completion) is
+    first sent with `If-None-Match: *`. S3 then decides in the same round trip whether the
+    key already existed: a 412 means it did, and the write is repeated unconditionally.
+    Without it, a HEAD request is made up front instead, for S3-compatible stores that do
+    not support conditional writes.
+
+    :param bucket_name: The name of the S3 bucket.
+    :param object_key: path to the object in the S3 bucket.
+    :param fileobj: Readable binary file-like object positioned at the start of the content.
+    :param content_type: The MIME type of the file, e.g. "text/plain" for a text file.
+    :param multipart_threshold: Largest size in bytes that is uploaded with a single PUT.
+    :param part_size: Size in bytes of each multipart upload part; at least 5 MiB.
+    :param max_concurrency: Maximum number of parts uploaded at the same time.
+    :param conditional_writes: Whether to use `If-None-Match: *` to tell creates from updates.
+    :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+    :param metadata_cache: Optional metadata cache to invalidate the object's entry in.
+
+    :return: True if a new object was created, False if an existing object was replaced.
+
+    :raises ValueError: If the file does not fit in 10,000 parts.
+    """
+    try:
+        return _upload_s3_fileobj(
+            bucket_name=bucket_name,
+            object_key=object_key,
+            fileobj=fileobj,
+            content_type=content_type or "application/octet-stream",
+            multipart_threshold=multipart_threshold,
+            part_size=part_size,
+            max_concurrency=max_concurrency,
+            conditional_writes=conditional_writes,
+            s3_client=s3_client or boto3.client("s3"),
+        )
+    finally:
+        if metadata_cache is not None:
+            metadata_cache.invalidate(bucket_name, object_key)
+
+
+def upload_s3_fileobjs(
+    bucket_name: str,
+    files: Iterable[tuple[str, BinaryIO, Optional[str]]],
+    max_concurrency: int = DEFAULT_BULK_UPLOAD_MAX_CONCURRENCY,
+    multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD_BYTES,
+    part_size: int = DEFAULT_MULTIPART_PART_SIZE_BYTES,
+    multipart_max_concurrency: int = DEFAULT_MULTIPART_MAX_CONCURRENCY,
+    conditional_writes: bool = True,
+    s3_client: Optional["S3Client"] = None,
+    metadata_cache: Optional[ObjectMetadataCache] = None,
+) -> Iterator[UploadObjectResult]:
+    """
+    Upload many file-like objects with up to `max_concurrency` uploads in flight.
+
+    `files` is consumed lazily, one item per free upload slot, so it can be a stream that
+    produces files while earlier ones are being uploaded (e.g. the members of a tar stream
+    spooled one at a time). Each file is uploaded as in `upload_s3_fileobj` and closed
+    afterwards. A file that fails with a `ClientError` is reported as failed without
+    stopping the other uploads.
+
+    :param bucket_name: The name of the S3 bucket.
+    :param files: `(object_key, fileobj, content_type)` tuples; every `fileobj` must be readable
+        independently of the others.
+    :param max_concurrency: Maximum number of files uploaded at the same time.
+    :param multipart_threshold: See `upload_s3_fileobj`.
+    :param part_size: See `upload_s3_fileobj`.
+    :param multipart_max_concurrency: Maximum number of parts of one file uploaded at the same time.
+    :param conditional_writes: See `upload_s3_fileobj`.
+    :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+    :param metadata_cache: Optional metadata cache to invalidate the objects' entries in.
+
+    :return: Iterator over the result of each file, in the order the uploads complete.
+    """
+    s3_client = s3_client or boto3.client("s3")
+
+    def upload(object_key: str, fileobj: BinaryIO, content_type: Optional[str]) -> UploadObjectResult:
+        try:
+            with fileobj:
+                created = upload_s3_fileobj(
+                    bucket_name=bucket_name,
+                    object_key=object_key,
+                    fileobj=fileobj,
+                    content_type=content_type,
+                    multipart_threshold=multipart_threshold,
+                    part_size=part_size,
+                    max_concurrency=multipart_max_concurrency,
+                    conditional_writes=conditional_writes,
+                    s3_client=s3_client,
+                    metadata_cache=metadata_cache,
+                )
+        except ClientError as err:
+            return UploadObjectResult(
+                key=object_key,
+                created=None,
+                error_code=err.response["Error"].get("Code"),
+                error_message=err.response["Error"].get("Message"),
+            )
+        except ValueError as err:
+            # too large for a multipart upload; named like S3's error for objects above its limit
+            return UploadObjectResult(
+                key=object_key,
+                created=None,
+                error_code="EntityTooLarge",
+                error_message=str(err),
+            )
+        return UploadObjectResult(key=object_key, created=created)
+
+    in_flight: set[Future[UploadObjectResult]] = set()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for object_key, fileobj, content_type in files:
+            in_flight.add(executor.submit(copy_context().run, upload, object_key, fileobj, content_type))
+            # wait for a slot before taking the next file so that at most `max_concurrency` are open
+            if len(in_flight) >= max_concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def max_multipart_upload_bytes(part_size: int = DEFAULT_MULTIPART_PART_SIZE_BYTES) -> int:
+    """Return the size of the largest file `upload_s3_fileobj` can upload with this `part_size`."""
+    return sum(
+        _multipart_part_size(part_number, part_size) for part_number in range(1, MAX_MULTIPART_PART_NUMBER + 1)
+    )
+
+
+def create_s3_multipart_upload(
+    bucket_name: str,
+    object_key: str,
+    content_type: Optional[str] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> str:
+    """
+    Start a multipart upload whose parts the client sends straight to S3 with presigned URLs.
+
+    :param bucket_name: The name of the S3 bucket.
+    :param object_key: path to the object in the S3 bucket.
+    :param content_type: The MIME type of the file, e.g. "text/plain" for a text file.
+    :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+
+    :return: The upload ID.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    response = s3_client.create_multipart_upload(
+        Bucket=bucket_name,
+        Key=object_key,
+        ContentType=content_type or "application/octet-stream",
+    )
+    return response["UploadId"]
+
+
+def generate_presigned_upload_part_urls(
+    bucket_name: str,
+    object_key: str,
+    upload_id: str,
+    part_numbers: Iterable[int],
+    expires_in_seconds: int = DEFAULT_PRESIGNED_PART_URL_EXPIRES_SECONDS,
+    s3_client: Optional["S3Client"] = None,
+) -> dict[int, str]:
+    """
+    Create presigned URLs that each let the holder PUT one part of a multipart upload.
+
+    Signing happens locally; S3 is not contacted, so the upload is not checked to exist.
+
+    :param bucket_name: The name of the S3 bucket.
+    :param object_key: path to the object in the S3 bucket.
+    :param upload_id: ID returned by `create_s3_multipart_upload`.
+    :param part_numbers: Numbers of the parts, from 1 to 10,000.
+    :param expires_in_seconds: Number of seconds the URLs stay valid for.
+    :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+
+    :return: Presigned URL for each part number.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    return {
+        part_number: s3_client.generate_presigned_url(
+            "upload_part",
+            Params={"Bucket": bucket_name, "Key": object_key, "UploadId": upload_id, "PartNumber": part_number},
+            ExpiresIn=expires_in_seconds,
+        )
+        for part_number in part_numbers
+    }
+
+
+def complete_s3_multipart_upload(
+    bucket_name: str,
+    object_key: str,
+    upload_id: str,
+    parts: list["CompletedPartTypeDef"],
+    conditional_writes: bool = True,
+    s3_client: Optional["S3Client"] = None,
+    metadata_cache: Optional[ObjectMetadataCache] = None,
+) -> bool:
+    """
+    Assemble the uploaded parts of a multipart upload into the object.
+
+    Creates are told from updates the same way as in `upload_s3_fileobj`.
+
+    :param bucket_name: The name of the S3 bucket.
+    :param object_key: path to the object in the S3 bucket.
+    :param upload_id: ID returned by `create_s3_multipart_upload`.
+    :param parts: Part number and ETag (as returned by S3 for the part's PUT) of every part.
+    :param conditional_writes: Whether to use `If-None-Match: *` to tell creates from updates.
+    :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+    :param metadata_cache: Optional metadata cache to invalidate the object's entry in.
+
+    :return: True if a new object was created, False if an existing object was replaced.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    try:
+        return _write_and_report_created(
+            lambda **conditions: s3_client.complete_multipart_upload(
+                Bucket=bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])},
+                **conditions,
+            ),
+            bucket_name,
+            object_key,
+            conditional_writes,
+            s3_client,
+        )
+    finally:
+        if metadata_cache is not None:
+            metadata_cache.invalidate(bucket_name, object_key)
+
+
+def abort_s3_multipart_upload(
+    bucket_name: str,
+    object_key: str,
+    upload_id: str,
+    s3_client: Optional["S3Client"] = None,
+) -> None:
+    """
+    Abort a multipart upload, so that S3 deletes its parts.
+
+    :param bucket_name: The name of the S3 bucket.
+    :param object_key: path to the object in the S3 bucket.
+    :param upload_id: ID returned by `create_s3_multipart_upload`.
+    :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    s3_client.abort_multipart_upload(Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+
+
+def _upload_s3_fileobj(
+    bucket_name: str,
+    object_key: str,
+    fileobj: BinaryIO,
+    content_type: str,
+    multipart_threshold: int,
+    part_size: int,
+    max_concurrency: int,
+    conditional_writes: bool,
+    s3_client: "S3Client",
+) -> bool:
+    """Upload `fileobj` as described in `upload_s3_fileobj` and return whether it created the object."""
+
+    def write_once(write: Callable[..., Any]) -> bool:
+        return _write_and_report_created(write, bucket_name, object_key, conditional_writes, s3_client)
+
+    # read one byte past the threshold to find out whether the file fits in a single PUT
+    head = fileobj.read(multipart_threshold + 1)
+    if len(head) <= multipart_threshold:
+        return write_once(
+            lambda **conditions: s3_client.put_object(
+                Bucket=bucket_name,
+                Key=object_key,
+                Body=head,
+                ContentType=content_type,
+                **conditions,
+            )
+        )
+
+    upload_id = s3_client.create_multipart_upload(
         Bucket=bucket_name,
         Key=object_key,
-        Body=file_content,
         ContentType=content_type,
-    )
\ No newline at end of file
+    )["UploadId"]
+    try:
+        parts = _upload_parts(
+            bucket_name=bucket_name,
+            object_key=object_key,
+            upload_id=upload_id,
+            part_bodies=_iter_part_bodies(head, fileobj, part_size),
+            max_concurrency=max_concurrency,
+            s3_client=s3_client,
+        )
+        return write_once(
+            lambda **conditions: s3_client.complete_multipart_upload(
+                Bucket=bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+                **conditions,
+            )
+        )
+    except BaseException:
+        s3_client.abort_multipart_upload(Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+        raise
+
+
+def _write_and_report_created(
+    write: Callable[..., Any],
+    bucket_name: str,
+    object_key: str,
+    conditional_writes: bool,
+    s3_client: "S3Client",
+) -> bool:
+    """Call `write` once and return whether it created the object, as described in `upload_s3_fileobj`."""
+    if conditional_writes:
+        return _write_unless_exists(write)
+    object_existed = object_exists_in_s3(bucket_name, object_key, s3_client=s3_client)
+    write()
+    return not object_existed
+
+
+def _write_unless_exists(write: Callable[..., Any]) -> bool:
+    """
+    Call `write(IfNoneMatch="*")`, falling back to an unconditional `write()` if the key already exists.
+
+    :return: True if the conditional write created the object, False if the fallback replaced it.
+    """
+    try:
+        write(IfNoneMatch="*")
+        return True
+    except ClientError as err:
+        if err.response["Error"]["Code"] != "PreconditionFailed":
+            raise
+    write()
+    return False
+
+
+def _iter_part_bodies(head: bytes, fileobj: BinaryIO, part_size: int) -> Iterator[bytes]:
+    """
+    Yield the parts of `head` followed by the rest of `fileobj`; only the last part may be shorter than its size.
+
+    Parts are `part_size` bytes, doubling every `MULTIPART_PART_SIZE_DOUBLING_PARTS` parts.
+
+    :raises ValueError: If there is more content than fits in `MAX_MULTIPART_PART_NUMBER` parts.
+    """
+    buffer = head
+    for part_number in range(1, MAX_MULTIPART_PART_NUMBER + 1):
+        size = _multipart_part_size(part_number, part_size)
+        while len(buffer) < size:
+            chunk = fileobj.read(size - len(buffer))
+            if not chunk:
+                break
+            buffer += chunk
+        if not buffer:
+            return
+        yield buffer[:size]
+        buffer = buffer[size:]
+    if buffer or fileobj.read(1):
+        raise ValueError(f"the file does not fit in {MAX_MULTIPART_PART_NUMBER} multipart upload parts")
+
+
+def _multipart_part_size(part_number: int, part_size: int) -> int:
+    """Return the size of a part of a streamed multipart upload, see `_iter_part_bodies`."""
+    doublings = (part_number - 1) // MULTIPART_PART_SIZE_DOUBLING_PARTS
+    return min(part_size * 2**doublings, max(part_size, MAX_MULTIPART_PART_SIZE_BYTES))
+
+
+def _upload_parts(
+    bucket_name: str,
+    object_key: str,
+    upload_id: str,
+    part_bodies: Iterator[bytes],
+    max_concurrency: int,
+    s3_client: "S3Client",
+) -> list["CompletedPartTypeDef"]:
+    """Upload parts with at most `max_concurrency` in flight and return them in part-number order."""
+
+    def upload_part(part_number: int, body: bytes) -> "CompletedPartTypeDef":
+        response = s3_client.upload_part(
+            Bucket=bucket_name,
+            Key=object_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    parts: list["CompletedPartTypeDef"] = []
+    in_flight: set[Future["CompletedPartTypeDef"]] = set()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for part_number, body in enumerate(part_bodies, start=1):
+            # wait for a slot before reading the next part so memory stays bounded
+            if len(in_flight) >= max_concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                parts.extend(future.result() for future in done)
+            in_flight.add(executor.submit(copy_context().run, upload_part, part_number, body))
+        parts.extend(future.result() for future in wait(in_flight).done)
+
+    return sorted(parts, key=lambda part: part["PartNumber"])
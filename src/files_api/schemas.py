@@ -1,9 +1,17 @@
 ####################################
 # --- Request/response schemas --- #
 ####################################
-from datetime import datetime
+import base64
+import binascii
+import json
+from datetime import (
+    datetime,
+    timezone,
+)
 from typing import (
+    Dict,
     List,
+    Literal,
     Optional,
 )
 from typing_extensions import Self
@@ -15,10 +23,27 @@ from pydantic import (
     model_validator
 )
 
+from files_api.s3.write_objects import MAX_MULTIPART_PART_NUMBER
+
 DEFAULT_GET_FILES_PAGE_SIZE = 10
 DEFAULT_GET_FILES_MIN_PAGE_SIZE = 10
 DEFAULT_GET_FILES_MAX_PAGE_SIZE = 100
 DEFAULT_GET_FILES_DIRECTORY = ""
+# S3 keys are at most 1024 bytes long
+MAX_FILE_PATH_LENGTH = 1024
+MAX_PART_URLS_PER_REQUEST = 1_000
+DEFAULT_QUERY_FILES_LIMIT = 100
+MAX_QUERY_FILES_LIMIT = 1_000
+DEFAULT_USAGE_SUBDIRECTORIES_LIMIT = 100
+MAX_USAGE_SUBDIRECTORIES_LIMIT = 1_000
+DEFAULT_GET_CHANGES_LIMIT = 100
+MAX_GET_CHANGES_LIMIT = 1_000
+# `since` value that starts a sync from the latest change, without returning earlier ones
+LATEST_CHANGES_CURSOR = "latest"
+# marks page tokens of non-recursive listings, which carry their directory and page size
+DIRECTORY_PAGE_TOKEN_PREFIX = "dir:"
+# marks page tokens of listings served by the listing index, which resume after the last key listed
+CURSOR_PAGE_TOKEN_PREFIX = "after:"
 
 #create/read (CRud)
 class PutFileResponse(BaseModel):
@@ -36,39 +61,342 @@ class FileMetadata(BaseModel):
     file_path: str
     last_modified: datetime
     size_bytes: int
+    # only filled in when listing with `include_metadata=true`
+    content_type: Optional[str] = None
+    etag: Optional[str] = None
+    user_metadata: Optional[Dict[str, str]] = None
 
 class GetFilesResponse(BaseModel):
     """
         TODO
     """
     files: List[FileMetadata]
+    # only set when listing with `recursive=false`: the subdirectories, e.g. "images/train/"
+    directories: Optional[List[str]] = None
+    # only set when listing with `include_count=true`: the number of files in the directory
+    total_count: Optional[int] = None
     next_page_token: Optional[str]
 
 class GetFilesQueryParams(BaseModel):
     """
         TODO
     """
-    page_size: int = Field(
-        DEFAULT_GET_FILES_PAGE_SIZE,
+    # page_size, directory and recursive default to None so that the validator can tell them
+    # apart from values sent with a page_token; it then fills in their real defaults
+    page_size: Optional[int] = Field(
+        None,
         ge=DEFAULT_GET_FILES_MIN_PAGE_SIZE,
         le=DEFAULT_GET_FILES_MAX_PAGE_SIZE,
     )
-    directory: Optional[str] = DEFAULT_GET_FILES_DIRECTORY
+    directory: Optional[str] = None
     page_token: Optional[str] = None
+    include_metadata: bool = False
+    # false lists only the files directly in `directory`, plus its subdirectories
+    recursive: Optional[bool] = None
+    # jump straight to a page, e.g. offset=50000 with page_size=100 for page 501; needs the listing index
+    offset: Optional[int] = Field(None, ge=0)
+    # count all files in `directory`; needs the listing index
+    include_count: bool = False
 
     @model_validator(mode='after')
     def check_passwords_match(self) -> Self:
+        # FastAPI passes every query parameter, including defaults, so "unset" means None here
         if self.page_token:
-            get_files_query_params: dict = self.model_dump(exclude_unset=True)
-            page_size_set = "page_size" in get_files_query_params.keys()
-            directory_set = "directory" in get_files_query_params.keys()
-            if page_size_set or directory_set:
-                raise ValueError("page_token is mutually exclusive with page_size and directory")
+            if self.page_size is not None or self.directory is not None or self.recursive is not None:
+                raise ValueError("page_token is mutually exclusive with page_size, directory and recursive")
+            if self.offset is not None:
+                raise ValueError("page_token is mutually exclusive with offset")
+            decode_directory_page_token(self.page_token)
+            decode_cursor_page_token(self.page_token)
+        if self.recursive is False and (self.offset is not None or self.include_count):
+            raise ValueError("offset and include_count are only supported for recursive listings")
+        if self.page_size is None:
+            self.page_size = DEFAULT_GET_FILES_PAGE_SIZE
+        if self.directory is None:
+            self.directory = DEFAULT_GET_FILES_DIRECTORY
+        if self.recursive is None:
+            self.recursive = True
+        return self
+
+
+def encode_directory_page_token(directory: str, continuation_token: str, page_size: int) -> str:
+    """
+    Wrap an S3 continuation token of a non-recursive listing into a `page_token`.
+
+    S3 needs the prefix and delimiter again on every page of a delimited listing, so the
+    token carries the directory (and the page size) for the next request.
+    """
+    return _encode_page_token(
+        DIRECTORY_PAGE_TOKEN_PREFIX, {"directory": directory, "token": continuation_token, "page_size": page_size}
+    )
+
+
+def decode_directory_page_token(page_token: str) -> Optional[tuple[str, str, int]]:
+    """
+    Unwrap a `page_token` made by `encode_directory_page_token`.
+
+    :return: The directory, S3 continuation token and page size; None if the token is
+        not a token of a non-recursive listing.
+    :raises ValueError: If the token is malformed.
+    """
+    payload = _decode_page_token(DIRECTORY_PAGE_TOKEN_PREFIX, page_token)
+    if payload is None:
+        return None
+    try:
+        return str(payload["directory"]), str(payload["token"]), int(payload["page_size"])
+    except (TypeError, KeyError, ValueError) as err:
+        raise ValueError("page_token is malformed") from err
+
+
+def encode_cursor_page_token(directory: str, start_after: str, page_size: int) -> str:
+    """
+    Make a `page_token` that continues a recursive listing after the key `start_after`.
+
+    Unlike S3 continuation tokens, these stay valid whether the next page is served from
+    the listing index or, with `StartAfter`, from S3.
+    """
+    return _encode_page_token(
+        CURSOR_PAGE_TOKEN_PREFIX, {"directory": directory, "start_after": start_after, "page_size": page_size}
+    )
+
+
+def decode_cursor_page_token(page_token: str) -> Optional[tuple[str, str, int]]:
+    """
+    Unwrap a `page_token` made by `encode_cursor_page_token`.
+
+    :return: The directory, the key to start after and the page size; None if the token is
+        not a cursor token.
+    :raises ValueError: If the token is malformed.
+    """
+    payload = _decode_page_token(CURSOR_PAGE_TOKEN_PREFIX, page_token)
+    if payload is None:
+        return None
+    try:
+        return str(payload["directory"]), str(payload["start_after"]), int(payload["page_size"])
+    except (TypeError, KeyError, ValueError) as err:
+        raise ValueError("page_token is malformed") from err
+
+
+def _encode_page_token(token_prefix: str, payload: dict) -> str:
+    return token_prefix + base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def _decode_page_token(token_prefix: str, page_token: str) -> Optional[dict]:
+    if not page_token.startswith(token_prefix):
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(page_token[len(token_prefix) :]))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as err:
+        raise ValueError("page_token is malformed") from err
+    if not isinstance(payload, dict):
+        raise ValueError("page_token is malformed")
+    return payload
+
+class QueryFilesParams(BaseModel):
+    """
+    Filters, order and size of a metadata query (`GET /query`); all filters must match.
+    """
+    directory: str = DEFAULT_GET_FILES_DIRECTORY
+    # comma-separated and case-insensitive, e.g. "ckpt,pt" or ".ckpt"
+    extensions: Optional[str] = None
+    min_size_bytes: Optional[int] = Field(None, ge=0)
+    max_size_bytes: Optional[int] = Field(None, ge=0)
+    modified_after: Optional[datetime] = None
+    modified_before: Optional[datetime] = None
+    sort_by: Literal["file_path", "size_bytes", "last_modified"] = "file_path"
+    order: Literal["asc", "desc"] = "asc"
+    limit: int = Field(DEFAULT_QUERY_FILES_LIMIT, ge=1, le=MAX_QUERY_FILES_LIMIT)
+
+    @model_validator(mode='after')
+    def check_ranges(self) -> Self:
+        # times without a time zone are taken as UTC, like S3's
+        if self.modified_after is not None and self.modified_after.tzinfo is None:
+            self.modified_after = self.modified_after.replace(tzinfo=timezone.utc)
+        if self.modified_before is not None and self.modified_before.tzinfo is None:
+            self.modified_before = self.modified_before.replace(tzinfo=timezone.utc)
+        if self.min_size_bytes is not None and self.max_size_bytes is not None:
+            if self.min_size_bytes > self.max_size_bytes:
+                raise ValueError("min_size_bytes must not be greater than max_size_bytes")
+        if self.modified_after is not None and self.modified_before is not None:
+            if self.modified_after >= self.modified_before:
+                raise ValueError("modified_after must be before modified_before")
         return self
 
+    @property
+    def extension_list(self) -> List[str]:
+        return [extension.strip() for extension in (self.extensions or "").split(",") if extension.strip()]
+
+class QueryFilesResponse(BaseModel):
+    """
+    Files matching a metadata query, in the requested order.
+    """
+    files: List[FileMetadata]
+
+class DirectoryUsageParams(BaseModel):
+    """
+    Directory to report the usage of (`GET /usage`), and how many of its subdirectories to include.
+    """
+    # "data" and "data/" are the same directory
+    directory: str = DEFAULT_GET_FILES_DIRECTORY
+    limit: int = Field(DEFAULT_USAGE_SUBDIRECTORIES_LIMIT, ge=1, le=MAX_USAGE_SUBDIRECTORIES_LIMIT)
+
+    @model_validator(mode='after')
+    def normalize_directory(self) -> Self:
+        if self.directory and not self.directory.endswith("/"):
+            self.directory += "/"
+        return self
+
+class DirectoryUsage(BaseModel):
+    """
+    Number and total size of the files under a directory, at any depth.
+    """
+    directory: str
+    file_count: int
+    total_bytes: int
+
+class DirectoryUsageResponse(DirectoryUsage):
+    """
+    Usage of a directory, of the files directly in it, and of its largest immediate subdirectories.
+    """
+    direct_file_count: int
+    direct_bytes: int
+    # largest first, at most `limit` of them
+    subdirectories: List[DirectoryUsage]
+
+class GetChangesQueryParams(BaseModel):
+    """
+    Cursor to read the changes after (`GET /changes`), and which and how many of them to return.
+    """
+    # a cursor from an earlier response; unset for every change in the journal, or "latest" for none
+    since: Optional[str] = None
+    directory: str = DEFAULT_GET_FILES_DIRECTORY
+    limit: int = Field(DEFAULT_GET_CHANGES_LIMIT, ge=1, le=MAX_GET_CHANGES_LIMIT)
+
+class FileChange(BaseModel):
+    """
+    The latest write or delete of one file.
+    """
+    file_path: str
+    change: Literal["put", "delete"]
+    # ETag of the written file; None for deletes
+    etag: Optional[str] = None
+    changed_at: datetime
+
+class GetChangesResponse(BaseModel):
+    """
+    Changes after a cursor, oldest first, and the cursor to pass as `since` next time.
+    """
+    changes: List[FileChange]
+    cursor: str
+    # true if `limit` cut the changes short; read on right away with `cursor`
+    has_more: bool
+
 # delete (cruD)
 class DeleteFileResponse(BaseModel):
     """
         TODO
     """
     message: str
+
+class BulkDeleteRequest(BaseModel):
+    """
+    Files to delete: either an explicit list of paths or everything under a directory.
+    """
+    file_paths: Optional[List[str]] = None
+    directory: Optional[str] = None
+
+    @model_validator(mode='after')
+    def check_exactly_one_target(self) -> Self:
+        if (self.file_paths is None) == (self.directory is None):
+            raise ValueError("exactly one of file_paths and directory must be given")
+        return self
+
+class BulkDeleteResult(BaseModel):
+    """
+    Outcome for one file of a bulk delete; streamed as one JSON line per file.
+    """
+    file_path: str
+    deleted: bool
+    error_code: Optional[str] = None
+    error_message: Optional[str] = None
+
+class BulkUploadResult(BaseModel):
+    """
+    Outcome for one file of a bulk upload.
+    """
+    file_path: str
+    status: Literal["created", "updated", "failed"]
+    error_code: Optional[str] = None
+    error_message: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    """
+    Manifest of a bulk upload, sorted by file path.
+    """
+    files: List[BulkUploadResult]
+
+# direct-to-S3 multipart uploads
+class CreateUploadRequest(BaseModel):
+    """
+    File to start a multipart upload for.
+    """
+    file_path: str = Field(..., min_length=1, max_length=MAX_FILE_PATH_LENGTH)
+    content_type: Optional[str] = None
+
+class CreateUploadResponse(BaseModel):
+    """
+    ID of a started multipart upload, to pass to the other `/uploads` routes.
+    """
+    file_path: str
+    upload_id: str
+
+class UploadPartUrlsRequest(BaseModel):
+    """
+    Parts of a multipart upload to create presigned URLs for.
+    """
+    file_path: str = Field(..., min_length=1, max_length=MAX_FILE_PATH_LENGTH)
+    upload_id: str = Field(..., min_length=1)
+    part_numbers: List[int] = Field(..., min_length=1, max_length=MAX_PART_URLS_PER_REQUEST)
+
+    @model_validator(mode='after')
+    def check_part_numbers_in_range(self) -> Self:
+        if not all(1 <= part_number <= MAX_MULTIPART_PART_NUMBER for part_number in self.part_numbers):
+            raise ValueError(f"part numbers must be between 1 and {MAX_MULTIPART_PART_NUMBER}")
+        return self
+
+class UploadPartUrl(BaseModel):
+    """
+    Presigned URL to PUT one part to; S3 answers with the part's ETag.
+    """
+    part_number: int
+    url: str
+
+class UploadPartUrlsResponse(BaseModel):
+    """
+    Presigned part URLs, valid for `expires_in_seconds`.
+    """
+    parts: List[UploadPartUrl]
+    expires_in_seconds: int
+
+class UploadedPart(BaseModel):
+    """
+    A part the client has uploaded, identified by the ETag S3 returned for it.
+    """
+    part_number: int = Field(..., ge=1, le=MAX_MULTIPART_PART_NUMBER)
+    etag: str
+
+class CompleteUploadRequest(BaseModel):
+    """
+    Every uploaded part of a multipart upload, to assemble into the file.
+    """
+    file_path: str = Field(..., min_length=1, max_length=MAX_FILE_PATH_LENGTH)
+    upload_id: str = Field(..., min_length=1)
+    parts: List[UploadedPart] = Field(..., min_length=1, max_length=MAX_MULTIPART_PART_NUMBER)
+
+class AbortUploadRequest(BaseModel):
+    """
+    Multipart upload to abort.
+    """
+    file_path: str = Field(..., min_length=1, max_length=MAX_FILE_PATH_LENGTH)
+    upload_id: str = Field(..., min_length=1)
+
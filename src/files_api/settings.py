@@ -1,9 +1,33 @@
+from pathlib import Path
+from typing import (
+    Literal,
+    Optional,
+)
+
 from pydantic import BaseModel, Field
 from pydantic_settings import (
     BaseSettings,
     SettingsConfigDict,
 )
 
+from files_api.s3.change_journal import DEFAULT_TOMBSTONE_RETENTION_SECONDS
+from files_api.s3.delete_objects import DEFAULT_BULK_DELETE_MAX_CONCURRENCY
+from files_api.s3.fault_injection import OperationFaults
+from files_api.s3.read_objects import (
+    DEFAULT_LISTING_MAX_CONCURRENCY,
+    DEFAULT_MAX_PREFETCH_BYTES,
+    DEFAULT_PREFETCH_OBJECTS,
+    DEFAULT_PRESIGNED_URL_EXPIRES_SECONDS,
+)
+from files_api.s3.write_objects import (
+    DEFAULT_BULK_UPLOAD_MAX_CONCURRENCY,
+    DEFAULT_MULTIPART_MAX_CONCURRENCY,
+    DEFAULT_MULTIPART_PART_SIZE_BYTES,
+    DEFAULT_MULTIPART_THRESHOLD_BYTES,
+    DEFAULT_PRESIGNED_PART_URL_EXPIRES_SECONDS,
+    MIN_MULTIPART_PART_SIZE_BYTES,
+)
+
 class Settings(BaseSettings):
     """Settings for the files API.
 
@@ -12,6 +36,92 @@ class Settings(BaseSettings):
     """
     s3_bucket_name: str = Field(...)
 
+    # --- S3 client (one per process, created in the app lifespan) --- #
+    s3_max_pool_connections: int = Field(default=50, ge=1)
+    s3_connect_timeout_seconds: float = Field(default=5.0, gt=0)
+    s3_read_timeout_seconds: float = Field(default=60.0, gt=0)
+    s3_max_attempts: int = Field(default=3, ge=1)
+    s3_retry_mode: Literal["legacy", "standard", "adaptive"] = "standard"
+    # number of worker threads running blocking boto3 calls; keep it <= s3_max_pool_connections
+    s3_thread_pool_size: int = Field(default=50, ge=1)
+    # for testing only: simulated S3 latency, errors and throttling by operation name, e.g.
+    # S3_SIMULATED_FAULTS='{"*": {"latency": {"median_seconds": 0.02, "p99_seconds": 0.2}, "slow_down_rate": 0.01}}'
+    s3_simulated_faults: dict[str, OperationFaults] = Field(default_factory=dict)
+    s3_simulated_faults_seed: Optional[int] = None
+
+    # --- uploads --- #
+    # files up to this size are sent with a single PUT; larger ones use a multipart upload
+    s3_multipart_threshold_bytes: int = Field(default=DEFAULT_MULTIPART_THRESHOLD_BYTES, ge=0)
+    s3_multipart_part_size_bytes: int = Field(
+        default=DEFAULT_MULTIPART_PART_SIZE_BYTES, ge=MIN_MULTIPART_PART_SIZE_BYTES
+    )
+    s3_multipart_max_concurrency: int = Field(default=DEFAULT_MULTIPART_MAX_CONCURRENCY, ge=1)
+    # tell creates from updates with `If-None-Match: *` instead of a HEAD before every PUT;
+    # disable for S3-compatible stores that do not support conditional writes
+    s3_conditional_writes: bool = True
+
+    # --- listings --- #
+    # key ranges listed at the same time by full listings (GET /inventory, archives and the
+    # listing index), which are otherwise limited to one page of 1000 keys per round trip
+    s3_listing_max_concurrency: int = Field(default=DEFAULT_LISTING_MAX_CONCURRENCY, ge=1)
+
+    # --- bulk operations --- #
+    # number of DeleteObjects requests (1000 keys each) in flight per bulk delete
+    s3_bulk_delete_max_concurrency: int = Field(default=DEFAULT_BULK_DELETE_MAX_CONCURRENCY, ge=1)
+    # number of files uploaded at the same time per bulk upload
+    s3_bulk_upload_max_concurrency: int = Field(default=DEFAULT_BULK_UPLOAD_MAX_CONCURRENCY, ge=1)
+    # most files accepted in one multipart/form-data bulk upload (tar streams are not limited)
+    bulk_upload_max_form_files: int = Field(default=10_000, ge=1)
+    # archive downloads fetch up to this many objects (each at most archive_max_prefetch_bytes) ahead
+    archive_prefetch_objects: int = Field(default=DEFAULT_PREFETCH_OBJECTS, ge=1)
+    archive_max_prefetch_bytes: int = Field(default=DEFAULT_MAX_PREFETCH_BYTES, ge=0)
+
+    # --- presigned-URL redirects for GET /files/{file_path} --- #
+    # when enabled, files above the threshold (or any file, with ?redirect=true) are
+    # answered with a 307 to a presigned S3 URL instead of being streamed through the API
+    download_redirects: bool = False
+    download_redirect_threshold_bytes: int = Field(default=64 * 1024**2, ge=0)
+    download_redirect_expires_seconds: int = Field(default=DEFAULT_PRESIGNED_URL_EXPIRES_SECONDS, ge=1, le=604_800)
+
+    # --- direct-to-S3 multipart uploads (/uploads routes) --- #
+    upload_part_url_expires_seconds: int = Field(default=DEFAULT_PRESIGNED_PART_URL_EXPIRES_SECONDS, ge=1, le=604_800)
+
+    # --- object metadata cache (HEAD results, including "not found") --- #
+    # 0 disables the cache
+    metadata_cache_max_entries: int = Field(default=10_000, ge=0)
+    metadata_cache_ttl_seconds: float = Field(default=5.0, ge=0)
+    metadata_cache_negative_ttl_seconds: float = Field(default=1.0, ge=0)
+
+    # --- local disk cache of object bodies for GET /files/{file_path} --- #
+    # unset disables the cache
+    body_cache_dir: Optional[Path] = None
+    body_cache_max_bytes: int = Field(default=1024**3, ge=0)
+    body_cache_max_object_bytes: int = Field(default=64 * 1024**2, ge=0)
+
+    # --- local listing index for GET /files (offsets, counts and cursors without S3 calls) --- #
+    # filled by a full listing at startup and every listing_index_reconcile_seconds, and kept
+    # current by this service's own writes and deletes; unset listing_index_path keeps it in memory,
+    # while an index in a file keeps its rows across restarts, so the startup listing only corrects them
+    listing_index_enabled: bool = False
+    listing_index_path: Optional[Path] = None
+    listing_index_reconcile_seconds: float = Field(default=600.0, gt=0)
+
+    # --- change journal for GET /changes (incremental sync of this service's writes and deletes) --- #
+    # unset change_journal_path keeps it in memory, so clients must list everything again after a restart;
+    # deletes are kept for change_journal_tombstone_retention_seconds, the longest a client can go without syncing
+    change_journal_enabled: bool = False
+    change_journal_path: Optional[Path] = None
+    change_journal_tombstone_retention_seconds: float = Field(default=DEFAULT_TOMBSTONE_RETENTION_SECONDS, gt=0)
+
+    # --- observability --- #
+    # Prometheus metrics at GET /metrics
+    metrics_enabled: bool = True
+    # add a Server-Timing header with the duration of each S3 call to every response
+    server_timing_enabled: bool = False
+    # cProfile requests into this directory (unset disables): a sample of them, and any sent with `X-Profile: 1`
+    profiling_dir: Optional[Path] = None
+    profiling_sample_rate: float = Field(default=0.0, ge=0, le=1)
+
     model_config = SettingsConfigDict(
         case_sensitive=False
-    )
\ No newline at end of file
+    )
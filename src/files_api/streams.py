@@ -0,0 +1,43 @@
+"""Adapters between async request bodies and the blocking file-like objects that the stdlib and boto3 expect."""
+
+import io
+from typing import (
+    AsyncIterator,
+    Optional,
+)
+
+import anyio.from_thread
+
+
+class BlockingStreamReader(io.RawIOBase):
+    """
+    Read-only, non-seekable file-like view of an async byte stream, e.g. `Request.stream()`.
+
+    Reads block until the event loop has received the next chunk, so the reader must only be
+    used from a worker thread started by anyio (such as `S3ThreadPool.run`). This lets blocking
+    parsers like `tarfile` consume a request body while it is still streaming in, without
+    buffering all of it first.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        """
+        :param chunks: Async iterator over the stream's chunks.
+        """
+        self._chunks = chunks
+        self._buffer: Optional[memoryview] = None
+
+    def readable(self) -> bool:
+        """Return True: the stream can be read."""
+        return True
+
+    def readinto(self, buffer: "bytearray | memoryview") -> int:  # type: ignore[override]
+        """Copy the next bytes of the stream into `buffer`, waiting for a chunk if needed; return 0 at its end."""
+        while not self._buffer:
+            try:
+                self._buffer = memoryview(anyio.from_thread.run(self._chunks.__anext__))
+            except StopAsyncIteration:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
@@ -1,3 +1,5 @@
+import time
+
 import pytest
 from fastapi.testclient import TestClient
 from files_api.main import create_app
@@ -9,7 +11,7 @@ from tests.consts import TEST_BUCKET_NAME
 # Fixture for FastAPI test client
 @pytest.fixture
 # pylint: disable=unused-argument
-def client(mocked_aws: TestClient) -> Generator[TestClient]:
+def client(mocked_aws: TestClient) -> Generator[TestClient, None, None]:
     """
         Create a generator with a TestClient object
     """
@@ -18,3 +20,32 @@ def client(mocked_aws: TestClient) -> Generator[TestClient]:
     app = create_app(settings=settings)
     with TestClient(app) as client:
         yield client
+
+
+@pytest.fixture
+# pylint: disable=unused-argument
+def indexed_client(mocked_aws: None) -> Generator[TestClient, None, None]:
+    """
+        Create a TestClient for an app with the listing index enabled, once the index is built
+    """
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, listing_index_enabled=True)
+
+    app = create_app(settings=settings)
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 5
+        while not app.state.listing_index.ready and time.monotonic() < deadline:
+            time.sleep(0.01)
+        yield client
+
+
+@pytest.fixture
+# pylint: disable=unused-argument
+def journaled_client(mocked_aws: None) -> Generator[TestClient, None, None]:
+    """
+        Create a TestClient for an app with the change journal enabled
+    """
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, change_journal_enabled=True)
+
+    app = create_app(settings=settings)
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,176 @@
+"""Test cases for `s3.body_cache`."""
+
+import threading
+from pathlib import Path
+from typing import Optional
+
+import boto3
+
+from files_api.s3.body_cache import ObjectBodyCache
+from files_api.s3.read_objects import fetch_s3_object_metadata
+from tests.consts import TEST_BUCKET_NAME
+
+
+def count_s3_calls(s3_client) -> list[str]:
+    calls = []
+    s3_client.meta.events.register("before-call.s3", lambda model, **kwargs: calls.append(model.name))
+    return calls
+
+
+def read_cached(cache: ObjectBodyCache, metadata, s3_client) -> Optional[bytes]:
+    cached_body = cache.acquire_or_download(TEST_BUCKET_NAME, metadata, s3_client=s3_client)
+    if cached_body is None:
+        return None
+    try:
+        return cached_body.path.read_bytes()
+    finally:
+        cache.release(cached_body)
+
+
+# pylint: disable=unused-argument
+def test_body_cache_downloads_once_per_etag(mocked_aws: None, tmp_path: Path):
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.bin", Body=b"v1")
+    cache = ObjectBodyCache(tmp_path, max_bytes=1024, max_object_bytes=1024)
+    calls = count_s3_calls(s3_client)
+
+    metadata = fetch_s3_object_metadata(TEST_BUCKET_NAME, "model.bin", s3_client=s3_client)
+    cached_body = cache.acquire_or_download(TEST_BUCKET_NAME, metadata, s3_client=s3_client)
+    path = cached_body.path
+    assert path.read_bytes() == b"v1"
+    cache.release(cached_body)
+    assert read_cached(cache, metadata, s3_client) == b"v1"
+    assert calls == ["HeadObject", "GetObject"]
+
+    # a new ETag is a miss, and the stale body is removed from disk
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.bin", Body=b"v2")
+    metadata = fetch_s3_object_metadata(TEST_BUCKET_NAME, "model.bin", s3_client=s3_client)
+    assert read_cached(cache, metadata, s3_client) == b"v2"
+    assert not path.exists()
+    assert cache.stats() == {"entries": 1, "bytes": 2, "hits": 1, "misses": 2, "evictions": 0}
+
+
+# pylint: disable=unused-argument
+def test_body_cache_returns_none_when_the_object_changed(mocked_aws: None, tmp_path: Path):
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.bin", Body=b"v1")
+    metadata = fetch_s3_object_metadata(TEST_BUCKET_NAME, "model.bin", s3_client=s3_client)
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.bin", Body=b"v2")
+
+    cache = ObjectBodyCache(tmp_path, max_bytes=1024, max_object_bytes=1024)
+    assert cache.acquire_or_download(TEST_BUCKET_NAME, metadata, s3_client=s3_client) is None
+    assert cache.stats()["entries"] == 0
+
+
+# pylint: disable=unused-argument
+def test_body_cache_evicts_least_recently_used_bodies(mocked_aws: None, tmp_path: Path):
+    s3_client = boto3.client("s3")
+    for key in ["a", "b", "c"]:
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=key, Body=b"x" * 40)
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="too-big", Body=b"x" * 60)
+    cache = ObjectBodyCache(tmp_path, max_bytes=100, max_object_bytes=50)
+    metadata = {
+        key: fetch_s3_object_metadata(TEST_BUCKET_NAME, key, s3_client=s3_client) for key in ["a", "b", "c", "too-big"]
+    }
+
+    assert read_cached(cache, metadata["too-big"], s3_client) is None
+    for key in ["a", "b", "a", "c"]:
+        read_cached(cache, metadata[key], s3_client)
+
+    assert cache.total_bytes == 80
+    assert cache.evictions == 1
+    assert len(list(tmp_path.glob("*.body"))) == 2
+    calls = count_s3_calls(s3_client)
+    read_cached(cache, metadata["a"], s3_client)
+    read_cached(cache, metadata["b"], s3_client)
+    assert calls == ["GetObject"]
+
+
+# pylint: disable=unused-argument
+def test_body_cache_fills_concurrent_misses_with_one_download(mocked_aws: None, tmp_path: Path):
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.bin", Body=b"weights")
+    metadata = fetch_s3_object_metadata(TEST_BUCKET_NAME, "model.bin", s3_client=s3_client)
+    cache = ObjectBodyCache(tmp_path, max_bytes=1024, max_object_bytes=1024)
+    calls = count_s3_calls(s3_client)
+
+    cached_bodies = []
+    threads = [
+        threading.Thread(
+            target=lambda: cached_bodies.append(cache.acquire_or_download(TEST_BUCKET_NAME, metadata, s3_client))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["GetObject"]
+    assert len({cached_body.path for cached_body in cached_bodies}) == 1
+    assert cache.stats()["misses"] == 1
+    for cached_body in cached_bodies:
+        cache.release(cached_body)
+    assert cached_bodies[0].readers == 0
+
+
+# pylint: disable=unused-argument
+def test_body_cache_readers_keep_bodies_that_are_removed(mocked_aws: None, tmp_path: Path):
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.bin", Body=b"v1")
+    metadata = fetch_s3_object_metadata(TEST_BUCKET_NAME, "model.bin", s3_client=s3_client)
+    cache = ObjectBodyCache(tmp_path, max_bytes=1024, max_object_bytes=1024)
+
+    cached_body = cache.acquire_or_download(TEST_BUCKET_NAME, metadata, s3_client=s3_client)
+    # e.g. a DELETE of the file while the body is still being streamed to a client
+    cache.discard(TEST_BUCKET_NAME, "model.bin")
+    assert cache.stats()["entries"] == 0
+    assert cached_body.path.read_bytes() == b"v1"
+
+    # the last reader unlinks it
+    cache.release(cached_body)
+    assert list(tmp_path.glob("*.body")) == []
+
+
+# pylint: disable=unused-argument
+def test_body_cache_evicting_a_leased_body_waits_for_its_readers(mocked_aws: None, tmp_path: Path):
+    s3_client = boto3.client("s3")
+    for key in ["a", "b"]:
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=key, Body=b"x" * 40)
+    metadata = {key: fetch_s3_object_metadata(TEST_BUCKET_NAME, key, s3_client=s3_client) for key in ["a", "b"]}
+    cache = ObjectBodyCache(tmp_path, max_bytes=50, max_object_bytes=50)
+
+    leased = cache.acquire_or_download(TEST_BUCKET_NAME, metadata["a"], s3_client=s3_client)
+    assert read_cached(cache, metadata["b"], s3_client) == b"x" * 40
+    assert cache.evictions == 1
+    assert cache.total_bytes == 40
+    assert leased.path.exists()
+
+    cache.release(leased)
+    assert not leased.path.exists()
+
+
+# pylint: disable=unused-argument
+def test_body_cache_acquire_never_downloads(mocked_aws: None, tmp_path: Path):
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.bin", Body=b"v1")
+    metadata = fetch_s3_object_metadata(TEST_BUCKET_NAME, "model.bin", s3_client=s3_client)
+    cache = ObjectBodyCache(tmp_path, max_bytes=1024, max_object_bytes=1024)
+    calls = count_s3_calls(s3_client)
+
+    assert not cache.contains(TEST_BUCKET_NAME, "model.bin")
+    assert cache.acquire(TEST_BUCKET_NAME, metadata) is None
+    assert calls == []
+
+    read_cached(cache, metadata, s3_client)
+    cached_body = cache.acquire(TEST_BUCKET_NAME, metadata)
+    assert cached_body.path.read_bytes() == b"v1"
+    cache.release(cached_body)
+    assert calls == ["GetObject"]
+
+
+def test_body_cache_removes_leftovers_from_previous_runs(tmp_path: Path):
+    (tmp_path / "stale.body").write_bytes(b"stale")
+    (tmp_path / "unrelated.txt").write_bytes(b"keep me")
+    ObjectBodyCache(tmp_path, max_bytes=1024, max_object_bytes=1024)
+    assert [path.name for path in tmp_path.iterdir()] == ["unrelated.txt"]
@@ -0,0 +1,104 @@
+"""Test cases for `s3.change_journal`."""
+
+import time
+
+import boto3
+import pytest
+
+from files_api.s3.change_journal import (
+    ChangeJournal,
+    CursorExpiredError,
+)
+from tests.consts import TEST_BUCKET_NAME
+
+
+def _changes(journal: ChangeJournal, cursor=None, **kwargs) -> list[tuple[str, bool]]:
+    return [(change.key, change.deleted) for change in journal.changes_since(cursor, **kwargs)[0]]
+
+
+def test_changes_since_a_cursor_are_compacted_per_key():
+    """Assert that a cursor returns each key changed since once, with its latest change, in order."""
+    journal = ChangeJournal(TEST_BUCKET_NAME)
+    journal.record_write("a.txt")
+    journal.record_write("b.txt")
+    _, cursor = journal.changes_since()
+
+    journal.record_write("a.txt")
+    journal.record_write("c/1.txt")
+    journal.record_delete("b.txt")
+    journal.record_write("a.txt", etag='"abc"')
+    assert _changes(journal, cursor) == [("c/1.txt", False), ("b.txt", True), ("a.txt", False)]
+    assert _changes(journal, cursor, prefix="c/") == [("c/1.txt", False)]
+    assert journal.changes_since(cursor)[0][-1].etag == '"abc"'
+
+    # limit pages through the changes; an exhausted cursor stays valid and returns nothing
+    changes, next_cursor = journal.changes_since(cursor, limit=2)
+    assert [change.key for change in changes] == ["c/1.txt", "b.txt"]
+    changes, next_cursor = journal.changes_since(next_cursor, limit=2)
+    assert [change.key for change in changes] == ["a.txt"]
+    assert journal.changes_since(next_cursor)[0] == []
+    assert next_cursor == journal.latest_cursor()
+
+
+def test_expired_and_foreign_cursors():
+    """Assert that cursors from before dropped deletes, or from another journal, are refused."""
+    journal = ChangeJournal(TEST_BUCKET_NAME, tombstone_retention_seconds=60)
+    start = journal.latest_cursor()
+    journal.record_delete("old.txt")
+    after_delete = journal.latest_cursor()
+    journal.record_write("new.txt")
+
+    assert journal.compact() == 0
+    assert journal.compact(now=time.time() + 120) == 1
+    with pytest.raises(CursorExpiredError):
+        journal.changes_since(start)
+    assert _changes(journal, after_delete) == [("new.txt", False)]
+    # reading from the start serves what is left, with a cursor to read on from
+    changes, cursor = journal.changes_since()
+    assert [change.key for change in changes] == ["new.txt"]
+    assert cursor == journal.latest_cursor()
+
+    with pytest.raises(CursorExpiredError):
+        ChangeJournal(TEST_BUCKET_NAME).changes_since(after_delete)
+    with pytest.raises(ValueError):
+        journal.changes_since("not-a-cursor")
+
+
+def test_journal_is_kept_across_restarts(tmp_path):
+    """Assert that a journal on disk keeps its changes and accepts the cursors it handed out before."""
+    journal = ChangeJournal(TEST_BUCKET_NAME, path=tmp_path / "changes.db")
+    cursor = journal.latest_cursor()
+    journal.record_write("a.txt")
+    journal.close()
+
+    journal = ChangeJournal(TEST_BUCKET_NAME, path=tmp_path / "changes.db")
+    assert _changes(journal, cursor) == [("a.txt", False)]
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_instrumented_writes_and_deletes_are_journaled():
+    """Assert that writes, copies and deletes made with an instrumented client are journaled, other buckets' not."""
+    s3_client = boto3.client("s3")
+    journal = ChangeJournal(TEST_BUCKET_NAME)
+    journal.instrument(s3_client)
+
+    response = s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="a.txt", Body=b"a")
+    s3_client.copy_object(
+        Bucket=TEST_BUCKET_NAME, Key="b.txt", CopySource={"Bucket": TEST_BUCKET_NAME, "Key": "a.txt"}
+    )
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="c.txt", Body=b"c")
+    s3_client.delete_object(Bucket=TEST_BUCKET_NAME, Key="a.txt")
+    s3_client.delete_objects(Bucket=TEST_BUCKET_NAME, Delete={"Objects": [{"Key": "c.txt"}]})
+    s3_client.create_bucket(Bucket="other-bucket")
+    s3_client.put_object(Bucket="other-bucket", Key="d.txt", Body=b"d")
+
+    changes = journal.changes_since()[0]
+    assert [(change.key, change.deleted) for change in changes] == [
+        ("b.txt", False),
+        ("a.txt", True),
+        ("c.txt", True),
+    ]
+    assert changes[0].etag == response["ETag"]
+
+    s3_client.delete_object(Bucket="other-bucket", Key="d.txt")
+    s3_client.delete_bucket(Bucket="other-bucket")
@@ -1,9 +1,17 @@
 """Test cases for `s3.delete_objects`."""
 
 import boto3
+import pytest
 
-from files_api.s3.delete_objects import delete_s3_object
-from files_api.s3.read_objects import object_exists_in_s3
+from files_api.s3 import delete_objects
+from files_api.s3.delete_objects import (
+    delete_s3_object,
+    delete_s3_objects,
+)
+from files_api.s3.read_objects import (
+    iter_s3_object_keys,
+    object_exists_in_s3,
+)
 from files_api.s3.write_objects import upload_s3_object
 from tests.consts import TEST_BUCKET_NAME
 
@@ -25,3 +33,31 @@ def test_delete_nonexistent_s3_object(mocked_aws: None):
     delete_s3_object(TEST_BUCKET_NAME, "testfile.txt")
     # the file should still not be present
     assert object_exists_in_s3(TEST_BUCKET_NAME, "testfile.txt") is False
+
+
+# pylint: disable=unused-argument
+def test_delete_s3_objects_in_batches(mocked_aws: None, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(delete_objects, "MAX_KEYS_PER_DELETE_OBJECTS", 2)
+    s3_client = boto3.client("s3")
+    for index in range(5):
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=f"run/shard-{index}", Body=b"x")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="keep.txt", Body=b"x")
+    calls = []
+    s3_client.meta.events.register("before-call.s3.DeleteObjects", lambda model, **kwargs: calls.append(model.name))
+
+    object_keys = iter_s3_object_keys(TEST_BUCKET_NAME, prefix="run/", s3_client=s3_client)
+    batches = list(delete_s3_objects(TEST_BUCKET_NAME, object_keys, max_concurrency=2, s3_client=s3_client))
+
+    assert len(calls) == 3
+    assert sorted(len(batch) for batch in batches) == [1, 2, 2]
+    assert all(result.deleted for batch in batches for result in batch)
+    assert list(iter_s3_object_keys(TEST_BUCKET_NAME, s3_client=s3_client)) == ["keep.txt"]
+
+
+# pylint: disable=unused-argument
+def test_delete_s3_objects_reports_failed_requests_per_key(mocked_aws: None):
+    batches = list(delete_s3_objects("missing-bucket", ["a.txt", "b.txt"]))
+    results = [result for batch in batches for result in batch]
+    assert [result.key for result in results] == ["a.txt", "b.txt"]
+    assert all(not result.deleted and result.error_code == "NoSuchBucket" for result in results)
+
@@ -0,0 +1,108 @@
+"""Test cases for `s3.fault_injection`."""
+
+import random
+import time
+
+import pytest
+from botocore.exceptions import (
+    ClientError,
+    ReadTimeoutError,
+)
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from files_api.main import create_app
+from files_api.s3.client import create_s3_client
+from files_api.s3.fault_injection import (
+    LatencyDistribution,
+    OperationFaults,
+    S3FaultInjector,
+)
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_slow_down_is_retried_until_attempts_run_out():
+    """Assert that simulated throttling goes through botocore's retries and surfaces as `SlowDown`."""
+    s3_client = create_s3_client(max_attempts=3)
+    injector = S3FaultInjector({"PutObject": OperationFaults(slow_down_rate=1.0)})
+    injector.instrument(s3_client)
+
+    with pytest.raises(ClientError) as exc_info:
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="a.txt", Body=b"a")
+
+    assert exc_info.value.response["Error"]["Code"] == "SlowDown"
+    assert exc_info.value.response["ResponseMetadata"]["RetryAttempts"] == 2
+    assert injector.stats() == {"attempts": 3, "errors": 0, "throttles": 3, "timeouts": 0}
+    # operations without faults (and no "*" default) are sent as usual
+    s3_client.list_objects_v2(Bucket=TEST_BUCKET_NAME)
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_rate_limit_throttles_only_the_excess():
+    """Assert that attempts above `max_requests_per_second` are throttled and succeed once retried."""
+    s3_client = create_s3_client(max_attempts=1)
+    S3FaultInjector({"*": OperationFaults(max_requests_per_second=5)}).instrument(s3_client)
+
+    results = []
+    for index in range(8):
+        try:
+            s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=f"{index}.txt", Body=b"a")
+            results.append("ok")
+        except ClientError as err:
+            results.append(err.response["Error"]["Code"])
+
+    assert results[:5] == ["ok"] * 5
+    assert "SlowDown" in results[5:]
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_latency_and_read_timeouts():
+    """Assert that latency delays each attempt, and latency beyond the read timeout raises a timeout."""
+    s3_client = create_s3_client(read_timeout=0.2, max_attempts=2)
+    injector = S3FaultInjector(
+        {
+            "HeadBucket": OperationFaults(latency=LatencyDistribution(median_seconds=0.05)),
+            "GetObject": OperationFaults(latency=LatencyDistribution(median_seconds=1.0)),
+        }
+    )
+    injector.instrument(s3_client)
+
+    started_at = time.perf_counter()
+    s3_client.head_bucket(Bucket=TEST_BUCKET_NAME)
+    assert time.perf_counter() - started_at >= 0.05
+
+    with pytest.raises(ReadTimeoutError):
+        s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="a.txt")
+    assert injector.stats()["timeouts"] == 2
+
+
+def test_latency_distribution_has_the_configured_percentiles():
+    """Assert that sampled latencies have roughly the configured median and 99th percentile."""
+    distribution = LatencyDistribution(median_seconds=0.02, p99_seconds=0.2)
+    rng = random.Random(0)
+    samples = sorted(distribution.sample(rng) for _ in range(20_000))
+
+    assert samples[10_000] == pytest.approx(0.02, rel=0.1)
+    assert samples[19_800] == pytest.approx(0.2, rel=0.15)
+    with pytest.raises(ValueError):
+        LatencyDistribution(median_seconds=0.2, p99_seconds=0.1)
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_app_uses_simulated_faults_from_settings():
+    """Assert that `s3_simulated_faults` applies to the app's client, and failed S3 calls become 5xx responses."""
+    settings = Settings.model_validate(
+        {
+            "s3_bucket_name": TEST_BUCKET_NAME,
+            "s3_max_attempts": 2,
+            "s3_simulated_faults": {"GetObject": {"error_rate": 1.0}},
+        }
+    )
+    with TestClient(create_app(settings=settings), raise_server_exceptions=False) as client:
+        assert client.put("/files/a.txt", files={"file": ("a.txt", b"a", "text/plain")}).status_code < 300
+
+        response = client.get("/files/a.txt")
+
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
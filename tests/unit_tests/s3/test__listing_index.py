@@ -0,0 +1,234 @@
+"""Test cases for `s3.listing_index`."""
+
+import threading
+from datetime import (
+    datetime,
+    timezone,
+)
+
+import boto3
+import pytest
+
+from files_api.s3.listing_index import (
+    DirectoryUsage,
+    ObjectListingIndex,
+)
+from tests.consts import TEST_BUCKET_NAME
+
+
+def _keys(listing_index: ObjectListingIndex, **kwargs) -> list[str]:
+    return [indexed.key for indexed in listing_index.list_objects(**kwargs)]
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_reconcile_and_query():
+    """Assert that a reconciled index answers prefix listings, offsets, cursors and counts like S3 would."""
+    s3_client = boto3.client("s3")
+    keys = ["a/1.txt", "a/2.txt", "a/b/3.txt", "a0.txt", "b/1.txt", "é.txt"]
+    for key in keys:
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=key, Body=b"abc")
+
+    listing_index = ObjectListingIndex(TEST_BUCKET_NAME)
+    assert not listing_index.ready
+    listing_index.reconcile(s3_client)
+
+    assert listing_index.ready
+    assert _keys(listing_index) == keys
+    assert _keys(listing_index, prefix="a/") == ["a/1.txt", "a/2.txt", "a/b/3.txt"]
+    assert _keys(listing_index, prefix="a/", offset=1, limit=1) == ["a/2.txt"]
+    assert _keys(listing_index, prefix="a/", start_after="a/2.txt") == ["a/b/3.txt"]
+    assert listing_index.count() == 6
+    assert listing_index.count(prefix="a") == 4
+    assert listing_index.count(prefix="missing/") == 0
+
+    indexed = listing_index.list_objects(prefix="b/")[0]
+    assert indexed.size_bytes == 3
+    assert indexed.last_modified.tzinfo is not None
+
+
+def test_prefixes_ending_just_below_the_surrogates():
+    """Assert that a prefix ending in U+D7FF, whose next code point would be a surrogate, can be listed."""
+    listing_index = ObjectListingIndex(TEST_BUCKET_NAME)
+    last_modified = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for key in ["a\ud7ff/1.txt", "a\ue000.txt", "b.txt"]:
+        listing_index.put(key, size_bytes=1, last_modified=last_modified)
+
+    assert _keys(listing_index, prefix="a\ud7ff") == ["a\ud7ff/1.txt"]
+    assert listing_index.count(prefix="a\ud7ff") == 1
+    listing_index.close()
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_instrumented_writes_and_deletes_update_the_index():
+    """Assert that writes and deletes made with an instrumented client are applied right away."""
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="old.txt", Body=b"a")
+    listing_index = ObjectListingIndex(TEST_BUCKET_NAME)
+    listing_index.reconcile(s3_client)
+    listing_index.instrument(s3_client)
+
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="new.txt", Body=b"abcd")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="gone-1.txt", Body=b"a")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="gone-2.txt", Body=b"a")
+    assert listing_index.list_objects(prefix="new.txt")[0].size_bytes == 4
+
+    s3_client.delete_object(Bucket=TEST_BUCKET_NAME, Key="old.txt")
+    s3_client.delete_objects(
+        Bucket=TEST_BUCKET_NAME, Delete={"Objects": [{"Key": "gone-1.txt"}, {"Key": "gone-2.txt"}]}
+    )
+    assert _keys(listing_index) == ["new.txt"]
+    listing_index.close()
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_written_sizes_are_looked_up_only_when_the_request_has_none():
+    """Assert that puts are indexed without a HEAD, and that copies are indexed once their size is looked up."""
+    s3_client = boto3.client("s3")
+    listing_index = ObjectListingIndex(TEST_BUCKET_NAME)
+    listing_index.reconcile(s3_client)
+    listing_index.instrument(s3_client)
+    heads = []
+    s3_client.meta.events.register("before-call.s3.HeadObject", lambda **kwargs: heads.append(kwargs))
+
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="put.txt", Body=b"abcd")
+    assert listing_index.list_objects(prefix="put.txt")[0].size_bytes == 4
+    s3_client.copy_object(Bucket=TEST_BUCKET_NAME, Key="copy.txt", CopySource=f"{TEST_BUCKET_NAME}/put.txt")
+    listing_index.flush()
+
+    assert listing_index.list_objects(prefix="copy.txt")[0].size_bytes == 4
+    assert len(heads) == 1
+    listing_index.close()
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_size_lookups_do_not_bring_back_deleted_keys():
+    """Assert that a size lookup that finishes after the key is deleted does not index it again."""
+    s3_client = boto3.client("s3")
+    listing_index = ObjectListingIndex(TEST_BUCKET_NAME)
+    listing_index.reconcile(s3_client)
+    listing_index.instrument(s3_client)
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="put.txt", Body=b"abcd")
+
+    # the HEAD of the copy returns only after the copy has been deleted
+    deleted = threading.Event()
+
+    def wait_for_delete(**kwargs) -> None:
+        deleted.wait(timeout=5)
+
+    s3_client.meta.events.register("before-call.s3.HeadObject", wait_for_delete)
+    s3_client.copy_object(Bucket=TEST_BUCKET_NAME, Key="copy.txt", CopySource=f"{TEST_BUCKET_NAME}/put.txt")
+    s3_client.delete_object(Bucket=TEST_BUCKET_NAME, Key="copy.txt")
+    # written again by another client, so a HEAD would find it
+    boto3.client("s3").put_object(Bucket=TEST_BUCKET_NAME, Key="copy.txt", Body=b"ab")
+    deleted.set()
+    listing_index.flush()
+
+    assert _keys(listing_index) == ["put.txt"]
+    listing_index.close()
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_reconcile_removes_stale_keys_and_keeps_concurrent_writes():
+    """Assert that reconciliation drops keys deleted behind the index's back, but not writes made meanwhile."""
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="kept.txt", Body=b"a")
+    listing_index = ObjectListingIndex(TEST_BUCKET_NAME)
+    listing_index.put("deleted-elsewhere.txt", 1, datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    def write_during_listing(**kwargs):
+        listing_index.put("written-meanwhile.txt", 1, datetime.now(timezone.utc))
+        listing_index.discard("kept.txt")
+
+    s3_client.meta.events.register("after-call.s3.ListObjectsV2", write_during_listing)
+    listing_index.reconcile(s3_client)
+
+    # kept.txt was deleted after the listing saw it, so the listing must not bring it back
+    assert _keys(listing_index) == ["written-meanwhile.txt"]
+    assert listing_index.stats()["reconciliations"] == 1
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_directory_usage_follows_reconciliation_writes_and_deletes():
+    """Assert that directory totals are built by reconciliation and kept current by `put` and `discard`."""
+    s3_client = boto3.client("s3")
+    for key, size in [("a/1.txt", 1), ("a/b/2.txt", 10), ("a/b/c/3.txt", 100), ("top.txt", 1000)]:
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=key, Body=b"x" * size)
+    listing_index = ObjectListingIndex(TEST_BUCKET_NAME)
+    listing_index.reconcile(s3_client)
+
+    assert listing_index.usage() == DirectoryUsage("", 4, 1111, 1, 1000)
+    assert listing_index.usage("a/") == DirectoryUsage("a/", 3, 111, 1, 1)
+    assert listing_index.subdirectory_usage() == [DirectoryUsage("a/", 3, 111, 1, 1)]
+    assert listing_index.subdirectory_usage("a/") == [DirectoryUsage("a/b/", 2, 110, 1, 10)]
+
+    # overwriting changes the bytes but not the count
+    listing_index.put("a/b/2.txt", 20, datetime.now(timezone.utc))
+    assert listing_index.usage("a/b/") == DirectoryUsage("a/b/", 2, 120, 1, 20)
+    assert listing_index.usage().total_bytes == 1121
+
+    # emptied directories disappear; discarding an unknown key changes nothing
+    listing_index.discard("a/b/c/3.txt")
+    listing_index.discard("a/b/c/3.txt")
+    assert listing_index.usage("a/b/c/") == DirectoryUsage("a/b/c/", 0, 0, 0, 0)
+    assert listing_index.subdirectory_usage("a/b/") == []
+    assert listing_index.usage() == DirectoryUsage("", 3, 1021, 1, 1000)
+
+    # a reconciliation after changes made behind the index's back leaves the same totals as a fresh one
+    s3_client.delete_object(Bucket=TEST_BUCKET_NAME, Key="top.txt")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="a/b/c/3.txt", Body=b"x" * 100)
+    listing_index.reconcile(s3_client)
+    fresh_index = ObjectListingIndex(TEST_BUCKET_NAME)
+    fresh_index.reconcile(s3_client)
+    for directory in ("", "a/", "a/b/", "a/b/c/"):
+        assert listing_index.usage(directory) == fresh_index.usage(directory)
+    assert listing_index.usage() == DirectoryUsage("", 3, 111, 0, 0)
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_reconcile_keeps_writes_made_after_the_listing():
+    """Assert that a page listed before a concurrent write does not overwrite the write's newer size."""
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.bin", Body=b"old")
+    listing_index = ObjectListingIndex(TEST_BUCKET_NAME, max_listing_concurrency=1)
+
+    def write_after_listing(**kwargs):
+        # S3 now has 5 bytes, but the page being applied still says 3
+        listing_index.put("model.bin", 5, datetime.now(timezone.utc))
+
+    s3_client.meta.events.register("after-call.s3.ListObjectsV2", write_after_listing)
+    listing_index.reconcile(s3_client)
+
+    assert listing_index.list_objects()[0].size_bytes == 5
+    assert listing_index.usage().total_bytes == 5
+
+
+@pytest.mark.usefixtures("mocked_aws")
+def test_index_in_a_file_is_kept_across_restarts(tmp_path):
+    """Assert that a reopened index keeps its rows, and is ready once its next reconciliation corrected them."""
+    s3_client = boto3.client("s3")
+    path = tmp_path / "listing-index.sqlite3"
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="a/kept.txt", Body=b"abc")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="a/gone.txt", Body=b"abcd")
+    listing_index = ObjectListingIndex(TEST_BUCKET_NAME, path=path)
+    listing_index.reconcile(s3_client)
+    listing_index.close()
+
+    # changed while the service was down
+    s3_client.delete_object(Bucket=TEST_BUCKET_NAME, Key="a/gone.txt")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="a/new.txt", Body=b"ab")
+
+    listing_index = ObjectListingIndex(TEST_BUCKET_NAME, path=path)
+    assert not listing_index.ready
+    assert listing_index.last_reconciled_at is not None
+    assert _keys(listing_index) == ["a/gone.txt", "a/kept.txt"]
+    listing_index.reconcile(s3_client)
+    assert listing_index.ready
+    assert _keys(listing_index) == ["a/kept.txt", "a/new.txt"]
+    assert listing_index.usage("a/") == DirectoryUsage("a/", 2, 5, 2, 5)
+    listing_index.close()
+
+    # an index of another bucket is not reused
+    other_index = ObjectListingIndex("other-bucket", path=path)
+    assert not other_index.ready
+    assert _keys(other_index) == []
+    other_index.close()
@@ -1,10 +1,23 @@
 """Test cases for `s3.read_objects`."""
 
+from datetime import datetime
+
 import boto3
+import pytest
 from tests.consts import TEST_BUCKET_NAME
+from files_api.s3.delete_objects import delete_s3_object
+from files_api.s3.write_objects import upload_s3_object
 from files_api.s3.read_objects import (
+    ObjectMetadataCache,
+    S3ObjectMetadata,
+    fetch_s3_directory_listing,
+    fetch_s3_object_metadata,
     fetch_s3_objects_metadata,
     fetch_s3_objects_using_page_token,
+    iter_s3_object_bodies,
+    iter_s3_object_pages,
+    iter_s3_object_pages_in_parallel,
+    iter_s3_objects,
     object_exists_in_s3,
 )
 
@@ -18,6 +31,32 @@ def test_object_exists_in_s3(mocked_aws):
     assert object_exists_in_s3(TEST_BUCKET_NAME, "nonexistent.txt") is False
 
 
+# pylint: disable=unused-argument
+def test_fetch_s3_object_metadata(mocked_aws):
+    """Assert that `fetch_s3_object_metadata` returns a typed record without opening the body."""
+    s3_client = boto3.client("s3")
+    put_response = s3_client.put_object(
+        Bucket=TEST_BUCKET_NAME,
+        Key="testfile.txt",
+        Body="test content",
+        ContentType="text/plain",
+        Metadata={"owner": "ml-team"},
+    )
+    calls = []
+    s3_client.meta.events.register("before-call.s3", lambda model, **kwargs: calls.append(model.name))
+
+    metadata = fetch_s3_object_metadata(TEST_BUCKET_NAME, "testfile.txt", s3_client=s3_client)
+    assert metadata.key == "testfile.txt"
+    assert metadata.size_bytes == len("test content")
+    assert metadata.content_type == "text/plain"
+    assert metadata.etag == put_response["ETag"]
+    assert metadata.user_metadata == {"owner": "ml-team"}
+    assert metadata.last_modified is not None
+
+    assert fetch_s3_object_metadata(TEST_BUCKET_NAME, "nonexistent.txt", s3_client=s3_client) is None
+    assert calls == ["HeadObject", "HeadObject"]
+
+
 # pylint: disable=unused-argument
 def test_pagination(mocked_aws):  # noqa: R701
     """Assert that pagination works correctly."""
@@ -101,3 +140,208 @@ def test_directory_queries(mocked_aws):  # noqa: R701 - too complex
     assert files[3]["Key"] == "folder2/file3.txt"
     assert files[4]["Key"] == "folder2/subfolder1/file4.txt"
     assert next_page_token is None
+
+
+# pylint: disable=unused-argument
+def test_fetch_s3_directory_listing(mocked_aws):
+    """Assert that a delimited listing returns direct children and rolls nested keys up into subdirectories."""
+    s3_client = boto3.client("s3")
+    for key in ["folder2/file3.txt", "folder2/a/1.txt", "folder2/a/b/2.txt", "folder2/c/3.txt", "file5.txt"]:
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=key, Body="content")
+
+    files, subdirectories, next_page_token = fetch_s3_directory_listing(TEST_BUCKET_NAME, prefix="folder2/")
+    assert [file["Key"] for file in files] == ["folder2/file3.txt"]
+    assert subdirectories == ["folder2/a/", "folder2/c/"]
+    assert next_page_token is None
+
+    # pages count files and subdirectories together and keep the prefix and delimiter
+    files, subdirectories, next_page_token = fetch_s3_directory_listing(
+        TEST_BUCKET_NAME, prefix="folder2/", max_keys=2
+    )
+    assert len(files) + len(subdirectories) == 2
+    more_files, more_subdirectories, next_page_token = fetch_s3_directory_listing(
+        TEST_BUCKET_NAME, prefix="folder2/", max_keys=2, continuation_token=next_page_token
+    )
+    assert len(more_files) + len(more_subdirectories) == 1
+    assert [file["Key"] for file in files + more_files] == ["folder2/file3.txt"]
+    assert sorted(subdirectories + more_subdirectories) == ["folder2/a/", "folder2/c/"]
+    assert next_page_token is None
+
+
+class FakeClock:
+    """Manually advanced replacement for `time.monotonic`."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_metadata(key: str) -> S3ObjectMetadata:
+    return S3ObjectMetadata(
+        key=key,
+        size_bytes=1,
+        content_type="text/plain",
+        etag='"etag"',
+        last_modified=datetime(2024, 1, 1),
+    )
+
+
+def test_metadata_cache_expires_entries():
+    """Assert that existing objects are cached for `ttl_seconds` and missing ones for `negative_ttl_seconds`."""
+    clock = FakeClock()
+    cache = ObjectMetadataCache(max_entries=10, ttl_seconds=10, negative_ttl_seconds=1, clock=clock)
+    cache.put(TEST_BUCKET_NAME, "exists.txt", make_metadata("exists.txt"))
+    cache.put(TEST_BUCKET_NAME, "missing.txt", None)
+
+    assert cache.get(TEST_BUCKET_NAME, "exists.txt") == (True, make_metadata("exists.txt"))
+    assert cache.get(TEST_BUCKET_NAME, "missing.txt") == (True, None)
+
+    clock.now = 5
+    assert cache.get(TEST_BUCKET_NAME, "exists.txt")[0] is True
+    assert cache.get(TEST_BUCKET_NAME, "missing.txt") == (False, None)
+
+    clock.now = 10
+    assert cache.get(TEST_BUCKET_NAME, "exists.txt") == (False, None)
+    assert cache.stats() == {"entries": 2, "hits": 3, "misses": 2, "evictions": 0}
+
+
+def test_metadata_cache_evicts_least_recently_used():
+    cache = ObjectMetadataCache(max_entries=2, ttl_seconds=10, negative_ttl_seconds=10)
+    cache.put(TEST_BUCKET_NAME, "a", make_metadata("a"))
+    cache.put(TEST_BUCKET_NAME, "b", make_metadata("b"))
+    cache.get(TEST_BUCKET_NAME, "a")
+    cache.put(TEST_BUCKET_NAME, "c", make_metadata("c"))
+
+    assert cache.get(TEST_BUCKET_NAME, "b")[0] is False
+    assert cache.get(TEST_BUCKET_NAME, "a")[0] is True
+    assert cache.get(TEST_BUCKET_NAME, "c")[0] is True
+    assert cache.evictions == 1
+    assert len(cache) == 2
+
+
+def test_metadata_cache_drops_lookups_that_raced_an_invalidation():
+    cache = ObjectMetadataCache(max_entries=10, ttl_seconds=10, negative_ttl_seconds=10)
+    generation = cache.generation
+    cache.invalidate(TEST_BUCKET_NAME, "a")
+    cache.put(TEST_BUCKET_NAME, "a", None, generation=generation)
+    assert cache.get(TEST_BUCKET_NAME, "a")[0] is False
+
+
+# pylint: disable=unused-argument
+def test_metadata_cache_is_invalidated_by_writes_and_deletes(mocked_aws):
+    """Assert that the cache answers repeated lookups and never serves metadata older than this process's writes."""
+    s3_client = boto3.client("s3")
+    cache = ObjectMetadataCache(max_entries=10, ttl_seconds=60, negative_ttl_seconds=60)
+    calls = []
+    s3_client.meta.events.register("before-call.s3", lambda model, **kwargs: calls.append(model.name))
+
+    assert object_exists_in_s3(TEST_BUCKET_NAME, "file.txt", s3_client=s3_client, metadata_cache=cache) is False
+    assert object_exists_in_s3(TEST_BUCKET_NAME, "file.txt", s3_client=s3_client, metadata_cache=cache) is False
+    assert calls == ["HeadObject"]
+
+    upload_s3_object(TEST_BUCKET_NAME, "file.txt", b"v1", s3_client=s3_client, metadata_cache=cache)
+    metadata = fetch_s3_object_metadata(TEST_BUCKET_NAME, "file.txt", s3_client=s3_client, metadata_cache=cache)
+    assert metadata.size_bytes == 2
+    cached = fetch_s3_object_metadata(TEST_BUCKET_NAME, "file.txt", s3_client=s3_client, metadata_cache=cache)
+    assert cached == metadata
+    assert calls == ["HeadObject", "PutObject", "HeadObject"]
+
+    delete_s3_object(TEST_BUCKET_NAME, "file.txt", s3_client=s3_client, metadata_cache=cache)
+    assert object_exists_in_s3(TEST_BUCKET_NAME, "file.txt", s3_client=s3_client, metadata_cache=cache) is False
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 3, "evictions": 0}
+
+
+# pylint: disable=unused-argument
+def test_iter_s3_object_bodies_keeps_listing_order(mocked_aws):
+    """Assert that prefetched and streamed bodies come back in listing order, skipping objects deleted meanwhile."""
+    s3_client = boto3.client("s3")
+    contents = {f"data/{index:02d}.bin": bytes([index]) * (index * 10) for index in range(12)}
+    for key, content in contents.items():
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=key, Body=content)
+    listing = list(iter_s3_objects(TEST_BUCKET_NAME, prefix="data/", s3_client=s3_client))
+    s3_client.delete_object(Bucket=TEST_BUCKET_NAME, Key="data/05.bin")
+
+    object_bodies = iter_s3_object_bodies(
+        TEST_BUCKET_NAME, listing, prefetch=3, max_prefetch_bytes=50, s3_client=s3_client
+    )
+    downloaded = {object_body.key: b"".join(object_body.chunks) for object_body in object_bodies}
+
+    del contents["data/05.bin"]
+    assert list(downloaded) == list(contents)
+    assert downloaded == contents
+
+
+# pylint: disable=unused-argument
+def test_iter_s3_object_pages(mocked_aws):
+    """Assert that pages keep the prefix, respect `max_keys` and can start after a key."""
+    s3_client = boto3.client("s3")
+    for key in ["a/1.txt", "a/2.txt", "a/3.txt", "b/1.txt"]:
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=key, Body="content")
+
+    pages = list(iter_s3_object_pages(TEST_BUCKET_NAME, prefix="a/", max_keys=2, s3_client=s3_client))
+    assert [[file["Key"] for file in page] for page in pages] == [["a/1.txt", "a/2.txt"], ["a/3.txt"]]
+
+    pages = list(iter_s3_object_pages(TEST_BUCKET_NAME, start_after="a/3.txt", s3_client=s3_client))
+    assert [[file["Key"] for file in page] for page in pages] == [["b/1.txt"]]
+    assert list(iter_s3_object_pages(TEST_BUCKET_NAME, prefix="missing/", s3_client=s3_client)) == []
+
+
+def test_iter_s3_object_pages_in_parallel_matches_a_sequential_listing(mocked_aws):
+    """Assert that sharded listings return every key once, in order, however the keyspace is split."""
+    s3_client = boto3.client("s3")
+    keys = [
+        "0.txt",
+        "data/a/1.txt",
+        "data/a/2.txt",
+        "data/b/1.txt",
+        "data/b0.txt",
+        "data/c/1.txt",
+        "data/c/2.txt",
+        "data/z.txt",
+        "flat-1.txt",
+        "flat-2.txt",
+        "only/one/level/A.txt",
+        "only/one/level/b.txt",
+        "only/one/level/é.txt",
+        "zz",
+    ]
+    for key in keys:
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=key, Body="content")
+
+    def parallel_keys(**kwargs) -> list[str]:
+        pages = iter_s3_object_pages_in_parallel(TEST_BUCKET_NAME, s3_client=s3_client, **kwargs)
+        return [file["Key"] for page in pages for file in page]
+
+    for prefix in ("", "data/", "data", "only/", "flat", "missing/"):
+        for max_concurrency in (1, 2, 8):
+            expected = [key for key in keys if key.startswith(prefix)]
+            assert parallel_keys(prefix=prefix, max_concurrency=max_concurrency) == expected, (prefix, max_concurrency)
+    assert parallel_keys(prefix="data/", start_after="data/b/1.txt") == [
+        "data/b0.txt",
+        "data/c/1.txt",
+        "data/c/2.txt",
+        "data/z.txt",
+    ]
+    assert [file["Key"] for file in iter_s3_objects(TEST_BUCKET_NAME, max_concurrency=4)] == keys
+
+
+def test_iter_s3_object_pages_in_parallel_stops_early_and_raises(mocked_aws):
+    """Assert that a consumer can stop reading, and that listing errors reach the consumer."""
+    s3_client = boto3.client("s3")
+    for index in range(20):
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=f"{index % 5}/{index:02d}.txt", Body="content")
+
+    pages = iter_s3_object_pages_in_parallel(TEST_BUCKET_NAME, max_concurrency=2, s3_client=s3_client)
+    assert next(pages)[0]["Key"] == "0/00.txt"
+    pages.close()
+
+    def fail_shard_listings(params, **kwargs):
+        if "Delimiter" not in params and params.get("StartAfter", "") > "2":
+            raise RuntimeError("listing failed")
+
+    s3_client.meta.events.register("before-parameter-build.s3.ListObjectsV2", fail_shard_listings)
+    pages = iter_s3_object_pages_in_parallel(TEST_BUCKET_NAME, max_concurrency=2, s3_client=s3_client)
+    with pytest.raises(RuntimeError, match="listing failed"):
+        list(pages)
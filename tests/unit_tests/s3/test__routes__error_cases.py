@@ -40,3 +40,10 @@ def test_get_files_page_token_is_mutually_exclusive_with_page_size_and_directory
     response = client.get("/files?page_token=token&page_size=10&directory=dir")
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
     assert "mutually exclusive" in str(response.json())
+
+
+def test_upload_file_too_large_for_a_multipart_upload(client: TestClient, monkeypatch):
+    monkeypatch.setattr("files_api.routes.max_multipart_upload_bytes", lambda part_size: 4)
+    response = client.put("/files/large.bin", files={"file": ("large.bin", b"12345", "application/octet-stream")})
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert client.head("/files/large.bin").status_code == 404
@@ -0,0 +1,172 @@
+"""Test cases for `s3.thread_pool`."""
+
+import threading
+import time
+
+import anyio
+import pytest
+
+from files_api.s3 import read_objects
+from files_api.s3.thread_pool import S3ThreadPool
+
+
+def test_run_returns_result_and_propagates_errors():
+    """Assert that `run` returns the function's result and re-raises its exceptions."""
+    thread_pool = S3ThreadPool(max_workers=2)
+
+    def fail():
+        raise ValueError("boom")
+
+    async def main():
+        assert await thread_pool.run(sum, [1, 2, 3]) == 6
+        with pytest.raises(ValueError, match="boom"):
+            await thread_pool.run(fail)
+
+    anyio.run(main)
+
+
+def test_run_does_not_block_the_event_loop():
+    """Assert that calls run on worker threads, off the event loop's thread."""
+    thread_pool = S3ThreadPool(max_workers=2)
+
+    async def main():
+        assert await thread_pool.run(threading.get_ident) != threading.get_ident()
+
+    anyio.run(main)
+
+
+def test_run_is_bounded_by_max_workers():
+    """Assert that no more than `max_workers` calls are in flight at once."""
+    thread_pool = S3ThreadPool(max_workers=3)
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def slow_call():
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+
+    async def main():
+        async with anyio.create_task_group() as task_group:
+            for _ in range(10):
+                task_group.start_soon(thread_pool.run, slow_call)
+
+    anyio.run(main)
+    assert peak == 3
+
+
+def test_iterate():
+    """Assert that `iterate` yields every item of a blocking iterator."""
+    thread_pool = S3ThreadPool(max_workers=1)
+
+    async def main():
+        return [chunk async for chunk in thread_pool.iterate(iter([b"a", b"b", b"c"]))]
+
+    assert anyio.run(main) == [b"a", b"b", b"c"]
+
+
+def test_iterate_reads_ahead():
+    """Assert that with `read_ahead`, the next item is fetched while the current one is being processed."""
+    thread_pool = S3ThreadPool(max_workers=2)
+    pulled = []
+
+    def slow_items():
+        for item in range(3):
+            time.sleep(0.05)
+            pulled.append(item)
+            yield item
+
+    async def main():
+        seen_pulled = []
+        async for item in thread_pool.iterate(slow_items(), read_ahead=True):
+            await anyio.sleep(0.1)
+            seen_pulled.append((item, list(pulled)))
+        return seen_pulled
+
+    started_at = time.perf_counter()
+    seen_pulled = anyio.run(main)
+    # each item was processed while the next one had already been pulled
+    assert seen_pulled == [(0, [0, 1]), (1, [0, 1, 2]), (2, [0, 1, 2])]
+    assert time.perf_counter() - started_at < 0.05 * 3 + 0.1 * 3
+
+
+@pytest.mark.parametrize("read_ahead", [False, True])
+def test_iterate_closes_the_iterator_when_the_caller_stops_early(read_ahead: bool):
+    """Assert that a generator's cleanup runs as soon as the caller stops, e.g. when the client disconnects."""
+    thread_pool = S3ThreadPool(max_workers=2)
+    closed = threading.Event()
+
+    def items():
+        try:
+            yield from range(10)
+        finally:
+            closed.set()
+
+    async def main():
+        iterator = items()
+        pages = thread_pool.iterate(iterator, read_ahead=read_ahead)
+        async for _ in pages:
+            break
+        await pages.aclose()
+        # the iterator is still referenced, so only an explicit close ran its cleanup
+        assert iterator.gi_frame is None
+
+    anyio.run(main)
+    assert closed.is_set()
+
+
+@pytest.mark.parametrize("read_ahead", [False, True])
+def test_iterate_stops_the_threads_of_an_abandoned_parallel_listing(monkeypatch, read_ahead: bool):
+    """Assert that the shard threads of a parallel listing exit once the caller stops reading it."""
+
+    def endless_range_pages(bucket_name, prefix, start_after, lower, upper, s3_client):
+        while True:
+            yield [{"Key": lower or ""}]
+
+    monkeypatch.setattr(read_objects, "_find_listing_split_points", lambda *args: ["b", "c"])
+    monkeypatch.setattr(read_objects, "_iter_s3_object_range_pages", endless_range_pages)
+    thread_pool = S3ThreadPool(max_workers=2)
+
+    def listing_threads() -> list[threading.Thread]:
+        return [thread for thread in threading.enumerate() if thread.name.startswith("ThreadPoolExecutor")]
+
+    async def main():
+        listing = read_objects.iter_s3_object_pages_in_parallel("bucket", max_concurrency=2, s3_client=object())
+        pages = thread_pool.iterate(listing, read_ahead=read_ahead)
+        try:
+            async for _ in pages:
+                break
+            assert listing_threads()
+            await pages.aclose()
+            assert not listing_threads()
+        finally:
+            # without this, a failure would leave the threads blocked and the test run hanging
+            listing.close()
+
+    anyio.run(main)
+
+
+def test_shutdown_waits_for_running_calls_and_rejects_new_ones():
+    """Assert that `shutdown` returns only once the calls in flight are done, e.g. before the S3 client is closed."""
+    thread_pool = S3ThreadPool(max_workers=2)
+    finished = []
+
+    def slow_call():
+        time.sleep(0.1)
+        finished.append(True)
+
+    async def main():
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(thread_pool.run, slow_call)
+            await anyio.sleep(0.02)
+            await thread_pool.shutdown()
+            assert finished == [True]
+            with pytest.raises(RuntimeError):
+                await thread_pool.run(slow_call)
+
+    anyio.run(main)
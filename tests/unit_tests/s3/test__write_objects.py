@@ -3,8 +3,20 @@ TODO
 """
 
 # import os
+import io
+import os
+
 import boto3
-from files_api.s3.write_objects import upload_s3_object
+import pytest
+from files_api.s3 import write_objects
+from files_api.s3.write_objects import (
+    MAX_MULTIPART_PART_NUMBER,
+    _iter_part_bodies,
+    max_multipart_upload_bytes,
+    upload_s3_fileobj,
+    upload_s3_fileobjs,
+    upload_s3_object,
+)
 from tests.consts import TEST_BUCKET_NAME
 # from files_api.main import S3_BUCKET_NAME as TEST_BUCKET_NAME
 
@@ -29,3 +41,194 @@ def test__upload_s3_object(mocked_aws):
     response = s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key=object_key)
     assert response["ContentType"] == content_type
     assert response["Body"].read() == file_content
+
+
+MIB = 1024**2
+
+
+def test__upload_s3_fileobj__small_file_uses_single_put(mocked_aws):
+    s3_client = boto3.client("s3")
+    calls = []
+    s3_client.meta.events.register("before-call.s3", lambda model, **kwargs: calls.append(model.name))
+
+    upload_s3_fileobj(
+        bucket_name=TEST_BUCKET_NAME,
+        object_key="small.txt",
+        fileobj=io.BytesIO(b"small file"),
+        content_type="text/plain",
+        multipart_threshold=MIB,
+        s3_client=s3_client,
+    )
+
+    assert calls == ["PutObject"]
+    response = s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="small.txt")
+    assert response["ContentType"] == "text/plain"
+    assert response["Body"].read() == b"small file"
+
+
+def test__upload_s3_fileobj__large_file_uses_multipart_upload(mocked_aws):
+    s3_client = boto3.client("s3")
+    calls = []
+    s3_client.meta.events.register("before-call.s3", lambda model, **kwargs: calls.append(model.name))
+    file_content = os.urandom(12 * MIB)
+
+    upload_s3_fileobj(
+        bucket_name=TEST_BUCKET_NAME,
+        object_key="large.bin",
+        fileobj=io.BytesIO(file_content),
+        multipart_threshold=MIB,
+        part_size=5 * MIB,
+        max_concurrency=2,
+        s3_client=s3_client,
+    )
+
+    assert calls.count("UploadPart") == 3
+    assert calls[0] == "CreateMultipartUpload"
+    assert calls[-1] == "CompleteMultipartUpload"
+    response = s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="large.bin")
+    assert response["ContentType"] == "application/octet-stream"
+    assert response["Body"].read() == file_content
+
+
+def test__upload_s3_fileobj__failed_part_aborts_upload(mocked_aws):
+    s3_client = boto3.client("s3")
+
+    def fail_second_part(params, **kwargs):
+        if params["PartNumber"] == 2:
+            raise ConnectionError("connection lost")
+
+    s3_client.meta.events.register("provide-client-params.s3.UploadPart", fail_second_part)
+
+    with pytest.raises(ConnectionError):
+        upload_s3_fileobj(
+            bucket_name=TEST_BUCKET_NAME,
+            object_key="large.bin",
+            fileobj=io.BytesIO(os.urandom(11 * MIB)),
+            multipart_threshold=MIB,
+            part_size=5 * MIB,
+            s3_client=s3_client,
+        )
+
+    assert not s3_client.list_multipart_uploads(Bucket=TEST_BUCKET_NAME).get("Uploads")
+    assert not s3_client.list_objects_v2(Bucket=TEST_BUCKET_NAME).get("Contents")
+
+
+def test__iter_part_bodies__grows_parts_to_fit_the_part_number_limit():
+    # with 1-byte parts doubling every 1000 parts, 10,000 parts hold 1000 * (2**10 - 1) bytes
+    capacity = 1000 * (2**10 - 1)
+    parts = list(_iter_part_bodies(b"ab", io.BytesIO(b"x" * (capacity - 2)), part_size=1))
+
+    assert len(parts) == MAX_MULTIPART_PART_NUMBER
+    assert [len(part) for part in parts[998:1002]] == [1, 1, 2, 2]
+    assert len(parts[-1]) == 512
+    with pytest.raises(ValueError, match="does not fit"):
+        list(_iter_part_bodies(b"", io.BytesIO(b"x" * (capacity + 1)), part_size=1))
+    assert max_multipart_upload_bytes(part_size=1) == capacity
+    # the default part size reaches S3's 5 TB object limit
+    assert max_multipart_upload_bytes() > 5 * 1024**4
+
+
+def test__upload_s3_fileobj__too_many_parts_aborts_upload(mocked_aws, monkeypatch):
+    monkeypatch.setattr(write_objects, "MAX_MULTIPART_PART_NUMBER", 2)
+    s3_client = boto3.client("s3")
+
+    with pytest.raises(ValueError, match="does not fit"):
+        upload_s3_fileobj(
+            bucket_name=TEST_BUCKET_NAME,
+            object_key="large.bin",
+            fileobj=io.BytesIO(os.urandom(31 * MIB)),
+            multipart_threshold=MIB,
+            part_size=5 * MIB,
+            s3_client=s3_client,
+        )
+
+    assert not s3_client.list_multipart_uploads(Bucket=TEST_BUCKET_NAME).get("Uploads")
+    assert not s3_client.list_objects_v2(Bucket=TEST_BUCKET_NAME).get("Contents")
+
+
+def test__upload_s3_fileobj__reports_create_and_update_without_head(mocked_aws):
+    s3_client = boto3.client("s3")
+    calls = []
+    s3_client.meta.events.register("before-call.s3", lambda model, **kwargs: calls.append(model.name))
+
+    assert upload_s3_fileobj(TEST_BUCKET_NAME, "file.txt", io.BytesIO(b"v1"), s3_client=s3_client) is True
+    assert calls == ["PutObject"]
+
+    calls.clear()
+    assert upload_s3_fileobj(TEST_BUCKET_NAME, "file.txt", io.BytesIO(b"v2"), s3_client=s3_client) is False
+    assert calls == ["PutObject", "PutObject"]
+    assert s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="file.txt")["Body"].read() == b"v2"
+
+
+def test__upload_s3_fileobj__multipart_update_completes_existing_parts(mocked_aws):
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="large.bin", Body=b"old content")
+    calls = []
+    s3_client.meta.events.register("before-call.s3", lambda model, **kwargs: calls.append(model.name))
+    file_content = os.urandom(6 * MIB)
+
+    created = upload_s3_fileobj(
+        bucket_name=TEST_BUCKET_NAME,
+        object_key="large.bin",
+        fileobj=io.BytesIO(file_content),
+        multipart_threshold=MIB,
+        part_size=5 * MIB,
+        s3_client=s3_client,
+    )
+
+    assert created is False
+    # the parts are uploaded once; only the completion is repeated without the condition
+    assert calls.count("UploadPart") == 2
+    assert calls.count("CompleteMultipartUpload") == 2
+    assert s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="large.bin")["Body"].read() == file_content
+
+
+def test__upload_s3_fileobj__without_conditional_writes_uses_head(mocked_aws):
+    s3_client = boto3.client("s3")
+    calls = []
+    s3_client.meta.events.register("before-call.s3", lambda model, **kwargs: calls.append(model.name))
+
+    assert upload_s3_fileobj(
+        TEST_BUCKET_NAME, "file.txt", io.BytesIO(b"v1"), conditional_writes=False, s3_client=s3_client
+    ) is True
+    assert upload_s3_fileobj(
+        TEST_BUCKET_NAME, "file.txt", io.BytesIO(b"v2"), conditional_writes=False, s3_client=s3_client
+    ) is False
+    assert calls == ["HeadObject", "PutObject", "HeadObject", "PutObject"]
+
+
+def test__upload_s3_fileobjs__reports_each_file(mocked_aws):
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="data/existing.txt", Body=b"v1")
+    files = [(f"data/{index}.txt", io.BytesIO(b"new"), "text/plain") for index in range(5)]
+    files.append(("data/existing.txt", io.BytesIO(b"v2"), "text/plain"))
+
+    results = {
+        result.key: result
+        for result in upload_s3_fileobjs(TEST_BUCKET_NAME, iter(files), max_concurrency=2, s3_client=s3_client)
+    }
+
+    assert {key: result.created for key, result in results.items()} == {
+        **{f"data/{index}.txt": True for index in range(5)},
+        "data/existing.txt": False,
+    }
+    assert all(fileobj.closed for _, fileobj, _ in files)
+    assert s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="data/existing.txt")["Body"].read() == b"v2"
+
+
+def test__upload_s3_fileobjs__failure_does_not_stop_other_files(mocked_aws):
+    s3_client = boto3.client("s3")
+
+    def fail_one_key(params, **kwargs):
+        if params["Key"] == "bad.txt":
+            params["Bucket"] = "missing-bucket"
+
+    s3_client.meta.events.register("provide-client-params.s3.PutObject", fail_one_key)
+    files = [(key, io.BytesIO(b"x"), None) for key in ("a.txt", "bad.txt", "c.txt")]
+
+    results = {result.key: result for result in upload_s3_fileobjs(TEST_BUCKET_NAME, files, s3_client=s3_client)}
+
+    assert results["a.txt"].created is True and results["c.txt"].created is True
+    assert results["bad.txt"].created is None
+    assert results["bad.txt"].error_code == "NoSuchBucket"
+
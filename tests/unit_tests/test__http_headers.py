@@ -0,0 +1,91 @@
+"""Test cases for `files_api.http_headers`."""
+
+from datetime import (
+    datetime,
+    timezone,
+)
+
+import pytest
+
+from files_api.http_headers import (
+    content_disposition_attachment,
+    format_http_date,
+    if_range_matches,
+    is_not_modified,
+    parse_http_date,
+    parse_single_byte_range,
+)
+
+LAST_MODIFIED = datetime(2024, 5, 17, 12, 30, 15, tzinfo=timezone.utc)
+
+
+def test_format_and_parse_http_date():
+    assert format_http_date(LAST_MODIFIED) == "Fri, 17 May 2024 12:30:15 GMT"
+    assert parse_http_date("Fri, 17 May 2024 12:30:15 GMT") == LAST_MODIFIED
+    assert parse_http_date("not a date") is None
+
+
+@pytest.mark.parametrize(
+    "range_header, expected",
+    [
+        ("bytes=0-99", "bytes=0-99"),
+        ("bytes=100-", "bytes=100-"),
+        ("bytes=-65536", "bytes=-65536"),
+        (None, None),
+        ("bytes=-", None),
+        ("bytes=10-5", None),
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+    ],
+)
+def test_parse_single_byte_range(range_header, expected):
+    assert parse_single_byte_range(range_header) == expected
+
+
+@pytest.mark.parametrize(
+    "if_range, expected",
+    [
+        ('"abc"', True),
+        ('"other"', False),
+        ('W/"abc"', False),
+        ("Fri, 17 May 2024 12:30:15 GMT", True),
+        ("Fri, 17 May 2024 12:30:16 GMT", False),
+        ("garbage", False),
+    ],
+)
+def test_if_range_matches(if_range, expected):
+    assert if_range_matches(if_range, etag='"abc"', last_modified=LAST_MODIFIED) is expected
+
+
+@pytest.mark.parametrize(
+    "if_none_match, if_modified_since, expected",
+    [
+        ('"abc"', None, True),
+        ('W/"abc"', None, True),
+        ('"other", "abc"', None, True),
+        ("*", None, True),
+        ('"other"', None, False),
+        (None, "Fri, 17 May 2024 12:30:15 GMT", True),
+        (None, "Sat, 18 May 2024 00:00:00 GMT", True),
+        (None, "Fri, 17 May 2024 12:30:14 GMT", False),
+        (None, "garbage", False),
+        (None, None, False),
+        # If-None-Match takes precedence over If-Modified-Since
+        ('"other"', "Sat, 18 May 2024 00:00:00 GMT", False),
+    ],
+)
+def test_is_not_modified(if_none_match, if_modified_since, expected):
+    last_modified = LAST_MODIFIED.replace(microsecond=500_000)
+    assert is_not_modified(if_none_match, if_modified_since, etag='"abc"', last_modified=last_modified) is expected
+
+
+@pytest.mark.parametrize(
+    "filename, expected",
+    [
+        ("dataset.zip", "attachment; filename=\"dataset.zip\"; filename*=UTF-8''dataset.zip"),
+        ("数据.tar", "attachment; filename=\"__.tar\"; filename*=UTF-8''%E6%95%B0%E6%8D%AE.tar"),
+        ('a"b;c\\d.zip', "attachment; filename=\"a_b_c_d.zip\"; filename*=UTF-8''a%22b%3Bc%5Cd.zip"),
+    ],
+)
+def test_content_disposition_attachment(filename: str, expected: str):
+    assert content_disposition_attachment(filename) == expected
@@ -0,0 +1,40 @@
+"""Test cases for the app factory and lifespan in `files_api.main`."""
+
+import boto3
+import pytest
+from fastapi.testclient import TestClient
+
+from files_api.main import create_app
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+
+# pylint: disable=unused-argument
+def test_s3_client_is_created_once_per_app(mocked_aws: None, monkeypatch: pytest.MonkeyPatch):
+    """Assert that the routes reuse the lifespan's S3 client instead of creating one per call."""
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        s3_max_pool_connections=7,
+        s3_connect_timeout_seconds=1.5,
+        s3_max_attempts=5,
+        s3_retry_mode="adaptive",
+    )
+    app = create_app(settings=settings)
+
+    with TestClient(app) as client:
+        s3_client = app.state.s3_client
+        assert s3_client.meta.config.max_pool_connections == 7
+        assert s3_client.meta.config.connect_timeout == 1.5
+        assert s3_client.meta.config.retries == {"total_max_attempts": 5, "mode": "adaptive"}
+
+        def fail_on_new_client(*args, **kwargs):
+            raise AssertionError("routes must not create their own S3 clients")
+
+        monkeypatch.setattr(boto3, "client", fail_on_new_client)
+
+        response = client.put("/files/test.txt", files={"file": ("test.txt", b"content", "text/plain")})
+        assert response.status_code == 201
+        assert client.head("/files/test.txt").status_code == 200
+        assert client.get("/files/test.txt").content == b"content"
+        assert client.get("/files").status_code == 200
+        assert client.delete("/files/test.txt").status_code == 204
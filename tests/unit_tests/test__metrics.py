@@ -0,0 +1,85 @@
+"""Test cases for `files_api.metrics` and `GET /metrics`."""
+
+import re
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from files_api.main import create_app
+from files_api.metrics import (
+    Counter,
+    Histogram,
+    MetricsRegistry,
+)
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+
+def _sample(metrics_text: str, sample: str) -> float:
+    """Return the value of one sample, e.g. `name{label="value"}`, in Prometheus text output."""
+    match = re.search(rf"^{re.escape(sample)} (\S+)$", metrics_text, flags=re.MULTILINE)
+    assert match is not None, f"{sample} not found in:\n{metrics_text}"
+    return float(match.group(1))
+
+
+def test_render_counter_and_histogram():
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("requests_total", "Requests.", ("route",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)))
+
+    requests.inc('/files/{file_path:path}')
+    requests.inc('say "hi"', amount=2)
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(value, "/files")
+
+    assert registry.render() == "\n".join(
+        [
+            "# HELP requests_total Requests.",
+            "# TYPE requests_total counter",
+            'requests_total{route="/files/{file_path:path}"} 1',
+            'requests_total{route="say \\"hi\\""} 2',
+            "# HELP latency_seconds Latency.",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{route="/files",le="0.1"} 2',
+            'latency_seconds_bucket{route="/files",le="1"} 3',
+            'latency_seconds_bucket{route="/files",le="+Inf"} 4',
+            'latency_seconds_sum{route="/files"} 5.65',
+            'latency_seconds_count{route="/files"} 4',
+            "",
+        ]
+    )
+
+
+def test_metrics_endpoint_reports_requests_s3_calls_and_caches(client: TestClient):
+    client.put("/files/data.txt", files={"file": ("data.txt", b"x" * 1000, "text/plain")})
+    client.get("/files/data.txt")
+    client.head("/files/missing.txt")
+
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+    metrics_text = response.text
+
+    route = "/files/{file_path:path}"
+    assert _sample(metrics_text, f'files_api_http_requests_total{{method="PUT",route="{route}",status="201"}}') == 1
+    assert _sample(metrics_text, f'files_api_http_requests_total{{method="HEAD",route="{route}",status="404"}}') == 1
+    assert _sample(
+        metrics_text,
+        f'files_api_http_request_duration_seconds_count{{method="GET",route="{route}",status="200"}}',
+    ) == 1
+    assert _sample(metrics_text, f'files_api_http_received_bytes_total{{method="PUT",route="{route}"}}') > 1000
+    assert _sample(metrics_text, f'files_api_http_sent_bytes_total{{method="GET",route="{route}"}}') == 1000
+    # the /metrics request itself is still in flight
+    assert _sample(metrics_text, "files_api_http_requests_in_flight") == 1
+
+    assert _sample(metrics_text, 'files_api_s3_requests_total{operation="PutObject"}') == 1
+    assert _sample(metrics_text, 'files_api_s3_request_duration_seconds_count{operation="GetObject"}') == 1
+    assert _sample(metrics_text, 'files_api_s3_errors_total{operation="HeadObject",error_code="404"}') == 1
+    assert _sample(metrics_text, 'files_api_cache_misses_total{cache="metadata"}') == 1
+
+
+# pylint: disable=unused-argument
+def test_metrics_can_be_disabled(mocked_aws: None):
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, metrics_enabled=False)
+    with TestClient(create_app(settings=settings)) as client:
+        assert client.get("/metrics").status_code == status.HTTP_404_NOT_FOUND
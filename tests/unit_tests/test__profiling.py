@@ -0,0 +1,87 @@
+"""Test cases for `files_api.profiling`: the `Server-Timing` header and request profiling."""
+
+import pstats
+import re
+from pathlib import Path
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from files_api.main import create_app
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+TEST_FILE_PATH = "some/file.txt"
+
+
+def _put_test_file(client: TestClient) -> None:
+    client.put(f"/files/{TEST_FILE_PATH}", files={"file": (TEST_FILE_PATH, b"content", "text/plain")})
+
+
+# pylint: disable=unused-argument
+def test_server_timing_lists_each_s3_call(mocked_aws: None):
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, server_timing_enabled=True, metadata_cache_max_entries=0)
+    with TestClient(create_app(settings=settings)) as client:
+        _put_test_file(client)
+        response = client.delete(f"/files/{TEST_FILE_PATH}")
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    entries = [entry.strip() for entry in response.headers["Server-Timing"].split(",")]
+    assert [re.sub(r";dur=[\d.]+$", "", entry) for entry in entries] == [
+        's3;desc="HeadObject"',
+        's3;desc="DeleteObject"',
+        "app",
+        "total",
+    ]
+
+
+# pylint: disable=unused-argument
+def test_server_timing_includes_s3_calls_made_by_nested_worker_threads(mocked_aws: None):
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        server_timing_enabled=True,
+        s3_multipart_threshold_bytes=1024**2,
+        s3_multipart_part_size_bytes=5 * 1024**2,
+    )
+    with TestClient(create_app(settings=settings)) as client:
+        # the parts of a multipart upload are sent from a thread pool of their own
+        response = client.put(
+            "/files/large.bin",
+            files={"file": ("large.bin", b"x" * (7 * 1024**2), "application/octet-stream")},
+        )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    operations = re.findall(r's3;desc="(\w+)"', response.headers["Server-Timing"])
+    assert operations.count("UploadPart") == 2
+    assert "CompleteMultipartUpload" in operations
+
+
+# pylint: disable=unused-argument
+def test_server_timing_is_off_by_default(client: TestClient):
+    assert "Server-Timing" not in client.get("/files").headers
+
+
+# pylint: disable=unused-argument
+def test_profile_requested_by_header(mocked_aws: None, tmp_path: Path):
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, profiling_dir=tmp_path)
+    with TestClient(create_app(settings=settings)) as client:
+        _put_test_file(client)
+        assert list(tmp_path.iterdir()) == []
+
+        response = client.get(f"/files/{TEST_FILE_PATH}", headers={"X-Profile": "1"})
+
+    assert response.content == b"content"
+    [profile_path] = tmp_path.iterdir()
+    assert re.fullmatch(r"\d+-GET-files_some_file.txt-0\.prof", profile_path.name)
+    function_names = {function[2] for function in pstats.Stats(str(profile_path)).stats}  # type: ignore[attr-defined]
+    assert "get_file" in function_names
+
+
+# pylint: disable=unused-argument
+def test_profile_sample_rate(mocked_aws: None, tmp_path: Path):
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, profiling_dir=tmp_path, profiling_sample_rate=1.0)
+    with TestClient(create_app(settings=settings)) as client:
+        for _ in range(3):
+            client.get("/files")
+
+    assert len(list(tmp_path.iterdir())) == 3
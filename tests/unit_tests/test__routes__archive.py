@@ -0,0 +1,83 @@
+"""Test cases for `GET /archive/{directory}`."""
+
+import io
+import tarfile
+import zipfile
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from files_api.main import create_app
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+TEST_FILES = {
+    "dataset/images/0.png": b"\x89PNG" * 10,
+    "dataset/images/1.png": b"",
+    "dataset/labels.json": b'{"0": "cat"}',
+    "other/file.txt": b"not archived",
+}
+
+
+def _put_files(client: TestClient) -> None:
+    for file_path, content in TEST_FILES.items():
+        client.put(f"/files/{file_path}", files={"file": (file_path, content, "application/octet-stream")})
+
+
+def _expected_files(prefix: str) -> dict[str, bytes]:
+    return {file_path: content for file_path, content in TEST_FILES.items() if file_path.startswith(prefix)}
+
+
+def test_download_zip_archive(client: TestClient):
+    _put_files(client)
+
+    response = client.get("/archive/dataset/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == "application/zip"
+    assert response.headers["Content-Disposition"] == (
+        "attachment; filename=\"dataset.zip\"; filename*=UTF-8''dataset.zip"
+    )
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zip_file:
+        assert zip_file.testzip() is None
+        assert {name: zip_file.read(name) for name in zip_file.namelist()} == _expected_files("dataset/")
+
+
+def test_download_tar_archive(client: TestClient):
+    _put_files(client)
+
+    response = client.get("/archive/dataset", params={"format": "tar"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == "application/x-tar"
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as tar:
+        assert {member.name: tar.extractfile(member).read() for member in tar} == _expected_files("dataset")
+
+
+def test_download_archive_of_a_non_ascii_directory(client: TestClient):
+    client.put("/files/数据/a.txt", files={"file": ("a.txt", b"a", "text/plain")})
+
+    response = client.get("/archive/数据", params={"format": "tar"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Disposition"] == (
+        "attachment; filename=\"__.tar\"; filename*=UTF-8''%E6%95%B0%E6%8D%AE.tar"
+    )
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as tar:
+        assert [member.name for member in tar] == ["数据/a.txt"]
+
+
+# pylint: disable=unused-argument
+def test_download_archive_streams_large_files(mocked_aws: None):
+    """Files above the prefetch limit are streamed rather than downloaded ahead."""
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, archive_prefetch_objects=1, archive_max_prefetch_bytes=8)
+    with TestClient(create_app(settings=settings)) as client:
+        _put_files(client)
+        response = client.get("/archive/", params={"format": "tar"})
+
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as tar:
+        assert {member.name: tar.extractfile(member).read() for member in tar} == TEST_FILES
+
+
+def test_download_archive_of_empty_directory(client: TestClient):
+    response = client.get("/archive/missing/")
+    assert response.status_code == status.HTTP_200_OK
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zip_file:
+        assert zip_file.namelist() == []
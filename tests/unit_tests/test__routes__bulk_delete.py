@@ -0,0 +1,46 @@
+"""Test cases for `POST /bulk/delete`."""
+
+import json
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+
+def _put_files(client: TestClient, file_paths: list[str]) -> None:
+    for file_path in file_paths:
+        client.put(f"/files/{file_path}", files={"file": (file_path, b"content", "text/plain")})
+
+
+def _results(response) -> dict[str, dict]:
+    return {result["file_path"]: result for result in map(json.loads, response.text.splitlines())}
+
+
+def test_bulk_delete_file_paths(client: TestClient):
+    _put_files(client, ["a.txt", "b.txt", "c.txt"])
+
+    response = client.post("/bulk/delete", json={"file_paths": ["a.txt", "b.txt", "missing.txt"]})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    assert _results(response) == {
+        "a.txt": {"file_path": "a.txt", "deleted": True},
+        "b.txt": {"file_path": "b.txt", "deleted": True},
+        "missing.txt": {"file_path": "missing.txt", "deleted": True},
+    }
+
+    assert client.head("/files/a.txt").status_code == status.HTTP_404_NOT_FOUND
+    assert client.head("/files/c.txt").status_code == status.HTTP_200_OK
+
+
+def test_bulk_delete_directory(client: TestClient):
+    _put_files(client, ["checkpoints/step-1/shard-0", "checkpoints/step-2/shard-0", "configs/run.yaml"])
+
+    response = client.post("/bulk/delete", json={"directory": "checkpoints/"})
+    assert response.status_code == status.HTTP_200_OK
+    assert set(_results(response)) == {"checkpoints/step-1/shard-0", "checkpoints/step-2/shard-0"}
+    assert [file["file_path"] for file in client.get("/files").json()["files"]] == ["configs/run.yaml"]
+
+
+def test_bulk_delete_requires_exactly_one_target(client: TestClient):
+    assert client.post("/bulk/delete", json={}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    response = client.post("/bulk/delete", json={"file_paths": ["a.txt"], "directory": "checkpoints/"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,131 @@
+"""Test cases for `POST /bulk/upload/{directory}`."""
+
+import io
+import tarfile
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+
+def _tar_bytes(files: dict[str, bytes], mode: str = "w") -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as tar:
+        directory = tarfile.TarInfo("images")
+        directory.type = tarfile.DIRTYPE
+        tar.addfile(directory)
+        for name, content in files.items():
+            member = tarfile.TarInfo(name)
+            member.size = len(content)
+            tar.addfile(member, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def test_bulk_upload_multipart_form(client: TestClient):
+    client.put("/files/dataset/b.txt", files={"file": ("b.txt", b"old", "text/plain")})
+
+    response = client.post(
+        "/bulk/upload/dataset",
+        files=[
+            ("files", ("a.txt", b"a", "text/plain")),
+            ("files", ("b.txt", b"new", "text/plain")),
+            ("files", ("nested/c.csv", b"c", "text/csv")),
+        ],
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "files": [
+            {"file_path": "dataset/a.txt", "status": "created", "error_code": None, "error_message": None},
+            {"file_path": "dataset/b.txt", "status": "updated", "error_code": None, "error_message": None},
+            {"file_path": "dataset/nested/c.csv", "status": "created", "error_code": None, "error_message": None},
+        ]
+    }
+    response = client.get("/files/dataset/nested/c.csv")
+    assert response.content == b"c"
+    assert response.headers["Content-Type"].startswith("text/csv")
+    assert client.get("/files/dataset/b.txt").content == b"new"
+
+
+@pytest.mark.parametrize(
+    "tar_mode, content_type",
+    [
+        ("w", "application/x-tar"),
+        ("w:gz", "application/gzip"),
+    ],
+)
+def test_bulk_upload_tar_stream(client: TestClient, tar_mode: str, content_type: str):
+    files = {f"images/{index}.png": bytes([index]) * 100 for index in range(20)}
+    files["./labels.json"] = b"{}"
+
+    response = client.post(
+        "/bulk/upload/dataset/",
+        content=_tar_bytes(files, mode=tar_mode),
+        headers={"Content-Type": content_type},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    manifest = response.json()["files"]
+    assert [file["file_path"] for file in manifest] == sorted(
+        [f"dataset/images/{index}.png" for index in range(20)] + ["dataset/labels.json"]
+    )
+    assert all(file["status"] == "created" for file in manifest)
+    response = client.get("/files/dataset/images/3.png")
+    assert response.content == bytes([3]) * 100
+    assert response.headers["Content-Type"] == "image/png"
+
+
+@pytest.mark.parametrize("file_name", ["../x.txt", "a/../../x.txt", ".."])
+def test_bulk_upload_rejects_form_files_outside_the_directory(client: TestClient, file_name: str):
+    response = client.post(
+        "/bulk/upload/dataset",
+        files=[
+            ("files", ("a.txt", b"a", "text/plain")),
+            ("files", (file_name, b"x", "text/plain")),
+        ],
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.get("/files").json()["files"] == []
+
+
+def test_bulk_upload_skips_tar_members_outside_the_directory(client: TestClient):
+    files = {"a.txt": b"a", "../x.txt": b"x", "b/../../y.txt": b"y", "/abs/../c.txt": b"c"}
+
+    response = client.post(
+        "/bulk/upload/dataset/", content=_tar_bytes(files), headers={"Content-Type": "application/x-tar"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["files"] == [
+        {
+            "file_path": "../x.txt",
+            "status": "failed",
+            "error_code": "InvalidPath",
+            "error_message": "The path leads out of the directory",
+        },
+        {
+            "file_path": "b/../../y.txt",
+            "status": "failed",
+            "error_code": "InvalidPath",
+            "error_message": "The path leads out of the directory",
+        },
+        {"file_path": "dataset/a.txt", "status": "created", "error_code": None, "error_message": None},
+        {"file_path": "dataset/c.txt", "status": "created", "error_code": None, "error_message": None},
+    ]
+    assert sorted(file["file_path"] for file in client.get("/files").json()["files"]) == [
+        "dataset/a.txt",
+        "dataset/c.txt",
+    ]
+
+
+def test_bulk_upload_rejects_malformed_tar(client: TestClient):
+    response = client.post(
+        "/bulk/upload/dataset", content=b"not a tar archive" * 100, headers={"Content-Type": "application/x-tar"}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_bulk_upload_rejects_other_media_types(client: TestClient):
+    response = client.post("/bulk/upload/dataset", json={"files": []})
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
@@ -0,0 +1,65 @@
+"""Test cases for `GET /changes`."""
+
+import time
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+
+def _put(client: TestClient, file_path: str) -> None:
+    client.put(f"/files/{file_path}", files={"file": (file_path, b"x", "text/plain")})
+
+
+def test_sync_from_latest(journaled_client: TestClient):
+    _put(journaled_client, "data/before.txt")
+    response = journaled_client.get("/changes", params={"since": "latest"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["changes"] == []
+    cursor = response.json()["cursor"]
+
+    _put(journaled_client, "data/1.txt")
+    _put(journaled_client, "other.txt")
+    _put(journaled_client, "data/2.txt")
+    journaled_client.delete("/files/data/1.txt")
+    journaled_client.post("/bulk/delete", json={"file_paths": ["data/before.txt"]})
+
+    data = journaled_client.get("/changes", params={"since": cursor, "directory": "data/", "limit": 2}).json()
+    assert [(change["file_path"], change["change"]) for change in data["changes"]] == [
+        ("data/2.txt", "put"),
+        ("data/1.txt", "delete"),
+    ]
+    assert data["changes"][0]["etag"].startswith('"')
+    assert data["has_more"] is True
+
+    data = journaled_client.get("/changes", params={"since": data["cursor"], "directory": "data/"}).json()
+    assert [(change["file_path"], change["change"]) for change in data["changes"]] == [("data/before.txt", "delete")]
+    assert data["has_more"] is False
+
+    data = journaled_client.get("/changes", params={"since": data["cursor"]}).json()
+    assert data["changes"] == []
+
+
+def test_sync_from_the_start_after_deletes_were_dropped(journaled_client: TestClient):
+    _put(journaled_client, "gone.txt")
+    journaled_client.delete("/files/gone.txt")
+    _put(journaled_client, "kept.txt")
+    change_journal = journaled_client.app.state.change_journal
+    assert change_journal.compact(now=time.time() + change_journal.tombstone_retention_seconds + 1) == 1
+
+    response = journaled_client.get("/changes")
+    assert response.status_code == status.HTTP_200_OK
+    assert [change["file_path"] for change in response.json()["changes"]] == ["kept.txt"]
+    assert response.json()["cursor"] == change_journal.latest_cursor()
+
+
+def test_unknown_and_malformed_cursors(journaled_client: TestClient):
+    response = journaled_client.get("/changes", params={"since": "0123456789abcdef-0"})
+    assert response.status_code == status.HTTP_410_GONE
+
+    response = journaled_client.get("/changes", params={"since": "nonsense"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_changes_need_the_change_journal(client: TestClient):
+    response = client.get("/changes")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,59 @@
+"""
+Throughput of the routes as concurrency grows, with simulated S3 latency.
+
+Each S3 call made through the app's client sleeps for `SIMULATED_S3_LATENCY_SECONDS`. If the
+routes blocked the event loop, throughput would stay flat no matter how many requests are in flight.
+"""
+
+import time
+
+import anyio
+import httpx
+import pytest
+
+from files_api.main import create_app
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+SIMULATED_S3_LATENCY_SECONDS = 0.05
+NUM_REQUESTS = 48
+
+
+def _simulate_s3_latency(**kwargs) -> None:
+    time.sleep(SIMULATED_S3_LATENCY_SECONDS)
+
+
+def measure_download_throughput(concurrency: int) -> float:
+    """Return the number of `GET /files/{file_path}` requests served per second at the given concurrency."""
+    app = create_app(settings=Settings(s3_bucket_name=TEST_BUCKET_NAME))
+
+    async def main() -> float:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                await client.put("/files/bench.txt", files={"file": ("bench.txt", b"content", "text/plain")})
+                app.state.s3_client.meta.events.register("before-call.s3", _simulate_s3_latency)
+
+                semaphore = anyio.Semaphore(concurrency)
+
+                async def download() -> None:
+                    async with semaphore:
+                        response = await client.get("/files/bench.txt")
+                        assert response.status_code == 200
+
+                start = time.perf_counter()
+                async with anyio.create_task_group() as task_group:
+                    for _ in range(NUM_REQUESTS):
+                        task_group.start_soon(download)
+                return NUM_REQUESTS / (time.perf_counter() - start)
+
+    return anyio.run(main)
+
+
+@pytest.mark.slow
+# pylint: disable=unused-argument
+def test_download_throughput_scales_with_concurrency(mocked_aws: None):
+    throughput = {concurrency: measure_download_throughput(concurrency) for concurrency in (1, 4, 16)}
+
+    assert throughput[4] > 2 * throughput[1], f"requests/second by concurrency: {throughput}"
+    assert throughput[16] > 3 * throughput[1], f"requests/second by concurrency: {throughput}"
@@ -0,0 +1,94 @@
+"""Test cases for `If-None-Match` / `If-Modified-Since` handling in `GET` and `HEAD /files/{file_path}`."""
+
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from files_api.http_headers import format_http_date
+from files_api.main import create_app
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+TEST_FILE_PATH = "some/nested/file.txt"
+TEST_FILE_CONTENT = b"Hello, world!"
+
+
+@pytest.fixture(params=["s3", "metadata_cache", "body_cache"])
+# pylint: disable=unused-argument
+def client(request: pytest.FixtureRequest, mocked_aws: None, tmp_path) -> TestClient:
+    """Client evaluating conditional GETs in S3, against the metadata cache, or against the body cache."""
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        metadata_cache_max_entries=0 if request.param == "s3" else 10_000,
+        body_cache_dir=tmp_path if request.param == "body_cache" else None,
+    )
+    with TestClient(create_app(settings=settings)) as client:
+        client.put(f"/files/{TEST_FILE_PATH}", files={"file": (TEST_FILE_PATH, TEST_FILE_CONTENT, "text/plain")})
+        # a HEAD fills the metadata cache, as a client revalidating its copy would have
+        client.head(f"/files/{TEST_FILE_PATH}")
+        yield client
+
+
+@pytest.mark.parametrize("method", ["GET", "HEAD"])
+def test_if_none_match_current_etag_returns_304(client: TestClient, method: str):
+    etag = client.head(f"/files/{TEST_FILE_PATH}").headers["ETag"]
+    response = client.request(method, f"/files/{TEST_FILE_PATH}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    assert "Last-Modified" in response.headers
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("method", ["GET", "HEAD"])
+def test_if_none_match_stale_etag_returns_file(client: TestClient, method: str):
+    response = client.request(method, f"/files/{TEST_FILE_PATH}", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == status.HTTP_200_OK
+    if method == "GET":
+        assert response.content == TEST_FILE_CONTENT
+
+
+@pytest.mark.parametrize("method", ["GET", "HEAD"])
+def test_if_modified_since(client: TestClient, method: str):
+    last_modified = client.head(f"/files/{TEST_FILE_PATH}").headers["Last-Modified"]
+    response = client.request(method, f"/files/{TEST_FILE_PATH}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    long_ago = format_http_date(datetime.now(timezone.utc) - timedelta(days=365))
+    response = client.request(method, f"/files/{TEST_FILE_PATH}", headers={"If-Modified-Since": long_ago})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_304_after_update_is_not_served(client: TestClient):
+    etag = client.head(f"/files/{TEST_FILE_PATH}").headers["ETag"]
+    client.put(f"/files/{TEST_FILE_PATH}", files={"file": (TEST_FILE_PATH, b"updated", "text/plain")})
+    response = client.get(f"/files/{TEST_FILE_PATH}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"updated"
+
+
+def test_conditional_get_of_missing_file_returns_404(client: TestClient):
+    response = client.get("/files/missing.txt", headers={"If-None-Match": '"abc"'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# pylint: disable=unused-argument
+def test_304_from_metadata_cache_makes_no_s3_call(mocked_aws: None):
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME)
+    with TestClient(create_app(settings=settings)) as client:
+        client.put(f"/files/{TEST_FILE_PATH}", files={"file": (TEST_FILE_PATH, TEST_FILE_CONTENT, "text/plain")})
+        etag = client.head(f"/files/{TEST_FILE_PATH}").headers["ETag"]
+
+        s3_calls: list[str] = []
+        client.app.state.s3_client.meta.events.register(
+            "before-call.s3", lambda model, **kwargs: s3_calls.append(model.name)
+        )
+        response = client.get(f"/files/{TEST_FILE_PATH}", headers={"If-None-Match": etag})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert s3_calls == []
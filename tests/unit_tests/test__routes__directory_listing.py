@@ -0,0 +1,70 @@
+"""Test cases for non-recursive listing with `GET /files?recursive=false`."""
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+
+def _put(client: TestClient, file_path: str) -> None:
+    client.put(f"/files/{file_path}", files={"file": (file_path, b"x", "text/plain")})
+
+
+def test_lists_one_level_with_subdirectories(client: TestClient):
+    for file_path in [
+        "README.md",
+        "data/labels.csv",
+        "data/images/train/0.png",
+        "data/images/train/1.png",
+        "data/images/test/0.png",
+        "data/raw/dump.bin",
+        "database.db",
+    ]:
+        _put(client, file_path)
+
+    response = client.get("/files", params={"recursive": "false"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["directories"] == ["data/"]
+    assert [file["file_path"] for file in response.json()["files"]] == ["README.md", "database.db"]
+
+    # "data" and "data/" browse the same directory, which excludes the sibling "database.db"
+    for directory in ("data", "data/"):
+        data = client.get("/files", params={"recursive": "false", "directory": directory}).json()
+        assert data["directories"] == ["data/images/", "data/raw/"]
+        assert [file["file_path"] for file in data["files"]] == ["data/labels.csv"]
+        assert data["next_page_token"] is None
+
+    # recursive listings are unchanged
+    data = client.get("/files", params={"directory": "data/images"}).json()
+    assert data["directories"] is None
+    assert len(data["files"]) == 3
+
+
+def test_page_tokens_keep_the_directory(client: TestClient):
+    for index in range(12):
+        _put(client, f"logs/{index:02d}.txt")
+        _put(client, f"logs/run-{index:02d}/stdout.txt")
+    _put(client, "other.txt")
+
+    files, directories = [], []
+    response = client.get("/files", params={"recursive": "false", "directory": "logs", "page_size": 10})
+    pages = 1
+    while True:
+        data = response.json()
+        files += [file["file_path"] for file in data["files"]]
+        directories += data["directories"]
+        if not data["next_page_token"]:
+            break
+        response = client.get("/files", params={"page_token": data["next_page_token"]})
+        assert response.status_code == status.HTTP_200_OK, response.text
+        pages += 1
+
+    assert pages == 3
+    assert files == [f"logs/{index:02d}.txt" for index in range(12)]
+    assert directories == [f"logs/run-{index:02d}/" for index in range(12)]
+
+
+def test_directory_page_token_is_exclusive_and_validated(client: TestClient):
+    response = client.get("/files", params={"page_token": "dir:not-base64-json!"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = client.get("/files", params={"page_token": "abc", "recursive": "false"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -2,6 +2,7 @@
 Importing functions/libaries/dependency
 """
 from typing import Generator
+import boto3
 import botocore
 import pytest
 from fastapi import status
@@ -62,6 +63,11 @@ def test_list_files_with_pagination(client: TestClient):
     data = response.json()
     assert len(data["files"]) == 10
     assert "next_page_token" in data
+    # the next page is fetched with the page token alone
+    response = client.get("/files", params={"page_token": data["next_page_token"]})
+    assert response.status_code == 200
+    assert len(response.json()["files"]) == 5
+    assert response.json()["next_page_token"] is None
 
 
 def test_get_file_metadata(client: TestClient):
@@ -111,3 +117,176 @@ def test_delete_file(client: TestClient):
     # Later we will fix this by doing better error handling within the API itself.
     response = client.get(f"/files/{TEST_FILE_PATH}")
     assert response.status_code == 404
+
+
+# pylint: disable=unused-argument
+def test__upload_file__large_file_is_streamed_as_multipart_upload(mocked_aws: None):
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        s3_multipart_threshold_bytes=1024**2,
+        s3_multipart_part_size_bytes=5 * 1024**2,
+    )
+    large_file_content = b"0123456789abcdef" * (7 * 1024**2 // 16)
+
+    with TestClient(create_app(settings=settings)) as client:
+        response = client.put(
+            "/files/large.bin",
+            files={"file": ("large.bin", large_file_content, "application/octet-stream")},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+        response = client.get("/files/large.bin")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == large_file_content
+
+    s3_client = boto3.client("s3")
+    assert not s3_client.list_multipart_uploads(Bucket=TEST_BUCKET_NAME).get("Uploads")
+
+
+def test_get_file_is_a_single_s3_round_trip(client: TestClient):
+    client.put(
+        f"/files/{TEST_FILE_PATH}",
+        files={"file": (TEST_FILE_PATH, TEST_FILE_CONTENT, TEST_FILE_CONTENT_TYPE)},
+    )
+    calls = []
+    client.app.state.s3_client.meta.events.register(
+        "before-call.s3", lambda model, **kwargs: calls.append(model.name)
+    )
+
+    assert client.get(f"/files/{TEST_FILE_PATH}").content == TEST_FILE_CONTENT
+    assert client.get("/files/nonexistent.txt").status_code == status.HTTP_404_NOT_FOUND
+    assert calls == ["GetObject", "GetObject"]
+
+
+def test_get_file_metadata_uses_head_object(client: TestClient):
+    client.put(
+        f"/files/{TEST_FILE_PATH}",
+        files={"file": (TEST_FILE_PATH, TEST_FILE_CONTENT, TEST_FILE_CONTENT_TYPE)},
+    )
+    calls = []
+    client.app.state.s3_client.meta.events.register(
+        "before-call.s3", lambda model, **kwargs: calls.append(model.name)
+    )
+
+    response = client.head(f"/files/{TEST_FILE_PATH}")
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"')
+    assert calls == ["HeadObject"]
+
+
+def test_list_files_with_metadata(client: TestClient):
+    client.put("/files/a.txt", files={"file": ("a.txt", b"a", "text/plain")})
+    client.put("/files/b.json", files={"file": ("b.json", b"{}", "application/json")})
+
+    files = client.get("/files").json()["files"]
+    assert [file["content_type"] for file in files] == [None, None]
+
+    files = client.get("/files?include_metadata=true").json()["files"]
+    assert [file["content_type"] for file in files] == ["text/plain", "application/json"]
+    assert all(file["etag"] for file in files)
+    assert [file["user_metadata"] for file in files] == [{}, {}]
+
+
+def test_get_file_metadata_is_cached_until_the_file_changes(client: TestClient):
+    client.put(
+        f"/files/{TEST_FILE_PATH}",
+        files={"file": (TEST_FILE_PATH, TEST_FILE_CONTENT, TEST_FILE_CONTENT_TYPE)},
+    )
+    calls = []
+    client.app.state.s3_client.meta.events.register(
+        "before-call.s3", lambda model, **kwargs: calls.append(model.name)
+    )
+
+    for _ in range(3):
+        assert client.head(f"/files/{TEST_FILE_PATH}").headers["Content-Length"] == str(len(TEST_FILE_CONTENT))
+    assert calls == ["HeadObject"]
+
+    client.put(
+        f"/files/{TEST_FILE_PATH}",
+        files={"file": (TEST_FILE_PATH, b"new content", TEST_FILE_CONTENT_TYPE)},
+    )
+    assert client.head(f"/files/{TEST_FILE_PATH}").headers["Content-Length"] == str(len(b"new content"))
+
+    assert client.delete(f"/files/{TEST_FILE_PATH}").status_code == 204
+    assert client.head(f"/files/{TEST_FILE_PATH}").status_code == 404
+
+
+def test_delete_file_does_not_trust_the_metadata_cache(client: TestClient):
+    client.put(
+        f"/files/{TEST_FILE_PATH}",
+        files={"file": (TEST_FILE_PATH, TEST_FILE_CONTENT, TEST_FILE_CONTENT_TYPE)},
+    )
+    # cache the file's metadata, then delete it behind the API's back, and the other way around
+    assert client.head(f"/files/{TEST_FILE_PATH}").status_code == 200
+    assert client.head("/files/other.txt").status_code == 404
+    s3_client = boto3.client("s3")
+    s3_client.delete_object(Bucket=TEST_BUCKET_NAME, Key=TEST_FILE_PATH)
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="other.txt", Body=b"other")
+
+    assert client.delete(f"/files/{TEST_FILE_PATH}").status_code == 404
+    assert client.delete("/files/other.txt").status_code == 204
+
+
+# pylint: disable=unused-argument
+def test_get_file_from_local_body_cache(mocked_aws: None, tmp_path):
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, body_cache_dir=tmp_path)
+
+    with TestClient(create_app(settings=settings)) as client:
+        client.put(
+            f"/files/{TEST_FILE_PATH}",
+            files={"file": (TEST_FILE_PATH, TEST_FILE_CONTENT, TEST_FILE_CONTENT_TYPE)},
+        )
+        calls = []
+        client.app.state.s3_client.meta.events.register(
+            "before-call.s3", lambda model, **kwargs: calls.append(model.name)
+        )
+
+        for _ in range(3):
+            response = client.get(f"/files/{TEST_FILE_PATH}")
+            assert response.status_code == 200
+            assert response.content == TEST_FILE_CONTENT
+            assert response.headers["Content-Type"].startswith(TEST_FILE_CONTENT_TYPE)
+        assert calls == ["HeadObject", "GetObject"]
+
+        assert client.delete(f"/files/{TEST_FILE_PATH}").status_code == 204
+        assert client.get(f"/files/{TEST_FILE_PATH}").status_code == 404
+        assert client.app.state.body_cache.stats()["entries"] == 0
+
+
+# pylint: disable=unused-argument
+def test_get_file_skips_the_body_cache_for_large_files_and_range_misses(mocked_aws: None, tmp_path):
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, body_cache_dir=tmp_path, body_cache_max_object_bytes=4)
+
+    with TestClient(create_app(settings=settings)) as client:
+        client.put(
+            f"/files/{TEST_FILE_PATH}",
+            files={"file": (TEST_FILE_PATH, TEST_FILE_CONTENT, TEST_FILE_CONTENT_TYPE)},
+        )
+        client.put("/files/small.txt", files={"file": ("small.txt", b"tiny", TEST_FILE_CONTENT_TYPE)})
+        # cache both files' metadata
+        assert client.head(f"/files/{TEST_FILE_PATH}").status_code == 200
+        assert client.head("/files/small.txt").status_code == 200
+        calls = []
+        client.app.state.s3_client.meta.events.register(
+            "before-call.s3", lambda model, **kwargs: calls.append(model.name)
+        )
+
+        # too large to cache: straight to S3
+        assert client.get(f"/files/{TEST_FILE_PATH}").content == TEST_FILE_CONTENT
+        assert calls == ["GetObject"]
+
+        # a range of a file that is not cached is read from S3 without caching the file
+        calls.clear()
+        response = client.get("/files/small.txt", headers={"Range": "bytes=1-2"})
+        assert response.status_code == 206
+        assert response.content == b"in"
+        assert calls == ["GetObject"]
+        assert client.app.state.body_cache.stats()["entries"] == 0
+
+        # once cached, ranges are served from local disk
+        assert client.get("/files/small.txt").content == b"tiny"
+        calls.clear()
+        response = client.get("/files/small.txt", headers={"Range": "bytes=1-2"})
+        assert response.status_code == 206
+        assert response.content == b"in"
+        assert calls == []
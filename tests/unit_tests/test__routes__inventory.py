@@ -0,0 +1,48 @@
+"""Test cases for `GET /inventory`."""
+
+import json
+
+import boto3
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from tests.consts import TEST_BUCKET_NAME
+
+
+def _put(client: TestClient, file_path: str, content: bytes = b"x") -> None:
+    client.put(f"/files/{file_path}", files={"file": (file_path, content, "text/plain")})
+
+
+def test_inventory_streams_every_file_as_ndjson(client: TestClient):
+    file_paths = sorted(f"data/{index:04d}.txt" for index in range(1_205)) + ["other.txt"]
+    s3_client = boto3.client("s3")
+    for file_path in file_paths:
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=file_path, Body=b"abc")
+
+    response = client.get("/inventory")
+    # the mocked_aws fixture only cleans up one page of objects
+    client.post("/bulk/delete", json={"directory": "data/"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    # more than one S3 page of 1000 keys
+    assert [line["file_path"] for line in lines] == file_paths
+    assert lines[0]["size_bytes"] == 3
+    assert lines[0]["last_modified"].endswith("Z")
+    assert lines[0]["etag"].startswith('"')
+
+
+def test_inventory_of_a_directory_and_resuming(client: TestClient):
+    for file_path in ["a/1.txt", "a/2.txt", "a/3.txt", "b/1.txt"]:
+        _put(client, file_path)
+
+    response = client.get("/inventory", params={"directory": "a/"})
+    assert [json.loads(line)["file_path"] for line in response.text.splitlines()] == ["a/1.txt", "a/2.txt", "a/3.txt"]
+
+    response = client.get("/inventory", params={"start_after": "a/2.txt"})
+    assert [json.loads(line)["file_path"] for line in response.text.splitlines()] == ["a/3.txt", "b/1.txt"]
+
+    response = client.get("/inventory", params={"directory": "missing/"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.text == ""
@@ -0,0 +1,59 @@
+"""Test cases for `GET /files` served by the local listing index."""
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+
+def _put(client: TestClient, file_path: str) -> None:
+    client.put(f"/files/{file_path}", files={"file": (file_path, b"abc", "text/plain")})
+
+
+def test_offset_count_and_cursor_pages(indexed_client: TestClient):
+    file_paths = [f"logs/{index:03d}.txt" for index in range(35)]
+    for file_path in file_paths:
+        _put(indexed_client, file_path)
+    _put(indexed_client, "other.txt")
+
+    # page 3 of 10, without walking pages 1 and 2
+    response = indexed_client.get("/files", params={"directory": "logs/", "offset": 20, "include_count": "true"})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [file["file_path"] for file in data["files"]] == file_paths[20:30]
+    assert data["files"][0]["size_bytes"] == 3
+    assert data["total_count"] == 35
+
+    response = indexed_client.get("/files", params={"page_token": data["next_page_token"]})
+    assert [file["file_path"] for file in response.json()["files"]] == file_paths[30:]
+    assert response.json()["next_page_token"] is None
+
+
+def test_index_follows_deletes(indexed_client: TestClient):
+    _put(indexed_client, "a.txt")
+    _put(indexed_client, "b.txt")
+    indexed_client.delete("/files/a.txt")
+
+    response = indexed_client.get("/files", params={"include_count": "true"})
+    assert [file["file_path"] for file in response.json()["files"]] == ["b.txt"]
+    assert response.json()["total_count"] == 1
+
+
+def test_cursor_tokens_fall_back_to_s3(indexed_client: TestClient):
+    for index in range(12):
+        _put(indexed_client, f"{index:02d}.txt")
+    page_token = indexed_client.get("/files").json()["next_page_token"]
+
+    # e.g. after a restart, before the index is rebuilt
+    indexed_client.app.state.listing_index.ready = False
+    response = indexed_client.get("/files", params={"page_token": page_token})
+    assert [file["file_path"] for file in response.json()["files"]] == ["10.txt", "11.txt"]
+
+    response = indexed_client.get("/files", params={"offset": 10})
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+def test_offset_needs_the_listing_index(client: TestClient):
+    response = client.get("/files", params={"offset": 10})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = client.get("/files", params={"include_count": "true", "recursive": "false"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
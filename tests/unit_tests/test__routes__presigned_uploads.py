@@ -0,0 +1,85 @@
+"""Test cases for the direct-to-S3 multipart upload routes (`/uploads`)."""
+
+import requests
+from fastapi import status
+from fastapi.testclient import TestClient
+
+TEST_FILE_PATH = "models/checkpoint.bin"
+MIN_PART_SIZE_BYTES = 5 * 1024**2
+
+
+def _start_upload(client: TestClient) -> str:
+    response = client.post("/uploads", json={"file_path": TEST_FILE_PATH, "content_type": "application/x-binary"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["file_path"] == TEST_FILE_PATH
+    return response.json()["upload_id"]
+
+
+def _upload_parts(client: TestClient, upload_id: str, part_bodies: list[bytes]) -> list[dict]:
+    """PUT each part straight to its presigned URL, as a client would, and return the completed parts."""
+    part_numbers = list(range(1, len(part_bodies) + 1))
+    response = client.post(
+        "/uploads/parts", json={"file_path": TEST_FILE_PATH, "upload_id": upload_id, "part_numbers": part_numbers}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    parts = []
+    for part_url, body in zip(response.json()["parts"], part_bodies):
+        part_response = requests.put(part_url["url"], data=body, timeout=10)
+        assert part_response.status_code == status.HTTP_200_OK
+        parts.append({"part_number": part_url["part_number"], "etag": part_response.headers["ETag"]})
+    return parts
+
+
+def test_presigned_multipart_upload_creates_then_updates(client: TestClient):
+    part_bodies = [b"a" * MIN_PART_SIZE_BYTES, b"b" * 10]
+
+    for expected_status in (status.HTTP_201_CREATED, status.HTTP_200_OK):
+        upload_id = _start_upload(client)
+        parts = _upload_parts(client, upload_id, part_bodies)
+        response = client.post(
+            "/uploads/complete",
+            # parts may be listed in any order
+            json={"file_path": TEST_FILE_PATH, "upload_id": upload_id, "parts": parts[::-1]},
+        )
+        assert response.status_code == expected_status
+        assert response.json()["file_path"] == TEST_FILE_PATH
+
+    response = client.get(f"/files/{TEST_FILE_PATH}")
+    assert response.content == b"".join(part_bodies)
+    assert response.headers["Content-Type"] == "application/x-binary"
+
+
+def test_abort_presigned_upload(client: TestClient):
+    upload_id = _start_upload(client)
+    _upload_parts(client, upload_id, [b"a" * 10])
+
+    response = client.post("/uploads/abort", json={"file_path": TEST_FILE_PATH, "upload_id": upload_id})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    s3_client = client.app.state.s3_client
+    assert not s3_client.list_multipart_uploads(Bucket=client.app.state.settings.s3_bucket_name).get("Uploads")
+    assert client.head(f"/files/{TEST_FILE_PATH}").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_abort_unknown_upload_returns_404(client: TestClient):
+    response = client.post("/uploads/abort", json={"file_path": TEST_FILE_PATH, "upload_id": "unknown"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_complete_with_wrong_etag_is_rejected(client: TestClient):
+    upload_id = _start_upload(client)
+    _upload_parts(client, upload_id, [b"a" * 10])
+    response = client.post(
+        "/uploads/complete",
+        json={"file_path": TEST_FILE_PATH, "upload_id": upload_id, "parts": [{"part_number": 1, "etag": '"wrong"'}]},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_upload_requests_are_validated(client: TestClient):
+    assert client.post("/uploads", json={"file_path": ""}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.post("/uploads", json={"file_path": "x" * 1025}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    response = client.post("/uploads/parts", json={"file_path": "a", "upload_id": "u", "part_numbers": [0]})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    response = client.post("/uploads/parts", json={"file_path": "a", "upload_id": "u", "part_numbers": [10_001]})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,66 @@
+"""Test cases for `GET /query`."""
+
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+
+def _file_paths(response) -> list[str]:
+    return [file["file_path"] for file in response.json()["files"]]
+
+
+def test_largest_recent_files_under_a_directory(indexed_client: TestClient):
+    listing_index = indexed_client.app.state.listing_index
+    now = datetime.now(timezone.utc)
+    for key, size_bytes, age_days in [
+        ("models/a.ckpt", 300, 1),
+        ("models/b.ckpt", 500, 2),
+        ("models/c.CKPT", 400, 30),
+        ("models/d.json", 900, 1),
+        ("models/e.pt", 100, 3),
+        ("other/f.ckpt", 1_000, 1),
+    ]:
+        listing_index.put(key, size_bytes, now - timedelta(days=age_days))
+
+    response = indexed_client.get(
+        "/query",
+        params={
+            "directory": "models/",
+            "modified_after": (now - timedelta(days=7)).isoformat(),
+            "sort_by": "size_bytes",
+            "order": "desc",
+            "limit": 3,
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert _file_paths(response) == ["models/d.json", "models/b.ckpt", "models/a.ckpt"]
+    assert response.json()["files"][0]["size_bytes"] == 900
+
+    response = indexed_client.get("/query", params={"extensions": "ckpt, .pt", "max_size_bytes": 450})
+    assert _file_paths(response) == ["models/a.ckpt", "models/c.CKPT", "models/e.pt"]
+
+    response = indexed_client.get("/query", params={"sort_by": "last_modified", "limit": 1})
+    assert _file_paths(response) == ["models/c.CKPT"]
+
+
+def test_query_reflects_uploads(indexed_client: TestClient):
+    indexed_client.put("/files/data/big.bin", files={"file": ("big.bin", b"x" * 2048, "application/octet-stream")})
+    indexed_client.put("/files/data/small.bin", files={"file": ("small.bin", b"x", "application/octet-stream")})
+
+    response = indexed_client.get("/query", params={"min_size_bytes": 1024})
+    assert _file_paths(response) == ["data/big.bin"]
+
+
+def test_query_validation_and_availability(indexed_client: TestClient, client: TestClient):
+    response = indexed_client.get("/query", params={"min_size_bytes": 10, "max_size_bytes": 1})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    response = indexed_client.get("/query", params={"sort_by": "etag"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = client.get("/query")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
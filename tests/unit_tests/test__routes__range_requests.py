@@ -0,0 +1,93 @@
+"""Test cases for `Range` / `If-Range` handling in `GET /files/{file_path}`."""
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from files_api.main import create_app
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+TEST_FILE_PATH = "data/table.parquet"
+TEST_FILE_CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture(params=["s3", "body_cache"])
+# pylint: disable=unused-argument
+def client(request: pytest.FixtureRequest, mocked_aws: None, tmp_path) -> TestClient:
+    """Client serving downloads either straight from S3 or from the local body cache."""
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        body_cache_dir=tmp_path if request.param == "body_cache" else None,
+    )
+    with TestClient(create_app(settings=settings)) as client:
+        client.put(
+            f"/files/{TEST_FILE_PATH}",
+            files={"file": (TEST_FILE_PATH, TEST_FILE_CONTENT, "application/octet-stream")},
+        )
+        if request.param == "body_cache":
+            # ranges are only served from bodies that are already cached
+            client.get(f"/files/{TEST_FILE_PATH}")
+        yield client
+
+
+def test_head_advertises_byte_ranges(client: TestClient):
+    assert client.head(f"/files/{TEST_FILE_PATH}").headers["Accept-Ranges"] == "bytes"
+
+
+@pytest.mark.parametrize(
+    "range_header, start, end",
+    [
+        ("bytes=0-99", 0, 99),
+        ("bytes=1000-", 1000, 1023),
+        ("bytes=-64", 960, 1023),
+    ],
+)
+def test_get_byte_range(client: TestClient, range_header: str, start: int, end: int):
+    response = client.get(f"/files/{TEST_FILE_PATH}", headers={"Range": range_header})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.headers["Content-Range"] == f"bytes {start}-{end}/{len(TEST_FILE_CONTENT)}"
+    assert response.content == TEST_FILE_CONTENT[start : end + 1]
+
+
+def test_get_unsatisfiable_range(client: TestClient):
+    response = client.get(f"/files/{TEST_FILE_PATH}", headers={"Range": "bytes=5000-"})
+    assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+    assert response.headers["Content-Range"] == f"bytes */{len(TEST_FILE_CONTENT)}"
+
+
+def test_get_without_range_returns_whole_file(client: TestClient):
+    response = client.get(f"/files/{TEST_FILE_PATH}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.content == TEST_FILE_CONTENT
+
+
+def test_get_with_if_range(client: TestClient):
+    etag = client.head(f"/files/{TEST_FILE_PATH}").headers["ETag"]
+
+    response = client.get(f"/files/{TEST_FILE_PATH}", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == TEST_FILE_CONTENT[:10]
+
+    # the file changed since the client's partial download: the whole file is sent
+    response = client.get(f"/files/{TEST_FILE_PATH}", headers={"Range": "bytes=0-9", "If-Range": '"stale-etag"'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == TEST_FILE_CONTENT
+
+
+# pylint: disable=unused-argument
+def test_get_byte_range_only_reads_the_range_from_s3(mocked_aws: None):
+    with TestClient(create_app(settings=Settings(s3_bucket_name=TEST_BUCKET_NAME))) as client:
+        client.put(
+            f"/files/{TEST_FILE_PATH}",
+            files={"file": (TEST_FILE_PATH, TEST_FILE_CONTENT, "application/octet-stream")},
+        )
+        requested_ranges = []
+        client.app.state.s3_client.meta.events.register(
+            "provide-client-params.s3.GetObject", lambda params, **kwargs: requested_ranges.append(params.get("Range"))
+        )
+
+        response = client.get(f"/files/{TEST_FILE_PATH}", headers={"Range": "bytes=-64"})
+        assert response.headers["Content-Length"] == "64"
+        assert requested_ranges == ["bytes=-64"]
@@ -0,0 +1,74 @@
+"""Test cases for presigned-URL redirects in `GET /files/{file_path}`."""
+
+from urllib.parse import urlparse
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from files_api.main import create_app
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+SMALL_FILE_PATH = "small.txt"
+LARGE_FILE_PATH = "models/checkpoint.bin"
+
+
+@pytest.fixture
+# pylint: disable=unused-argument
+def redirect_client(mocked_aws: None) -> TestClient:
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME, download_redirects=True, download_redirect_threshold_bytes=100
+    )
+    with TestClient(create_app(settings=settings), follow_redirects=False) as client:
+        client.put(f"/files/{SMALL_FILE_PATH}", files={"file": (SMALL_FILE_PATH, b"small", "text/plain")})
+        client.put(f"/files/{LARGE_FILE_PATH}", files={"file": (LARGE_FILE_PATH, b"x" * 101, "text/plain")})
+        yield client
+
+
+def _assert_presigned_redirect(response, file_path: str) -> None:
+    assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+    assert response.headers["Cache-Control"] == "no-store"
+    location = urlparse(response.headers["Location"])
+    assert location.path.endswith(f"/{file_path}")
+    assert "X-Amz-Signature=" in location.query or "Signature=" in location.query
+
+
+def test_large_file_is_redirected(redirect_client: TestClient):
+    _assert_presigned_redirect(redirect_client.get(f"/files/{LARGE_FILE_PATH}"), LARGE_FILE_PATH)
+
+
+def test_small_file_is_served(redirect_client: TestClient):
+    response = redirect_client.get(f"/files/{SMALL_FILE_PATH}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"small"
+
+
+def test_client_opt_in_redirects_without_s3_calls(redirect_client: TestClient):
+    s3_calls: list[str] = []
+    redirect_client.app.state.s3_client.meta.events.register(
+        "before-call.s3", lambda model, **kwargs: s3_calls.append(model.name)
+    )
+    response = redirect_client.get(f"/files/{SMALL_FILE_PATH}", params={"redirect": "true"})
+    _assert_presigned_redirect(response, SMALL_FILE_PATH)
+    assert s3_calls == []
+
+
+def test_size_decision_reuses_cached_metadata(redirect_client: TestClient):
+    redirect_client.head(f"/files/{LARGE_FILE_PATH}")
+    s3_calls: list[str] = []
+    redirect_client.app.state.s3_client.meta.events.register(
+        "before-call.s3", lambda model, **kwargs: s3_calls.append(model.name)
+    )
+    _assert_presigned_redirect(redirect_client.get(f"/files/{LARGE_FILE_PATH}"), LARGE_FILE_PATH)
+    assert s3_calls == []
+
+
+def test_missing_file_is_not_redirected(redirect_client: TestClient):
+    assert redirect_client.get("/files/missing.bin").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_redirects_are_off_by_default(client: TestClient):
+    client.put(f"/files/{LARGE_FILE_PATH}", files={"file": (LARGE_FILE_PATH, b"x" * 101, "text/plain")})
+    response = client.get(f"/files/{LARGE_FILE_PATH}", params={"redirect": "true"}, follow_redirects=False)
+    assert response.status_code == status.HTTP_200_OK
@@ -0,0 +1,40 @@
+"""Test cases for `GET /usage`."""
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+
+def _put(client: TestClient, file_path: str, size: int) -> None:
+    client.put(f"/files/{file_path}", files={"file": (file_path, b"x" * size, "text/plain")})
+
+
+def test_usage_of_a_directory_and_its_subdirectories(indexed_client: TestClient):
+    _put(indexed_client, "README.md", 5)
+    _put(indexed_client, "data/labels.csv", 10)
+    _put(indexed_client, "data/images/0.png", 100)
+    _put(indexed_client, "data/images/1.png", 100)
+    _put(indexed_client, "data/raw/dump.bin", 1000)
+
+    response = indexed_client.get("/usage", params={"directory": "data"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "directory": "data/",
+        "file_count": 4,
+        "total_bytes": 1210,
+        "direct_file_count": 1,
+        "direct_bytes": 10,
+        "subdirectories": [
+            {"directory": "data/raw/", "file_count": 1, "total_bytes": 1000},
+            {"directory": "data/images/", "file_count": 2, "total_bytes": 200},
+        ],
+    }
+
+    indexed_client.delete("/files/data/raw/dump.bin")
+    data = indexed_client.get("/usage", params={"limit": 1}).json()
+    assert (data["directory"], data["file_count"], data["total_bytes"]) == ("", 4, 215)
+    assert data["subdirectories"] == [{"directory": "data/", "file_count": 3, "total_bytes": 210}]
+
+
+def test_usage_needs_the_listing_index(client: TestClient):
+    response = client.get("/usage")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST